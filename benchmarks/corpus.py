@@ -0,0 +1,155 @@
+import json
+import os
+import random
+from typing import Iterator
+
+import numpy as np
+
+# Размеры и распределение длин параграфов RuBQ 2.0 (см. раздел EDA в README)
+RUBQ_DOCS = 56_952
+RUBQ_DUPLICATE_TEXTS = 126
+RUBQ_SHORT_DOCS = 315
+MEDIAN_LENGTH = 343
+LENGTH_SIGMA = 0.8
+MAX_LENGTH = 11_010
+
+_SYLLABLES = [
+    "ка", "ло", "ми", "ра", "но", "те", "ст", "ви", "ан", "ов", "ер", "ин", "ко", "па", "ди", "го",
+    "ли", "ма", "ре", "си", "то", "ну", "бе", "жа", "це", "ры", "зо", "ще", "фу", "хи", "ля", "ю",
+]
+_QUESTION_TEMPLATES = [
+    "Что известно о {0} {1}?",
+    "Кто такой {0}?",
+    "Когда {0} {1} в {year} году?",
+    "Расскажи про {0} и {1}.",
+]
+
+
+class CorpusGenerator:
+    """
+    Генератор синтетического корпуса, похожего на RuBQ 2.0 по размеру и распределению длин
+    параграфов: псевдорусские слова с частотами по закону Ципфа, редкие «имена собственные»
+    и годы (для проверки лексического поиска), немного коротких параграфов и дублей текста.
+    Генерация детерминирована при одинаковом сиде.
+    """
+    def __init__(self, seed: int = 0, vocabulary_size: int = 50_000, n_names: int = 5_000):
+        """
+        Args:
+            seed (int, optional): Сид генератора. Defaults to 0.
+            vocabulary_size (int, optional): Размер словаря обычных слов. Defaults to 50_000.
+            n_names (int, optional): Количество редких «имён собственных». Defaults to 5_000.
+        """
+        self.seed = seed
+        rng = random.Random(seed)
+        self.vocabulary = self._make_words(rng, vocabulary_size, 1, 4)
+        rng.shuffle(self.vocabulary)
+        self.names = [word.capitalize() for word in self._make_words(rng, n_names, 2, 5)]
+        weights = 1.0 / np.arange(1, vocabulary_size + 1, dtype=np.float64)
+        self._word_cdf = np.cumsum(weights) / weights.sum()
+
+    @staticmethod
+    def _make_words(rng: random.Random, count: int, min_syllables: int, max_syllables: int) -> list[str]:
+        words = set()
+        while len(words) < count:
+            words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(min_syllables, max_syllables))))
+        return sorted(words)
+
+    def documents(self, n_docs: int = RUBQ_DOCS) -> Iterator[dict]:
+        """
+        Генерирует документы с полями `uid`, `ru_wiki_pageid` и `text`.
+
+        Args:
+            n_docs (int, optional): Количество документов. Defaults to RUBQ_DOCS.
+
+        Yields:
+            dict: Документ.
+        """
+        rng = np.random.default_rng(self.seed)
+        n_duplicates = round(n_docs * RUBQ_DUPLICATE_TEXTS / RUBQ_DOCS)
+        n_short = round(n_docs * RUBQ_SHORT_DOCS / RUBQ_DOCS)
+        lengths = np.clip(rng.lognormal(np.log(MEDIAN_LENGTH), LENGTH_SIGMA, size=n_docs), 21, MAX_LENGTH).astype(int)
+        lengths[rng.choice(n_docs, size=n_short, replace=False)] = rng.integers(1, 21, size=n_short)
+        duplicates = set(rng.choice(np.arange(1, n_docs), size=n_duplicates, replace=False).tolist())
+
+        texts: list[str] = []
+        for i in range(n_docs):
+            if i in duplicates:
+                text = texts[int(rng.integers(0, i))]
+            else:
+                text = self._paragraph(rng, int(lengths[i]))
+            texts.append(text)
+            yield {"uid": str(i), "ru_wiki_pageid": int(i // 4), "text": text}
+
+    def _paragraph(self, rng: np.random.Generator, length: int) -> str:
+        sentences, size = [], 0
+        while size < length:
+            n_words = int(rng.integers(6, 20))
+            ranks = np.minimum(np.searchsorted(self._word_cdf, rng.random(n_words)), len(self.vocabulary) - 1)
+            words = [self.vocabulary[rank] for rank in ranks]
+            words[0] = self.names[int(rng.integers(len(self.names)))]
+            if rng.random() < 0.3:
+                words.insert(int(rng.integers(1, n_words)), str(int(rng.integers(1700, 2024))))
+            sentence = " ".join(words)
+            sentence = sentence[0].upper() + sentence[1:] + "."
+            sentences.append(sentence)
+            size += len(sentence) + 1
+        return " ".join(sentences)[:length].rstrip()
+
+    def questions(self, documents: list[dict], n_questions: int) -> list[str]:
+        """
+        Составляет вопросы по случайным документам корпуса из встречающихся в них слов.
+
+        Args:
+            documents (list[dict]): Документы корпуса.
+            n_questions (int): Количество вопросов.
+
+        Returns:
+            list[str]: Вопросы.
+        """
+        rng = random.Random(self.seed + 1)
+        candidates = [doc["text"].rstrip(".").split() for doc in documents if len(doc["text"].split()) >= 4]
+        questions = []
+        for _ in range(n_questions):
+            words = rng.choice(candidates)
+            first, second = rng.sample(words[:12], 2)
+            template = rng.choice(_QUESTION_TEMPLATES)
+            questions.append(template.format(first.rstrip("."), second.rstrip(".").lower(), year=rng.randint(1700, 2023)))
+        return questions
+
+
+def write_jsonl(documents: Iterator[dict], path: str) -> int:
+    """
+    Записывает документы в JSONL-файл.
+
+    Args:
+        documents (Iterator[dict]): Документы.
+        path (str): Путь к файлу.
+
+    Returns:
+        int: Количество записанных документов.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for doc in documents:
+            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def read_jsonl(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Синтетический корпус размера RuBQ 2.0 для нагрузочных тестов")
+    parser.add_argument("--out", default="benchmarks/data/corpus.jsonl", help="Путь к JSONL-файлу корпуса")
+    parser.add_argument("--docs", type=int, default=RUBQ_DOCS, help="Количество документов")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    written = write_jsonl(CorpusGenerator(args.seed).documents(args.docs), args.out)
+    print(f"Записано документов: {written} -> {args.out}")
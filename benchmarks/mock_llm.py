@@ -0,0 +1,166 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+# Приблизительная длина токена в символах для подсчёта prompt_tokens
+CHARS_PER_TOKEN = 3
+WORDS = ["Согласно", "контексту", "ответ", "на", "вопрос", "состоит", "в", "следующем", "документ", "указывает"]
+
+
+class MockStats:
+    """
+    Потокобезопасные счётчики запросов и токенов заглушки (отдаются на `GET /stats`).
+    """
+    def __init__(self):
+        self.requests = 0
+        self.streamed = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, prompt_tokens: int, completion_tokens: int, stream: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.streamed += int(stream)
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "streamed": self.streamed,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
+
+
+def create_app(
+    ttft_ms: float = 300.0,
+    tokens_per_second: float = 50.0,
+    output_tokens: int = 64,
+    jitter: float = 0.2,
+    seed: int | None = None
+) -> FastAPI:
+    """
+    Создаёт OpenAI-совместимое приложение-заглушку (`POST /v1/chat/completions`, обычный и потоковый ответ)
+    с настраиваемой задержкой до первого токена и скоростью генерации.
+
+    Args:
+        ttft_ms (float, optional): Задержка до первого токена, мс. Defaults to 300.0.
+        tokens_per_second (float, optional): Скорость генерации токенов ответа. Defaults to 50.0.
+        output_tokens (int, optional): Длина ответа в токенах. Defaults to 64.
+        jitter (float, optional): Случайный разброс задержек (доля от значения). Defaults to 0.2.
+        seed (int | None, optional): Сид генератора разброса. Defaults to None.
+
+    Returns:
+        FastAPI: Приложение.
+    """
+    app = FastAPI(title="Mock OpenAI LLM")
+    stats = MockStats()
+    rng = random.Random(seed)
+
+    def jittered(value: float) -> float:
+        return max(value * (1.0 + rng.uniform(-jitter, jitter)), 0.0)
+
+    def count_prompt_tokens(messages: list[dict]) -> int:
+        text = "".join(str(message.get("content", "")) for message in messages)
+        return max(len(text) // CHARS_PER_TOKEN, 1)
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "benchmarks"}]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats.to_dict()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "mock")
+        stream = bool(body.get("stream", False))
+        prompt_tokens = count_prompt_tokens(body.get("messages", []))
+        tokens = [WORDS[i % len(WORDS)] + " " for i in range(output_tokens)]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": output_tokens,
+            "total_tokens": prompt_tokens + output_tokens,
+        }
+        stats.add(prompt_tokens, output_tokens, stream)
+
+        if not stream:
+            await asyncio.sleep(jittered(ttft_ms / 1000 + output_tokens / tokens_per_second))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def chunk(delta: dict, finish_reason: str | None = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def events():
+            await asyncio.sleep(jittered(ttft_ms / 1000))
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokens:
+                yield chunk({"content": token})
+                await asyncio.sleep(jittered(1.0 / tokens_per_second))
+            yield chunk({}, "stop")
+            if include_usage:
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                }
+                yield f"data: {json.dumps(payload)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="OpenAI-совместимая заглушка LLM для нагрузочных тестов")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="Задержка до первого токена, мс")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Скорость генерации ответа")
+    parser.add_argument("--output-tokens", type=int, default=64, help="Длина ответа в токенах")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Случайный разброс задержек (доля)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app(args.ttft_ms, args.tokens_per_second, args.output_tokens, args.jitter, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,65 @@
+import time
+
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.report import summarize
+from src.preprocessing import Preprocessor
+
+
+def bench_preprocess(
+    batch_sizes: list[int],
+    workers: int,
+    shard_size: int,
+    repeats: int = 20,
+    seed: int = 0
+) -> list[dict]:
+    """
+    Сравнивает задержку предобработки батча последовательно и в пуле процессов (`preprocessing.parallel`)
+    на синтетическом корпусе. Пул запускается и прогревается до замеров, поэтому в задержку не входит
+    старт процессов — только передача шардов и сборка результата.
+
+    Args:
+        batch_sizes (list[int]): Размеры батчей документов.
+        workers (int): Процессов в пуле.
+        shard_size (int): Документов в одной задаче воркера.
+        repeats (int, optional): Замеров на каждый размер и режим. Defaults to 20.
+        seed (int, optional): Сид корпуса. Defaults to 0.
+
+    Returns:
+        list[dict]: Строки: размер батча, режим и сводка задержек (`summarize`).
+    """
+    docs = list(CorpusGenerator(seed).documents(max(batch_sizes)))
+    preprocessor = Preprocessor()
+    parallel_config = {"enabled": True, "workers": workers, "min_docs": 1, "shard_size": shard_size}
+    rows = []
+    try:
+        for size in batch_sizes:
+            batch = docs[:size]
+            for mode, config in (("serial", {"enabled": False}), ("parallel", parallel_config)):
+                preprocessor.parallel_config = config
+                preprocessor.preprocess_pipeline([dict(doc) for doc in batch])
+                latencies = []
+                for _ in range(repeats):
+                    copies = [dict(doc) for doc in batch]
+                    started = time.perf_counter()
+                    preprocessor.preprocess_pipeline(copies)
+                    latencies.append(time.perf_counter() - started)
+                rows.append({"batch": size, "mode": mode, **summarize(latencies, 0, size * repeats, sum(latencies))})
+    finally:
+        preprocessor.shutdown()
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Задержка предобработки батча: последовательно и в пуле процессов")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[256, 1024, 4096, 16384])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Процессов в пуле")
+    parser.add_argument("--shard-size", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'batch':>7} {'mode':>9} {'p50_ms':>9} {'p95_ms':>9} {'docs/s':>10}")
+    for row in bench_preprocess(args.batch_sizes, args.workers, args.shard_size, args.repeats):
+        print(f"{row['batch']:>7} {row['mode']:>9} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['items_per_s']:>10}")
@@ -0,0 +1,177 @@
+import json
+import os
+import subprocess
+import time
+
+import numpy as np
+
+
+class StageRecorder:
+    """
+    Собирает задержки запросов одного этапа сценария и считает по ним сводку.
+    """
+    def __init__(self, name: str):
+        """
+        Args:
+            name (str): Название этапа.
+        """
+        self.name = name
+        self.latencies: list[float] = []
+        self.errors = 0
+        self.items = 0
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+
+    def record(self, seconds: float, items: int = 1) -> None:
+        """
+        Учитывает успешный запрос.
+
+        Args:
+            seconds (float): Задержка запроса в секундах.
+            items (int, optional): Сколько единиц работы (документов, вопросов) он обработал. Defaults to 1.
+        """
+        self.latencies.append(seconds)
+        self.items += items
+
+    def error(self) -> None:
+        self.errors += 1
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+
+    def stop(self) -> None:
+        self.finished_at = time.perf_counter()
+
+    def summary(self) -> dict:
+        """
+        Сводка этапа: количество запросов и ошибок, перцентили задержки (мс) и пропускная способность.
+
+        Returns:
+            dict: Сводка этапа.
+        """
+        duration = (self.finished_at or time.perf_counter()) - (self.started_at or time.perf_counter())
+        return summarize(self.latencies, self.errors, self.items, duration)
+
+
+def summarize(latencies: list[float], errors: int, items: int, duration: float) -> dict:
+    """
+    Считает сводку по задержкам запросов.
+
+    Args:
+        latencies (list[float]): Задержки успешных запросов в секундах.
+        errors (int): Количество ошибок.
+        items (int): Сколько единиц работы обработано.
+        duration (float): Длительность этапа в секундах.
+
+    Returns:
+        dict: count, errors, p50/p95/p99/mean/max (мс), requests_per_s, items_per_s, duration_s.
+    """
+    values = np.asarray(latencies, dtype=np.float64) * 1000
+    summary = {"count": len(values), "errors": errors, "duration_s": round(duration, 3)}
+    if len(values):
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        summary.update({
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "mean_ms": round(float(values.mean()), 2),
+            "max_ms": round(float(values.max()), 2),
+        })
+    summary["requests_per_s"] = round(len(values) / duration, 3) if duration > 0 else None
+    summary["items_per_s"] = round(items / duration, 3) if duration > 0 else None
+    return summary
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_report(scenario: str, params: dict, stages: dict[str, dict], results_dir: str) -> str:
+    """
+    Сохраняет отчёт прогона в JSON-файл `<results_dir>/<scenario>-<время>.json`.
+
+    Args:
+        scenario (str): Название сценария.
+        params (dict): Параметры прогона.
+        stages (dict[str, dict]): Сводки по этапам.
+        results_dir (str): Каталог с результатами.
+
+    Returns:
+        str: Путь к сохранённому отчёту.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    report = {
+        "scenario": scenario,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "params": params,
+        "stages": stages,
+    }
+    path = os.path.join(results_dir, f"{scenario}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def compare_reports(baseline: dict, current: dict, threshold: float = 0.1) -> list[dict]:
+    """
+    Сравнивает два отчёта по общим этапам. Регрессией считается рост p50/p95/p99 задержки
+    или падение пропускной способности больше чем на `threshold`.
+
+    Args:
+        baseline (dict): Базовый отчёт.
+        current (dict): Текущий отчёт.
+        threshold (float, optional): Допустимое относительное ухудшение. Defaults to 0.1.
+
+    Returns:
+        list[dict]: Строки сравнения: этап, метрика, значения, относительное изменение, признак регрессии.
+    """
+    rows = []
+    for stage, before in baseline["stages"].items():
+        after = current["stages"].get(stage)
+        if after is None:
+            continue
+        for metric, higher_is_better in (("p50_ms", False), ("p95_ms", False), ("p99_ms", False), ("items_per_s", True)):
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regression = change < -threshold if higher_is_better else change > threshold
+            rows.append({
+                "stage": stage, "metric": metric, "baseline": old, "current": new,
+                "change": round(change, 4), "regression": regression,
+            })
+    return rows
+
+
+def format_stages(stages: dict[str, dict]) -> str:
+    """
+    Форматирует сводки этапов в текстовую таблицу.
+    """
+    header = f"{'этап':<20}{'запросов':>10}{'ошибок':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'ед./с':>10}"
+    lines = [header]
+    for name, s in stages.items():
+        lines.append(
+            f"{name:<20}{s['count']:>10}{s['errors']:>8}{s.get('p50_ms', '-'):>10}{s.get('p95_ms', '-'):>10}"
+            f"{s.get('p99_ms', '-'):>10}{s.get('items_per_s') or '-':>10}"
+        )
+    return "\n".join(lines)
+
+
+def format_comparison(rows: list[dict]) -> str:
+    """
+    Форматирует результат `compare_reports` в текстовую таблицу.
+    """
+    lines = [f"{'этап':<20}{'метрика':<14}{'было':>12}{'стало':>12}{'изменение':>12}"]
+    for row in rows:
+        mark = "  РЕГРЕССИЯ" if row["regression"] else ""
+        lines.append(
+            f"{row['stage']:<20}{row['metric']:<14}{row['baseline']:>12}{row['current']:>12}"
+            f"{row['change'] * 100:>+11.1f}%{mark}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,304 @@
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+
+import httpx
+
+from benchmarks.corpus import CorpusGenerator, read_jsonl, write_jsonl
+from benchmarks.report import (
+    StageRecorder, compare_reports, format_comparison, format_stages, save_report, summarize
+)
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+def load_corpus(path: str, n_docs: int, seed: int) -> list[dict]:
+    """
+    Читает корпус из JSONL-файла, а если файла нет — генерирует синтетический и сохраняет его.
+    """
+    if not os.path.exists(path):
+        write_jsonl(CorpusGenerator(seed).documents(n_docs), path)
+    return read_jsonl(path)
+
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: str, poll_interval: float, on_progress=None) -> dict:
+    """
+    Опрашивает задачу индексации до завершения.
+
+    Args:
+        client (httpx.AsyncClient): Клиент сервиса.
+        job_id (str): Идентификатор задачи.
+        poll_interval (float): Интервал опроса в секундах.
+        on_progress (Callable[[dict], None] | None, optional): Вызывается с состоянием задачи после каждого опроса.
+
+    Returns:
+        dict: Итоговое состояние задачи.
+    """
+    while True:
+        response = await client.get(f"/jobs/{job_id}")
+        response.raise_for_status()
+        job = response.json()
+        if on_progress is not None:
+            on_progress(job)
+        if job["status"] in FINISHED_STATUSES:
+            return job
+        await asyncio.sleep(poll_interval)
+
+
+def server_stages(job: dict) -> dict[str, dict]:
+    """
+    Сводки по этапам пайплайна индексации на стороне сервиса (время из `timings` задачи).
+    """
+    parsed = job["progress"]["parsed"]
+    return {
+        f"server_{stage}": summarize([], 0, parsed, seconds)
+        for stage, seconds in job.get("timings", {}).items()
+    }
+
+
+async def scenario_index(client: httpx.AsyncClient, args) -> dict[str, dict]:
+    """
+    Массовая индексация: загрузка корпуса через `/index_file` и опрос задачи до завершения.
+    Задержка батча — интервал между изменениями прогресса задачи (с точностью до интервала опроса).
+    """
+    load_corpus(args.corpus, args.docs, args.seed)
+    upload, batches = StageRecorder("upload"), StageRecorder("index_batch")
+
+    upload.start()
+    started = time.perf_counter()
+    with open(args.corpus, "rb") as f:
+        response = await client.post("/index_file", files={"file": (os.path.basename(args.corpus), f)})
+    response.raise_for_status()
+    upload.record(time.perf_counter() - started)
+    upload.stop()
+
+    last = {"parsed": 0, "at": time.perf_counter()}
+
+    def on_progress(job: dict) -> None:
+        parsed = job["progress"]["parsed"]
+        if parsed > last["parsed"]:
+            now = time.perf_counter()
+            batches.record(now - last["at"], parsed - last["parsed"])
+            last.update(parsed=parsed, at=now)
+
+    batches.start()
+    job = await wait_for_job(client, response.json()["job_id"], args.poll_interval, on_progress)
+    batches.stop()
+    if job["status"] != "completed":
+        batches.error()
+    print(f"Задача индексации: {job['status']}, прогресс: {job['progress']}")
+    return {"upload": upload.summary(), "index_batch": batches.summary(), **server_stages(job)}
+
+
+async def _ask(client: httpx.AsyncClient, mode: str, questions: list[str], recorders: dict[str, StageRecorder]) -> None:
+    """
+    Отправляет один запрос в выбранном режиме и записывает задержку (для потока — ещё и время до первого токена).
+    """
+    started = time.perf_counter()
+    try:
+        if mode == "stream":
+            first_token = None
+            async with client.stream("POST", "/query/stream", json={"question": questions[0]}) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line == "event: token" and first_token is None:
+                        first_token = time.perf_counter() - started
+                    elif line == "event: error":
+                        raise RuntimeError("Сервис вернул событие error")
+            if first_token is not None:
+                recorders["query_ttft"].record(first_token)
+            recorders["query"].record(time.perf_counter() - started)
+        elif mode == "batch":
+            response = await client.post("/query_batch", json={"questions": questions})
+            response.raise_for_status()
+            results = response.json()["results"]
+            failed = sum(1 for result in results if result["error"] is not None)
+            recorders["query"].record(time.perf_counter() - started, len(results) - failed)
+            for _ in range(failed):
+                recorders["query"].error()
+        else:
+            response = await client.post("/query", json={"question": questions[0]})
+            response.raise_for_status()
+            recorders["query"].record(time.perf_counter() - started)
+    except (httpx.HTTPError, RuntimeError, KeyError, json.JSONDecodeError):
+        recorders["query"].error()
+
+
+async def _query_workers(client: httpx.AsyncClient, args, questions: list[str], recorders: dict, deadline: float | None) -> None:
+    """
+    Запускает `args.concurrency` конкурентных клиентов, которые разбирают вопросы из общей очереди
+    (до исчерпания вопросов или до `deadline`).
+    """
+    size = args.batch_size if args.mode == "batch" else 1
+    requests = [questions[i:i + size] for i in range(0, len(questions), size)]
+    source = itertools.cycle(requests) if deadline is not None else iter(requests)
+
+    async def worker() -> None:
+        for item in source:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            await _ask(client, args.mode, item, recorders)
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+
+def _query_recorders() -> dict[str, StageRecorder]:
+    return {"query": StageRecorder("query"), "query_ttft": StageRecorder("query_ttft")}
+
+
+def _query_summaries(recorders: dict[str, StageRecorder]) -> dict[str, dict]:
+    return {name: recorder.summary() for name, recorder in recorders.items() if recorder.latencies or recorder.errors}
+
+
+async def scenario_query(client: httpx.AsyncClient, args) -> dict[str, dict]:
+    """
+    Конкурентные запросы к `/query`, `/query/stream` или `/query_batch` с вопросами по корпусу.
+    Первые `args.warmup` вопросов отправляются до замера.
+    """
+    corpus = load_corpus(args.corpus, args.docs, args.seed)
+    questions = CorpusGenerator(args.seed).questions(corpus, args.warmup + args.questions)
+    warmup, questions = questions[:args.warmup], questions[args.warmup:]
+
+    await _query_workers(client, args, warmup, _query_recorders(), None)
+    recorders = _query_recorders()
+    for recorder in recorders.values():
+        recorder.start()
+    await _query_workers(client, args, questions, recorders, None)
+    for recorder in recorders.values():
+        recorder.stop()
+    return _query_summaries(recorders)
+
+
+async def scenario_mixed(client: httpx.AsyncClient, args) -> dict[str, dict]:
+    """
+    Смешанная нагрузка: конкурентные запросы в течение `args.duration` секунд и параллельно —
+    периодическая дозапись документов батчами через `/index_text`.
+    """
+    corpus = load_corpus(args.corpus, args.docs, args.seed)
+    questions = CorpusGenerator(args.seed).questions(corpus, max(args.questions, 1))
+    recorders = _query_recorders()
+    submit, jobs = StageRecorder("index_submit"), StageRecorder("index_job")
+    deadline = time.perf_counter() + args.duration
+    offset = itertools.count()
+
+    async def writer() -> None:
+        while time.perf_counter() < deadline:
+            batch_no = next(offset)
+            docs = [
+                {"uid": f"mixed-{batch_no}-{i}", "text": doc["text"]}
+                for i, doc in enumerate(corpus[batch_no * args.write_batch:(batch_no + 1) * args.write_batch])
+            ]
+            if not docs:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.post("/index_text", json=docs)
+                response.raise_for_status()
+                submit.record(time.perf_counter() - started)
+                job = await wait_for_job(client, response.json()["job_id"], args.poll_interval)
+                if job["status"] == "completed":
+                    jobs.record(time.perf_counter() - started, len(docs))
+                else:
+                    jobs.error()
+            except httpx.HTTPError:
+                submit.error()
+            await asyncio.sleep(args.write_interval)
+
+    for recorder in (*recorders.values(), submit, jobs):
+        recorder.start()
+    await asyncio.gather(_query_workers(client, args, questions, recorders, deadline), writer())
+    for recorder in (*recorders.values(), submit, jobs):
+        recorder.stop()
+    return {**_query_summaries(recorders), "index_submit": submit.summary(), "index_job": jobs.summary()}
+
+
+SCENARIOS = {"index": scenario_index, "query": scenario_query, "mixed": scenario_mixed}
+
+
+async def run_scenario(args) -> dict[str, dict]:
+    """
+    Выполняет сценарий против запущенного сервиса; если указан адрес заглушки LLM,
+    добавляет в отчёт число вызовов LLM и токенов промпта за прогон.
+    """
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limits) as client:
+        llm_before = await _llm_stats(args.mock_llm_url)
+        stages = await SCENARIOS[args.scenario](client, args)
+        llm_after = await _llm_stats(args.mock_llm_url)
+    if llm_before and llm_after:
+        stages["llm"] = {key: llm_after[key] - llm_before[key] for key in llm_after}
+        stages["llm"]["count"] = stages["llm"].pop("requests")
+        stages["llm"]["errors"] = 0
+    return stages
+
+
+async def _llm_stats(url: str | None) -> dict | None:
+    if not url:
+        return None
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=5) as client:
+            response = await client.get("/stats")
+            response.raise_for_status()
+            return response.json()
+    except httpx.HTTPError:
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Нагрузочные сценарии RAG-сервиса")
+    subparsers = parser.add_subparsers(dest="scenario", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--base-url", default="http://127.0.0.1:8000", help="Адрес сервиса")
+    common.add_argument("--mock-llm-url", default=None, help="Адрес заглушки LLM (для статистики токенов)")
+    common.add_argument("--corpus", default="benchmarks/data/corpus.jsonl", help="JSONL-корпус (генерируется, если нет)")
+    common.add_argument("--docs", type=int, default=56_952, help="Размер генерируемого корпуса")
+    common.add_argument("--seed", type=int, default=0)
+    common.add_argument("--concurrency", type=int, default=16, help="Конкурентных клиентов")
+    common.add_argument("--timeout", type=float, default=120.0, help="Таймаут запроса, с")
+    common.add_argument("--poll-interval", type=float, default=0.2, help="Интервал опроса задач индексации, с")
+    common.add_argument("--results-dir", default="benchmarks/results", help="Каталог для отчётов")
+
+    subparsers.add_parser("index", parents=[common], help="Массовая индексация корпуса")
+
+    query_common = argparse.ArgumentParser(add_help=False)
+    query_common.add_argument("--mode", choices=["query", "stream", "batch"], default="query")
+    query_common.add_argument("--questions", type=int, default=500, help="Количество вопросов")
+    query_common.add_argument("--batch-size", type=int, default=32, help="Вопросов в запросе для --mode batch")
+
+    query = subparsers.add_parser("query", parents=[common, query_common], help="Конкурентные запросы")
+    query.add_argument("--warmup", type=int, default=20, help="Вопросов на прогрев (не входят в отчёт)")
+
+    mixed = subparsers.add_parser("mixed", parents=[common, query_common], help="Запросы вместе с дозаписью")
+    mixed.add_argument("--duration", type=float, default=60.0, help="Длительность, с")
+    mixed.add_argument("--write-batch", type=int, default=200, help="Документов в одном /index_text")
+    mixed.add_argument("--write-interval", type=float, default=1.0, help="Пауза между дозаписями, с")
+
+    compare = subparsers.add_parser("compare", help="Сравнение двух отчётов")
+    compare.add_argument("baseline", help="Базовый отчёт")
+    compare.add_argument("current", help="Текущий отчёт")
+    compare.add_argument("--threshold", type=float, default=0.1, help="Допустимое ухудшение (доля)")
+    args = parser.parse_args()
+
+    if args.scenario == "compare":
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+        rows = compare_reports(baseline, current, args.threshold)
+        print(format_comparison(rows))
+        sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+    stages = asyncio.run(run_scenario(args))
+    params = {key: value for key, value in vars(args).items() if key != "scenario"}
+    path = save_report(args.scenario, params, stages, args.results_dir)
+    print(format_stages({name: stage for name, stage in stages.items() if name != "llm"}))
+    if "llm" in stages:
+        print(f"LLM: {stages['llm']}")
+    print(f"Отчёт: {path}")
@@ -1,2 +1,2 @@
 from .config import config, env, all_models
-from .logging_config import setup_logger
\ No newline at end of file
+from .logging_config import setup_logger, request_id_var
\ No newline at end of file
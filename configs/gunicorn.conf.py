@@ -0,0 +1,55 @@
+import gc
+import multiprocessing
+import os
+import sys
+import time
+
+# gunicorn исполняет этот файл до импорта приложения: корень проекта нужен в sys.path для `configs` и `src`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from configs import config, setup_logger
+from src.vector_db.factory import chroma_settings
+
+server_config = config['api']['server']
+logger = setup_logger("gunicorn.log")
+
+bind = os.environ.get("BIND", server_config['bind'])
+workers = int(os.environ.get("WEB_CONCURRENCY", 0)) or server_config['workers'] or multiprocessing.cpu_count()
+if workers > 1 and config['vector_db'].get('backend', 'chroma') == "chroma" and chroma_settings()['mode'] == "persistent":
+    # HNSW-индекс Chroma в режиме persistent живёт в памяти процесса: документы, записанные одним воркером,
+    # не видны в поиске остальных
+    logger.warning(
+        f"ChromaDB в режиме persistent не поддерживает несколько процессов: запускается 1 воркер вместо {workers}. "
+        "Для нескольких воркеров используйте vector_db.backend: numpy или vector_db.chroma.mode: http"
+    )
+    workers = 1
+# Воркеры наследуют окружение мастера: по WEB_CONCURRENCY пул предобработки делит ядра между ними
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+# Приложение импортируется в мастер-процессе до fork: импорт лёгкий, хранилища открываются в lifespan каждого воркера
+preload_app = True
+timeout = server_config['timeout']
+graceful_timeout = server_config['timeout']
+
+
+def on_starting(server) -> None:
+    """
+    Загружает веса модели эмбеддингов в мастер-процессе до запуска воркеров: после fork страницы
+    с весами разделяются воркерами copy-on-write, а не загружаются в каждом из них заново.
+    Пробный эмбеддинг выполняется уже в воркерах (`api.startup.warm_up_encode`), чтобы пулы потоков
+    torch не создавались до fork.
+    """
+    if not server_config.get('preload_model', False):
+        return
+    backend = config['embedder'].get('backend', 'torch')
+    if backend != "torch":
+        # Сессия ONNX Runtime создаёт пулы потоков при загрузке и не переживает fork
+        logger.warning(f"Предзагрузка модели до fork поддерживается только для бэкенда torch, бэкенд: {backend}")
+        return
+    from src.indexing import model_registry
+
+    started = time.perf_counter()
+    model_registry.warm_up()
+    # Объекты мастера переносятся в постоянное поколение, чтобы сборщик мусора в воркерах не трогал их страницы
+    gc.freeze()
+    logger.info(f"Модель эмбеддингов загружена до запуска воркеров за {time.perf_counter() - started:.2f} с")
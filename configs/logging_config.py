@@ -1,8 +1,15 @@
+from contextvars import ContextVar
 from loguru import logger
 import sys
 import os 
 from configs import env
 
+# Идентификатор текущего HTTP-запроса (или фоновой задачи); попадает в каждую запись лога как extra["request_id"]
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+def _add_request_id(record: dict) -> None:
+    record["extra"].setdefault("request_id", request_id_var.get())
+
 def setup_logger(log_file: str):
     """
     Настраивает логгер Loguru для записи логов в консоль и файл.
@@ -11,6 +18,8 @@ def setup_logger(log_file: str):
     Уровень логирования определяется переменными окружения:
     - если DEBUG=True в .env — уровень DEBUG,
     - иначе INFO (по умолчанию).
+
+    В каждую запись добавляется идентификатор запроса из `request_id_var`.
     """
     debug_mode = env.bool("DEBUG", default=False)
     level = "DEBUG" if debug_mode else "INFO"
@@ -21,10 +30,11 @@ def setup_logger(log_file: str):
     full_path = os.path.join(log_dir, log_file)
     
     logger.remove()
+    logger.configure(patcher=_add_request_id)
     logger.add(
         sys.stderr,
         level=level,
-        format="<green>{time:DD.MM.YYYY HH:mm:ss}</green> | <cyan>{name}</cyan> | <level>{level}</level> | {message}"
+        format="<green>{time:DD.MM.YYYY HH:mm:ss}</green> | <cyan>{name}</cyan> | <level>{level}</level> | {extra[request_id]} | {message}"
     )
     logger.add(
         full_path,
@@ -32,7 +42,7 @@ def setup_logger(log_file: str):
         retention="10 days",
         level=level,
         encoding="utf-8",
-        format="{time:DD.MM.YYYY HH:mm:ss} | {name} | {level} | {message}"
+        format="{time:DD.MM.YYYY HH:mm:ss} | {name} | {level} | {extra[request_id]} | {message}"
     )
 
     return logger
\ No newline at end of file
@@ -1 +1,3 @@
-from .answer_generator import Generator
\ No newline at end of file
+from .answer_generator import Generator
+from .query_cache import QueryCache
+from .context_builder import ContextBuilder
@@ -1,41 +1,102 @@
-from src.vector_db import Chroma_db
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable
+
+from src.vector_db import LexicalIndex, VectorStore, create_lexical_index, create_vector_store
 from src.indexing import Embedder
+from src.indexing.chunking import collapse_chunks
+from src.indexing.micro_batcher import MicroBatcher
+from src.answer_generator.query_cache import QueryCache
+from src.answer_generator.context_builder import ContextBuilder
+from src.metrics import LLM_REQUESTS, LLM_TOKENS, STAGE_DURATION
 from configs.logging_config import setup_logger
 from configs import config, all_models, env
 
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
-
 class Generator:
     """
     Класс для генерации ответа на вопрос пользователя с помощью retrieval-augmented pipeline.
     Выполняет поиск релевантных фрагментов из векторной базы и отправляет их вместе с вопросом в LLM.
     """
-    def __init__(self):
+    def __init__(self, vector_db: VectorStore | None = None, lexical_index: LexicalIndex | None = None):
         """
         Инициализация генератора:
         - Загрузка векторной БД.
         - Настройка эмбеддера.
         - Чтение конфига (top_k, модель LLM и т.д.).
         - Инициализация выбранной LLM.
+
+        Args:
+            vector_db (VectorStore | None, optional): Общее векторное хранилище. Если не передано, создаётся по конфигурации.
+            lexical_index (LexicalIndex | None, optional): Общий BM25-индекс для гибридного поиска.
+                Если не передан, создаётся по конфигурации.
         """
-        self.vector_db = Chroma_db()
+        self.vector_db = vector_db or create_vector_store()
+        self.lexical_index = lexical_index if lexical_index is not None else create_lexical_index(vector_db=self.vector_db)
         self.embedder = Embedder()
         self.config = config['answer_generator']
         self.top_k = self.config['top_k']
         self.logger = setup_logger("answer_generator.log")
         self.llm_model_name = self.config['llm_model_name']
-        
-        if self.llm_model_name in all_models['openai_models']:
-            self.llm_model = ChatOpenAI(api_key=env.str("OPENAI_API_KEY"))
-        elif self.llm_model_name in all_models['anthropic_models']:
-            self.llm_model = ChatAnthropic(api_key=env.str("ANTHROPIC_API_KEY"))
-        elif self.llm_model_name in all_models['google_models']:
-            self.llm_model = ChatGoogleGenerativeAI(api_key=env.str("GOOGLE_API_KEY"))
-        else:
-            self.logger.warning(f"Модель {self.llm_model_name} не поддерживается")
-            self.llm_model = None  
+        self.retrieval_config = self.config.get('retrieval', {})
+        self.batch_config = self.config['batch']
+
+        concurrency = self.config['concurrency']
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency['embed'] + concurrency['retrieve'],
+            thread_name_prefix="generator"
+        )
+        self._embed_limit = asyncio.Semaphore(concurrency['embed'])
+        self._retrieve_limit = asyncio.Semaphore(concurrency['retrieve'])
+        self._llm_limit = asyncio.Semaphore(concurrency['llm'])
+
+        batching_config = self.config.get('micro_batching', {})
+        self.micro_batcher = MicroBatcher(
+            partial(self.embedder.encode, use_cache=False),
+            max_batch_size=batching_config['max_batch_size'],
+            max_wait_ms=batching_config['max_wait_ms'],
+            executor=self._executor,
+            limit=self._embed_limit
+        ) if batching_config.get('enabled', False) else None
+
+        cache_config = self.config.get('cache', {})
+        self.query_cache = QueryCache(cache_config) if cache_config.get('enabled', False) else None
+
+        context_config = self.config.get('context', {})
+        self.context_builder = ContextBuilder(
+            context_config, self.llm_model_name
+        ) if context_config.get('enabled', False) else None
+
+        self.llm_model = self._create_llm(self.llm_model_name)
+
+    def _create_llm(self, model_name: str) -> Any:
+        """
+        Создаёт клиент LLM провайдера, которому принадлежит модель.
+        Импортируется только пакет LangChain этого провайдера: остальные не нужны и заметно замедляют старт.
+
+        Args:
+            model_name (str): Название модели из `api_model_names`.
+
+        Returns:
+            BaseChatModel | None: Клиент LLM или None, если модель не поддерживается.
+        """
+        if model_name in all_models['openai_models']:
+            from langchain_openai import ChatOpenAI
+
+            return ChatOpenAI(model=model_name, api_key=env.str("OPENAI_API_KEY"))
+        if model_name in all_models['anthropic_models']:
+            from langchain_anthropic import ChatAnthropic
+
+            return ChatAnthropic(model=model_name, api_key=env.str("ANTHROPIC_API_KEY"))
+        if model_name in all_models['google_models']:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            return ChatGoogleGenerativeAI(model=model_name, api_key=env.str("GOOGLE_API_KEY"))
+        self.logger.warning(f"Модель {model_name} не поддерживается")
+        return None
     
     def generate(self, question: str) -> str:
         """
@@ -53,13 +114,524 @@ class Generator:
             return "Модель не инициализирована"
         
         self.logger.debug("Начало генерации ответа.")
-        question_emb = self.embedder.encode(question)
-        results = self.vector_db.query(question_emb, self.top_k)
+        key, generation, answer = self._lookup_answer(question)
+        if answer is not None:
+            return answer
+
+        question_emb = self._lookup_embedding(key)
+        if question_emb is None:
+            with STAGE_DURATION.time(pipeline="query", stage="embed"):
+                question_emb = self.embedder.encode(question)
+            self._store_embedding(key, question_emb)
+        answer = self._lookup_similar_answer(question_emb)
+        if answer is not None:
+            return answer
+
+        results = self._lookup_retrieval(question_emb)
+        if results is None:
+            results = self._retrieve(question, question_emb)
+            self._store_retrieval(question_emb, results, generation)
+        full_prompt = self._build_prompt(question, results)
+
+        with self._llm_call():
+            output = self.llm_model.invoke(full_prompt)
+        self._record_llm_usage(output.usage_metadata)
+
+        self._store_answer(key, question_emb, output.content, generation)
+        return output.content
+
+    async def agenerate(self, question: str) -> str:
+        """
+        Асинхронно генерирует ответ на вопрос пользователя, не блокируя event loop.
+
+        Эмбеддинг вопроса и поиск в векторной БД выполняются в пуле потоков,
+        вызов LLM — через нативный асинхронный `ainvoke` клиента провайдера.
+        Количество одновременных операций на каждом этапе ограничено
+        настройками `answer_generator.concurrency`.
+
+        Args:
+            question (str): Вопрос пользователя на естественном языке.
+
+        Returns:
+            str: Сгенерированный ответ LLM.
+                Если модель не инициализирована, возвращается строка "Модель не инициализирована".
+        """
+        if self.llm_model is None:
+            self.logger.error("LLM-модель не инициализирована. Ответ сгенерировать невозможно.")
+            return "Модель не инициализирована"
+
+        self.logger.debug("Начало асинхронной генерации ответа.")
+        key, generation, question_emb, answer, results = await self._aprepare(question)
+        if answer is not None:
+            return answer
+        full_prompt = self._build_prompt(question, results)
+
+        async with self._llm_limit:
+            with self._llm_call():
+                output = await self.llm_model.ainvoke(full_prompt)
+        self._record_llm_usage(output.usage_metadata)
+
+        self._store_answer(key, question_emb, output.content, generation)
+        return output.content
+
+    async def astream(self, question: str) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Асинхронно генерирует ответ потоком событий: сначала найденные источники,
+        затем фрагменты ответа по мере их генерации LLM (через `astream` клиента провайдера).
+
+        Готовый ответ из кэша отдаётся одним фрагментом, источники для него берутся из кэша поиска
+        (или ищутся заново), поэтому совпадают с источниками ответа без кэша. Полный ответ сохраняется
+        в кэш после окончания генерации.
+
+        Args:
+            question (str): Вопрос пользователя на естественном языке.
+
+        Yields:
+            tuple[str, Any]: События ("sources", list[dict]), ("token", str) и ("done", None).
+        """
+        if self.llm_model is None:
+            self.logger.error("LLM-модель не инициализирована. Ответ сгенерировать невозможно.")
+            yield "token", "Модель не инициализирована"
+            yield "done", None
+            return
+
+        self.logger.debug("Начало потоковой генерации ответа.")
+        key, generation, question_emb, answer, results = await self._aprepare(question, with_results=True)
+        yield "sources", self._sources(results)
+        if answer is not None:
+            yield "token", answer
+            yield "done", None
+            return
+
+        full_prompt = self._build_prompt(question, results)
+        parts, usage = [], {}
+        async with self._llm_limit:
+            with self._llm_call():
+                async for chunk in self.llm_model.astream(full_prompt):
+                    for name, value in (chunk.usage_metadata or {}).items():
+                        if isinstance(value, int):
+                            usage[name] = usage.get(name, 0) + value
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        yield "token", chunk.content
+        self._record_llm_usage(usage)
+
+        self._store_answer(key, question_emb, "".join(parts), generation)
+        yield "done", None
+
+    def generate_batch(self, questions: list[str]) -> list[dict]:
+        """
+        Генерирует ответы на пакет вопросов: эмбеддинги всех вопросов считаются одним батчем,
+        поиск выполняется одним вызовом векторной БД, вызовы LLM идут параллельно
+        (не более `answer_generator.batch.llm_concurrency` одновременно).
+
+        Ошибка на отдельном вопросе не прерывает пакет, а возвращается в поле `error` этого вопроса.
+
+        Args:
+            questions (list[str]): Вопросы пользователей.
+
+        Returns:
+            list[dict]: Результаты в порядке вопросов: `question`, `answer` и `error` (None при успехе).
+        """
+        if self.llm_model is None:
+            self.logger.error("LLM-модель не инициализирована. Ответ сгенерировать невозможно.")
+            return [self._batch_item(q, "Модель не инициализирована") for q in questions]
+
+        self.logger.debug(f"Начало пакетной генерации ответов. Вопросов: {len(questions)}")
+        prepared = self._prepare_batch(questions)
+        pending = [i for i, item in enumerate(prepared) if item["answer"] is None and item["error"] is None]
+        if pending:
+            prompts = [self._build_prompt(questions[i], prepared[i]["results"]) for i in pending]
+            with STAGE_DURATION.time(pipeline="query", stage="llm"):
+                outputs = self.llm_model.batch(
+                    prompts,
+                    config={"max_concurrency": self.batch_config['llm_concurrency']},
+                    return_exceptions=True
+                )
+            for i, output in zip(pending, outputs):
+                self._finish_batch_item(prepared[i], output)
+        return [self._batch_item(q, item["answer"], item["error"]) for q, item in zip(questions, prepared)]
+
+    async def agenerate_batch(self, questions: list[str]) -> list[dict]:
+        """
+        Асинхронно генерирует ответы на пакет вопросов (см. `generate_batch`).
+
+        Эмбеддинг и поиск всего пакета выполняются в пуле потоков одним заходом,
+        вызовы LLM — через `ainvoke` с ограничением конкурентности внутри пакета
+        (`answer_generator.batch.llm_concurrency`) и общим лимитом `concurrency.llm`.
+
+        Args:
+            questions (list[str]): Вопросы пользователей.
+
+        Returns:
+            list[dict]: Результаты в порядке вопросов: `question`, `answer` и `error` (None при успехе).
+        """
+        if self.llm_model is None:
+            self.logger.error("LLM-модель не инициализирована. Ответ сгенерировать невозможно.")
+            return [self._batch_item(q, "Модель не инициализирована") for q in questions]
+
+        self.logger.debug(f"Начало асинхронной пакетной генерации ответов. Вопросов: {len(questions)}")
+        async with self._embed_limit, self._retrieve_limit:
+            prepared = await self._run_in_executor(self._prepare_batch, questions)
+
+        batch_limit = asyncio.Semaphore(self.batch_config['llm_concurrency'])
+
+        async def answer(question: str, item: dict) -> None:
+            if item["answer"] is not None or item["error"] is not None:
+                return
+            try:
+                prompt = self._build_prompt(question, item["results"])
+                async with batch_limit, self._llm_limit:
+                    with STAGE_DURATION.time(pipeline="query", stage="llm"):
+                        output = await self.llm_model.ainvoke(prompt)
+            except Exception as e:
+                output = e
+            self._finish_batch_item(item, output)
+
+        await asyncio.gather(*(answer(q, item) for q, item in zip(questions, prepared)))
+        return [self._batch_item(q, item["answer"], item["error"]) for q, item in zip(questions, prepared)]
+
+    def _prepare_batch(self, questions: list[str]) -> list[dict]:
+        """
+        Общая для `generate_batch` и `agenerate_batch` часть: поиск ответов в кэше,
+        эмбеддинг всех вопросов без готового ответа одним батчем и поиск документов
+        одним вызовом векторной БД. Ошибка эмбеддинга или поиска записывается
+        в `error` всех затронутых вопросов.
+
+        Args:
+            questions (list[str]): Вопросы пользователей.
+
+        Returns:
+            list[dict]: Состояние по каждому вопросу: ключ кэша, поколение коллекции, эмбеддинг,
+                готовый ответ, результаты поиска и ошибка.
+        """
+        prepared = []
+        for question in questions:
+            key, generation, answer = self._lookup_answer(question)
+            prepared.append({
+                "key": key, "generation": generation, "embedding": self._lookup_embedding(key),
+                "answer": answer, "results": None, "error": None
+            })
+
+        to_encode = [i for i, item in enumerate(prepared) if item["answer"] is None and item["embedding"] is None]
+        if to_encode:
+            try:
+                with STAGE_DURATION.time(pipeline="query", stage="embed"):
+                    embeddings = self.embedder.encode([questions[i] for i in to_encode], use_cache=False)
+            except Exception as e:
+                self.logger.error(f"Ошибка пакетного эмбеддинга вопросов: {e}")
+                self._fail_batch_items(prepared, to_encode, e)
+            else:
+                for i, embedding in zip(to_encode, embeddings):
+                    prepared[i]["embedding"] = embedding
+                    self._store_embedding(prepared[i]["key"], embedding)
+
+        to_retrieve = []
+        for i, item in enumerate(prepared):
+            if item["answer"] is not None or item["error"] is not None:
+                continue
+            item["answer"] = self._lookup_similar_answer(item["embedding"])
+            if item["answer"] is None:
+                item["results"] = self._lookup_retrieval(item["embedding"])
+                if item["results"] is None:
+                    to_retrieve.append(i)
+
+        if to_retrieve:
+            try:
+                results = self._retrieve_batch(
+                    [questions[i] for i in to_retrieve],
+                    [prepared[i]["embedding"] for i in to_retrieve]
+                )
+            except Exception as e:
+                self.logger.error(f"Ошибка пакетного поиска документов: {e}")
+                self._fail_batch_items(prepared, to_retrieve, e)
+            else:
+                for i, result in zip(to_retrieve, results):
+                    prepared[i]["results"] = result
+                    self._store_retrieval(prepared[i]["embedding"], result, prepared[i]["generation"])
+        return prepared
+
+    def _finish_batch_item(self, item: dict, output) -> None:
+        """
+        Записывает результат вызова LLM (ответ или исключение) в состояние вопроса пакета
+        и сохраняет ответ в кэш.
+        """
+        if isinstance(output, Exception):
+            self.logger.error(f"Ошибка генерации ответа в пакете: {output}")
+            LLM_REQUESTS.inc(model=self.llm_model_name, status="error")
+            item["error"] = str(output) or type(output).__name__
+            return
+        self._record_llm_usage(output.usage_metadata)
+        item["answer"] = output.content
+        self._store_answer(item["key"], item["embedding"], output.content, item["generation"])
+
+    @staticmethod
+    def _fail_batch_items(prepared: list[dict], indices: list[int], error: Exception) -> None:
+        for i in indices:
+            prepared[i]["error"] = str(error) or type(error).__name__
+
+    @staticmethod
+    def _batch_item(question: str, answer: str | None, error: str | None = None) -> dict:
+        return {"question": question, "answer": answer, "error": error}
+
+    async def _aprepare(
+        self, question: str, with_results: bool = False
+    ) -> tuple[str | None, int | None, Any, str | None, dict | None]:
+        """
+        Общая для `agenerate` и `astream` часть: поиск ответа в кэше, эмбеддинг вопроса
+        и поиск документов (эмбеддинг и поиск — в пуле потоков, с ограничением конкурентности).
+
+        Args:
+            question (str): Вопрос пользователя.
+            with_results (bool, optional): Искать документы и при ответе из кэша (источники для `astream`):
+                эмбеддинг и результаты поиска обычно тоже берутся из кэша. Defaults to False.
+
+        Returns:
+            tuple: Ключ кэша, поколение коллекции, эмбеддинг вопроса, готовый ответ из кэша (или None)
+                и результаты поиска (None, если ответ взят из кэша без поиска).
+        """
+        key, generation, answer = self._lookup_answer(question)
+        if answer is not None and not with_results:
+            return key, generation, None, answer, None
+
+        question_emb = self._lookup_embedding(key)
+        if question_emb is None:
+            question_emb = await self._aencode_question(question)
+            self._store_embedding(key, question_emb)
+        if answer is None:
+            answer = self._lookup_similar_answer(question_emb)
+            if answer is not None and not with_results:
+                return key, generation, question_emb, answer, None
+
+        results = self._lookup_retrieval(question_emb)
+        if results is None:
+            async with self._retrieve_limit:
+                results = await self._run_in_executor(self._retrieve, question, question_emb)
+            self._store_retrieval(question_emb, results, generation)
+        return key, generation, question_emb, answer, results
+
+    @staticmethod
+    def _sources(results: dict | None) -> list[dict]:
+        """
+        Преобразует результаты поиска в список источников для клиента.
+
+        Args:
+            results (dict | None): Результаты поиска в формате ChromaDB.
+
+        Returns:
+            list[dict]: Источники: uid, текст, метаданные и расстояние (если известно).
+        """
+        if not results:
+            return []
+        ids = results.get("ids", [[]])[0]
+        documents = results.get("documents", [[]])[0]
+        metadatas = results.get("metadatas", [[]])[0] or [None] * len(ids)
+        distances = (results.get("distances") or [[]])[0] or [None] * len(ids)
+        return [
+            {"uid": uid, "text": text, "metadata": metadata, "distance": distance}
+            for uid, text, metadata, distance in zip(ids, documents, metadatas, distances)
+        ]
+
+    def _retrieve(self, question: str, question_emb) -> dict:
+        """
+        Ищет релевантные документы для одного вопроса (см. `_retrieve_batch`).
+
+        Args:
+            question (str): Вопрос пользователя.
+            question_emb (np.ndarray): Эмбеддинг вопроса.
+
+        Returns:
+            dict: Результаты поиска в формате ChromaDB.
+        """
+        return self._retrieve_batch([question], [question_emb])[0]
+
+    def _retrieve_batch(self, questions: list[str], question_embs) -> list[dict]:
+        """
+        Ищет релевантные документы для нескольких вопросов: только по эмбеддингу или гибридно
+        (BM25 + эмбеддинги), в зависимости от `answer_generator.retrieval.mode`. Плотный поиск
+        выполняется одним вызовом векторной БД сразу для всех вопросов. Если включено
+        `collapse_chunks`, найденные чанки одного документа склеиваются.
+
+        Args:
+            questions (list[str]): Вопросы пользователей.
+            question_embs (np.ndarray): Эмбеддинги вопросов (в том же порядке).
+
+        Returns:
+            list[dict]: Результаты поиска в формате ChromaDB, по одному на вопрос.
+        """
+        started = time.perf_counter()
+        hybrid = self.lexical_index is not None and self.retrieval_config.get('mode', 'dense') == 'hybrid'
+        n_results = max(self.top_k, self.retrieval_config['candidates']) if hybrid else self.top_k
+        dense = self.vector_db.query_batch(question_embs, n_results)
+        results = []
+        for i, question in enumerate(questions):
+            result = {key: [dense[key][i]] for key in ("ids", "documents", "metadatas", "distances") if dense.get(key) is not None}
+            if hybrid:
+                result = self._fuse(result, self.lexical_index.search(question, n_results))
+            if self.retrieval_config.get('collapse_chunks', False):
+                result = collapse_chunks(result)
+            results.append(result)
+        STAGE_DURATION.observe(time.perf_counter() - started, pipeline="query", stage="retrieve")
+        return results
+
+    def _fuse(self, dense: dict, lexical: list[tuple[str, float]]) -> dict:
+        """
+        Объединяет плотную и лексическую выдачу через reciprocal rank fusion:
+        score(doc) = сумма 1 / (rrf_k + rank) по спискам, где документ встретился.
+        Тексты документов, найденных только по BM25, дочитываются из хранилища одним запросом.
+
+        Args:
+            dense (dict): Результат поиска по эмбеддингу (формат ChromaDB).
+            lexical (list[tuple[str, float]]): Результат BM25: пары (uid, score).
+
+        Returns:
+            dict: top_k документов в формате ChromaDB; `distances` — None для найденных только по BM25,
+                `scores` — итоговые RRF-оценки.
+        """
+        rrf_k = self.retrieval_config['rrf_k']
+        dense_ids = dense.get("ids", [[]])[0]
+        scores: dict[str, float] = {}
+        for rank, uid in enumerate(dense_ids, start=1):
+            scores[uid] = scores.get(uid, 0.0) + 1.0 / (rrf_k + rank)
+        for rank, (uid, _) in enumerate(lexical, start=1):
+            scores[uid] = scores.get(uid, 0.0) + 1.0 / (rrf_k + rank)
+
+        found = {
+            uid: (text, meta, distance)
+            for uid, text, meta, distance in zip(
+                dense_ids, dense.get("documents", [[]])[0], dense.get("metadatas", [[]])[0], dense.get("distances", [[]])[0]
+            )
+        }
+        missing = [uid for uid in scores if uid not in found]
+        if missing:
+            extra = self.vector_db.get(missing)
+            for uid, text, meta in zip(extra["ids"], extra["documents"], extra["metadatas"]):
+                found[uid] = (text, meta, None)
+
+        ranked = sorted((uid for uid in scores if uid in found), key=scores.get, reverse=True)[:self.top_k]
+        self.logger.debug(f"Гибридный поиск: dense={len(dense_ids)}, bm25={len(lexical)}, итог={len(ranked)}")
+        return {
+            "ids": [ranked],
+            "documents": [[found[uid][0] for uid in ranked]],
+            "metadatas": [[found[uid][1] for uid in ranked]],
+            "distances": [[found[uid][2] for uid in ranked]],
+            "scores": [[scores[uid] for uid in ranked]],
+        }
+
+    async def _aencode_question(self, question: str):
+        """
+        Асинхронно вычисляет эмбеддинг вопроса: через микробатчер, если он включён,
+        иначе отдельным вызовом модели в пуле потоков.
+
+        Args:
+            question (str): Вопрос пользователя.
+
+        Returns:
+            np.ndarray: Нормализованный эмбеддинг вопроса.
+        """
+        with STAGE_DURATION.time(pipeline="query", stage="embed"):
+            if self.micro_batcher is not None:
+                return await self.micro_batcher.encode(question)
+            async with self._embed_limit:
+                return await self._run_in_executor(self.embedder.encode, question)
+
+    async def _run_in_executor(self, fn: Callable, *args):
+        """
+        Выполняет функцию в пуле потоков генератора в копии текущего контекста,
+        чтобы идентификатор запроса сохранялся в логах из рабочих потоков.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(contextvars.copy_context().run, fn, *args))
+
+    @contextmanager
+    def _llm_call(self):
+        """
+        Замеряет длительность вызова LLM и учитывает ошибку вызова в метриках.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            LLM_REQUESTS.inc(model=self.llm_model_name, status="error")
+            raise
+        finally:
+            STAGE_DURATION.observe(time.perf_counter() - started, pipeline="query", stage="llm")
+
+    def _record_llm_usage(self, usage: dict | None) -> None:
+        """
+        Учитывает успешный вызов LLM и число токенов по данным провайдера (`usage_metadata` LangChain).
+        """
+        LLM_REQUESTS.inc(model=self.llm_model_name, status="ok")
+        if usage:
+            LLM_TOKENS.inc(usage.get("input_tokens", 0), model=self.llm_model_name, kind="prompt")
+            LLM_TOKENS.inc(usage.get("output_tokens", 0), model=self.llm_model_name, kind="completion")
+
+    def _lookup_answer(self, question: str) -> tuple[str | None, int | None, str | None]:
+        """
+        Сверяет кэш запросов с текущим поколением коллекции и ищет готовый ответ
+        по точному совпадению нормализованного вопроса.
+
+        Args:
+            question (str): Вопрос пользователя.
+
+        Returns:
+            tuple[str | None, int | None, str | None]: Ключ кэша, поколение коллекции и ответ
+                (все None, если кэш выключен).
+        """
+        if self.query_cache is None:
+            return None, None, None
+        generation = self.vector_db.generation
+        self.query_cache.sync(generation)
+        key = self.query_cache.normalize(question)
+        return key, generation, self.query_cache.get_answer(key)
+
+    def _lookup_embedding(self, key: str | None):
+        return self.query_cache.get_embedding(key) if self.query_cache else None
+
+    def _store_embedding(self, key: str | None, embedding) -> None:
+        if self.query_cache:
+            self.query_cache.put_embedding(key, embedding)
+
+    def _lookup_similar_answer(self, embedding) -> str | None:
+        return self.query_cache.get_similar_answer(embedding) if self.query_cache else None
+
+    def _lookup_retrieval(self, embedding) -> dict | None:
+        return self.query_cache.get_retrieval(embedding) if self.query_cache else None
+
+    def _store_retrieval(self, embedding, results: dict, generation: int | None) -> None:
+        if self.query_cache:
+            self.query_cache.put_retrieval(embedding, results, generation)
+
+    def _store_answer(self, key: str | None, embedding, answer: str, generation: int | None) -> None:
+        if self.query_cache and answer:
+            self.query_cache.put_answer(key, embedding, answer, generation)
+
+    def _build_prompt(self, question: str, results: dict) -> str:
+        """
+        Собирает промпт для LLM из вопроса и найденных в векторной БД фрагментов.
+
+        Args:
+            question (str): Вопрос пользователя.
+            results (dict): Результат поиска в векторной БД.
+
+        Returns:
+            str: Полный промпт.
+        """
+        started = time.perf_counter()
         docs = results.get("documents", [[]])[0]
         relevant_chunks = [text for text in docs if isinstance(text, str) and text.strip()]
         
         self.logger.debug(f"Найдено {len(relevant_chunks)} релевантных чанков.")
-        context = "\n".join(relevant_chunks)
+        if self.context_builder is not None:
+            context, stats = self.context_builder.build(relevant_chunks)
+            tokenizer = self.context_builder.encoding_name or "оценка по символам"
+            self.logger.info(
+                f"Контекст: {stats['context_tokens']} из {stats['total_tokens']} токенов ({tokenizer}) "
+                f"(сэкономлено {stats['saved_tokens']}), документов {stats['used_documents']}/{stats['documents']}, "
+                f"дублей {stats['duplicates']}, обрезано {stats['truncated']}"
+            )
+        else:
+            context = "\n".join(relevant_chunks)
         
         prompt = self.config['prompt']
         
@@ -70,7 +642,5 @@ class Generator:
         )
         
         self.logger.debug(f"Промпт: {full_prompt}")
-        
-        output = self.llm_model.invoke(full_prompt)
-        
-        return output.content
\ No newline at end of file
+        STAGE_DURATION.observe(time.perf_counter() - started, pipeline="query", stage="prompt")
+        return full_prompt
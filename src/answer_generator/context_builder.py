@@ -0,0 +1,148 @@
+import re
+import threading
+from typing import Callable
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+_WORD = re.compile(r"\w+")
+
+# Оценка длины в токенах, если токенизатор модели недоступен (кириллица в BPE-словарях OpenAI — ~3 символа на токен)
+APPROX_CHARS_PER_TOKEN = 3
+# Кодировка tiktoken для моделей, которых нет в таблице tiktoken (модели других провайдеров)
+FALLBACK_ENCODING = "o200k_base"
+
+
+def _shingles(text: str, size: int = 3) -> set[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class ContextBuilder:
+    """
+    Упаковывает найденные документы в контекст промпта в пределах бюджета токенов.
+
+    Документы берутся в порядке релевантности (как их вернул поиск), почти-дубликаты уже
+    взятых фрагментов отбрасываются (близость Жаккара по шинглам из слов), документ,
+    который не помещается в остаток бюджета, обрезается по границе предложения.
+    Токены считаются токенизатором целевой модели (tiktoken); если он недоступен —
+    приблизительно, по числу символов.
+    """
+    def __init__(self, context_config: dict, model_name: str):
+        """
+        Args:
+            context_config (dict): Секция `answer_generator.context` конфигурации.
+            model_name (str): Имя LLM-модели, под токенизатор которой считается бюджет.
+        """
+        self.max_tokens = context_config['max_tokens']
+        self.dedup_threshold = context_config.get('dedup_threshold')
+        self.model_name = model_name
+        self.encoding_name: str | None = None
+        self._count: Callable[[str], int] | None = None
+        self._lock = threading.Lock()
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Считает число токенов текста токенизатором целевой модели.
+
+        Args:
+            text (str): Текст.
+
+        Returns:
+            int: Число токенов.
+        """
+        if self._count is None:
+            self._load_tokenizer()
+        return self._count(text)
+
+    def _load_tokenizer(self) -> None:
+        """
+        Загружает кодировку tiktoken для модели (один раз). Если tiktoken не установлен
+        или словарь кодировки недоступен, включается приблизительный подсчёт.
+        """
+        with self._lock:
+            if self._count is not None:
+                return
+            try:
+                import tiktoken
+                try:
+                    encoding = tiktoken.encoding_for_model(self.model_name)
+                except KeyError:
+                    encoding = tiktoken.get_encoding(FALLBACK_ENCODING)
+                self.encoding_name = encoding.name
+                self._count = lambda text: len(encoding.encode(text, disallowed_special=()))
+            except Exception:
+                self.encoding_name = None
+                self._count = lambda text: (len(text) + APPROX_CHARS_PER_TOKEN - 1) // APPROX_CHARS_PER_TOKEN
+
+    def build(self, documents: list[str]) -> tuple[str, dict]:
+        """
+        Собирает контекст из документов в порядке релевантности.
+
+        Args:
+            documents (list[str]): Тексты найденных документов, самые релевантные первыми.
+
+        Returns:
+            tuple[str, dict]: Контекст и статистика: сколько токенов заняли бы все документы
+                (`total_tokens`), сколько занял контекст (`context_tokens`), сколько сэкономлено
+                (`saved_tokens`), сколько документов взято, отброшено как дубли и обрезано.
+        """
+        separator_tokens = self.count_tokens("\n")
+        parts, taken_shingles = [], []
+        used = total = duplicates = truncated = 0
+        for text in documents:
+            tokens = self.count_tokens(text)
+            total += tokens + (separator_tokens if total else 0)
+
+            shingles = _shingles(text) if self.dedup_threshold is not None else None
+            if shingles is not None and any(self._jaccard(shingles, seen) >= self.dedup_threshold for seen in taken_shingles):
+                duplicates += 1
+                continue
+
+            remaining = self.max_tokens - used - (separator_tokens if parts else 0)
+            if tokens > remaining:
+                text, tokens = self._truncate(text, remaining)
+                if not text:
+                    continue
+                truncated += 1
+            used += tokens + (separator_tokens if parts else 0)
+            parts.append(text)
+            if shingles is not None:
+                taken_shingles.append(shingles)
+
+        stats = {
+            "documents": len(documents),
+            "used_documents": len(parts),
+            "duplicates": duplicates,
+            "truncated": truncated,
+            "total_tokens": total,
+            "context_tokens": used,
+            "saved_tokens": total - used,
+        }
+        return "\n".join(parts), stats
+
+    def _truncate(self, text: str, budget: int) -> tuple[str, int]:
+        """
+        Оставляет начальные предложения текста, которые помещаются в бюджет.
+
+        Args:
+            text (str): Текст документа.
+            budget (int): Доступное число токенов.
+
+        Returns:
+            tuple[str, int]: Обрезанный текст (пустой, если не помещается даже первое предложение) и его длина в токенах.
+        """
+        sentences = _SENTENCE_END.split(text)
+        space_tokens = self.count_tokens(" ")
+        kept, used = [], 0
+        for sentence in sentences:
+            tokens = self.count_tokens(sentence) + (space_tokens if kept else 0)
+            if used + tokens > budget:
+                break
+            kept.append(sentence)
+            used += tokens
+        return " ".join(kept), used
+
+    @staticmethod
+    def _jaccard(a: set[str], b: set[str]) -> float:
+        return len(a & b) / len(a | b) if a or b else 1.0
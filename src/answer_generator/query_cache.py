@@ -0,0 +1,232 @@
+import hashlib
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Hashable
+
+import numpy as np
+
+from src.metrics import CACHE_LOOKUPS
+
+_TRAILING_PUNCTUATION = " ?!.,;:"
+_WHITESPACE = re.compile(r"\s+")
+
+
+class TTLCache:
+    """
+    Потокобезопасный LRU-кэш с ограничением по размеру и временем жизни записей.
+    """
+    def __init__(self, max_size: int, ttl_seconds: float):
+        """
+        Args:
+            max_size (int): Максимальное количество записей (при переполнении вытесняются самые старые по использованию).
+            ttl_seconds (float): Время жизни записи в секундах.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any | None:
+        """
+        Возвращает значение по ключу или None, если записи нет или она устарела.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Сохраняет значение, вытесняя самые давно использованные записи при переполнении.
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def values(self) -> list[Any]:
+        """
+        Возвращает неустаревшие значения (без обновления порядка LRU).
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [value for expires_at, value in self._data.values() if expires_at >= now]
+
+    def clear(self) -> None:
+        """
+        Удаляет все записи.
+        """
+        with self._lock:
+            self._data.clear()
+
+
+class QueryCache:
+    """
+    Многоуровневый кэш для популярных вопросов:
+
+    1. нормализованный вопрос -> эмбеддинг вопроса;
+    2. эмбеддинг вопроса -> результат поиска в векторной БД;
+    3. нормализованный вопрос -> ответ LLM (точное совпадение и, опционально,
+       поиск по косинусной близости эмбеддингов вопросов не ниже порога).
+
+    Уровни 2 и 3 зависят от содержимого коллекции и сбрасываются,
+    как только меняется номер поколения векторной БД.
+    """
+    def __init__(self, cache_config: dict):
+        """
+        Args:
+            cache_config (dict): Секция `answer_generator.cache` конфигурации.
+        """
+        self.embeddings = self._make_tier(cache_config['embeddings'])
+        self.retrievals = self._make_tier(cache_config['retrieval'])
+        self.answers = self._make_tier(cache_config['answers'])
+        self.similarity_threshold = cache_config['answers'].get('similarity_threshold')
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self._generation: int | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _make_tier(tier_config: dict) -> TTLCache:
+        return TTLCache(tier_config['max_size'], tier_config['ttl_seconds'])
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        """
+        Нормализует вопрос: нижний регистр, схлопывание пробелов, без концевой пунктуации.
+
+        Args:
+            question (str): Вопрос пользователя.
+
+        Returns:
+            str: Нормализованный вопрос.
+        """
+        return _WHITESPACE.sub(" ", question.lower()).strip(_TRAILING_PUNCTUATION)
+
+    @staticmethod
+    def _embedding_key(embedding: np.ndarray) -> str:
+        return hashlib.md5(np.ascontiguousarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+
+    def sync(self, generation: int) -> None:
+        """
+        Сбрасывает зависящие от коллекции уровни кэша, если коллекция изменилась.
+
+        Args:
+            generation (int): Текущий номер поколения векторной БД.
+        """
+        with self._lock:
+            if generation == self._generation:
+                return
+            self.retrievals.clear()
+            self.answers.clear()
+            self._generation = generation
+
+    def get_embedding(self, key: str) -> np.ndarray | None:
+        """
+        Возвращает закэшированный эмбеддинг нормализованного вопроса.
+        """
+        return self._count("embeddings", self.embeddings.get(key))
+
+    def put_embedding(self, key: str, embedding: np.ndarray) -> None:
+        """
+        Сохраняет эмбеддинг нормализованного вопроса.
+        """
+        self.embeddings.set(key, embedding)
+
+    def get_retrieval(self, embedding: np.ndarray) -> dict | None:
+        """
+        Возвращает закэшированный результат поиска для эмбеддинга вопроса.
+        """
+        return self._count("retrieval", self.retrievals.get(self._embedding_key(embedding)))
+
+    def put_retrieval(self, embedding: np.ndarray, results: dict, generation: int) -> None:
+        """
+        Сохраняет результат поиска для эмбеддинга вопроса, если коллекция
+        не изменилась с момента `sync(generation)`.
+        """
+        if generation == self._generation:
+            self.retrievals.set(self._embedding_key(embedding), results)
+
+    def get_answer(self, key: str) -> str | None:
+        """
+        Ищет ответ по точному совпадению нормализованного вопроса.
+
+        Args:
+            key (str): Нормализованный вопрос.
+
+        Returns:
+            str | None: Закэшированный ответ или None.
+        """
+        item = self._count("answers", self.answers.get(key))
+        return item[1] if item is not None else None
+
+    def get_similar_answer(self, embedding: np.ndarray) -> str | None:
+        """
+        Ищет ответ на самый близкий закэшированный вопрос, если его косинусная близость
+        не ниже `similarity_threshold`. При незаданном пороге всегда возвращает None.
+
+        Args:
+            embedding (np.ndarray): Нормализованный эмбеддинг вопроса.
+
+        Returns:
+            str | None: Закэшированный ответ или None.
+        """
+        if self.similarity_threshold is None:
+            return None
+        item = self._count("similar_answers", self._most_similar(embedding))
+        return item[1] if item is not None else None
+
+    def put_answer(self, key: str, embedding: np.ndarray, answer: str, generation: int) -> None:
+        """
+        Сохраняет ответ на нормализованный вопрос, если коллекция
+        не изменилась с момента `sync(generation)`.
+        """
+        if generation == self._generation:
+            self.answers.set(key, (np.asarray(embedding, dtype=np.float32), answer))
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику попаданий по уровням кэша.
+
+        Returns:
+            dict: Для каждого уровня — размер, попадания и промахи.
+        """
+        tiers = {
+            "embeddings": self.embeddings,
+            "retrieval": self.retrievals,
+            "answers": self.answers,
+            "similar_answers": self.answers,
+        }
+        return {
+            name: {"size": len(tier), "hits": self.hits[name], "misses": self.misses[name]}
+            for name, tier in tiers.items()
+        }
+
+    def _most_similar(self, embedding: np.ndarray) -> tuple[np.ndarray, str] | None:
+        items = self.answers.values()
+        if not items:
+            return None
+        matrix = np.stack([item[0] for item in items])
+        scores = matrix @ np.asarray(embedding, dtype=np.float32)
+        best = int(np.argmax(scores))
+        return items[best] if scores[best] >= self.similarity_threshold else None
+
+    def _count(self, tier: str, value: Any) -> Any:
+        if value is None:
+            self.misses[tier] += 1
+        else:
+            self.hits[tier] += 1
+        CACHE_LOOKUPS.inc(cache=f"query_{tier}", result="miss" if value is None else "hit")
+        return value
@@ -1,68 +1,329 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+from contextlib import asynccontextmanager, suppress
+from functools import partial
+import asyncio
 import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
 
-from src.indexing import Indexer
+from configs import config, request_id_var
+from src.indexing import Indexer, IndexingJob, JobQueueFull
 from src.answer_generator import Generator
+from src.api.services import Services
+from src.metrics import REGISTRY, HTTP_REQUEST_DURATION
+
+services = Services()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Инициализирует хранилища, индексатор и генератор и прогревает модель эмбеддингов при старте сервиса.
+    Модель загружается один раз и используется и индексатором, и генератором.
+
+    При `api.startup.background` инициализация идёт в фоновом потоке: сервис сразу принимает соединения
+    и отвечает на `/healthz`, а `/readyz` возвращает 503, пока модели и хранилища не готовы.
+    """
+    if config['api']['startup'].get('background', False):
+        asyncio.get_running_loop().run_in_executor(None, services.initialize)
+    else:
+        await run_in_threadpool(services.initialize)
+    yield
+    services.shutdown()
 
 app =FastAPI(
     title="Loymax RAG QA service",
-    version="0.0.1"
+    version="0.0.1",
+    lifespan=lifespan
 )
 app.mount("/static", StaticFiles(directory="src/api/static"), name="static")
 
-indexer = Indexer()
-generator = Generator()
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """
+    Назначает запросу идентификатор (из заголовка `X-Request-ID` или новый), который попадает
+    во все записи логов этого запроса и в заголовок ответа, и замеряет длительность запроса.
+    """
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            path=getattr(route, "path", "unmatched"),
+            status=status
+        )
+        request_id_var.reset(token)
 
 class Document(BaseModel):
+    # Поля помимо uid и text сохраняются как метаданные документа (source, where-фильтры /delete, doc_hash)
+    model_config = ConfigDict(extra="allow")
+
     uid: str
     text: str
     
+class DeleteRequest(BaseModel):
+    uids: list[str] | None = None
+    where: dict | None = None
+
 class QueryRequest(BaseModel):
     question: str
+
+class QueryBatchRequest(BaseModel):
+    questions: list[str]
     
-@app.post("/index_text")
+def _indexer() -> Indexer:
+    """
+    Возвращает индексатор, если сервис готов.
+
+    Raises:
+        HTTPException: 503, пока идёт инициализация сервиса.
+    """
+    if not services.ready:
+        raise HTTPException(status_code=503, detail="Сервис запускается", headers={"Retry-After": "5"})
+    return services.indexer
+
+def _generator() -> Generator:
+    """
+    Возвращает генератор ответов, если сервис готов.
+
+    Raises:
+        HTTPException: 503, пока идёт инициализация сервиса.
+    """
+    if not services.ready:
+        raise HTTPException(status_code=503, detail="Сервис запускается", headers={"Retry-After": "5"})
+    return services.generator
+
+def _submit_job(kind: str, fn, *args, on_finish=None) -> dict:
+    """
+    Ставит задачу индексации в очередь фонового пула.
+
+    Raises:
+        HTTPException: Если очередь задач заполнена.
+
+    Returns:
+        dict: Идентификатор и статус созданной задачи.
+    """
+    try:
+        job = services.job_manager.submit(kind, fn, *args, on_finish=on_finish)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Очередь индексации заполнена: {e}")
+    return {"job_id": job.id, "status": job.status}
+
+def _remove_file(path: str) -> None:
+    with suppress(FileNotFoundError):
+        os.remove(path)
+
+async def _submit_uploaded_file(kind: str, fn, file: UploadFile) -> dict:
+    """
+    Сохраняет загруженный файл во временный файл и ставит его обработку (`Indexer.index_file`
+    или `Indexer.upsert_file`) в очередь фонового пула. Временный файл удаляется при любом
+    конечном статусе задачи, в том числе при отмене до запуска.
+
+    Raises:
+        HTTPException: Если формат файла не поддерживается, ошибка сохранения файла или очередь заполнена.
+
+    Returns:
+        dict: Идентификатор и статус созданной задачи.
+    """
+    file_format = file.filename.rsplit(".", 1)[-1].lower()
+    if file_format not in ("json", "jsonl"):
+        raise HTTPException(status_code=400, detail="Только .json и .jsonl файлы поддерживаются.")
+    try:
+        with tempfile.NamedTemporaryFile(suffix=f".{file_format}", delete=False) as tmp:
+            await run_in_threadpool(shutil.copyfileobj, file.file, tmp)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Ошибка загрузки: {e}")
+    try:
+        return _submit_job(kind, fn, tmp.name, file_format, on_finish=partial(_remove_file, tmp.name))
+    except HTTPException:
+        _remove_file(tmp.name)
+        raise
+
+@app.post("/index_text", status_code=202)
 async def index_documents_text(docs: list[Document]):
     """
-    Индексирует список документов, переданных в теле запроса (JSON).
+    Ставит в очередь индексацию списка документов, переданных в теле запроса (JSON).
     
     Args:
-        docs (list[Document]): Список документов, каждый с полями 'uid' и 'text'.
+        docs (list[Document]): Список документов с полями 'uid', 'text' и произвольными полями метаданных.
     
     Returns:
-        dict: Информация о количестве добавленных документов.
+        dict: Идентификатор фоновой задачи индексации.
     """
     docs_dict = [doc.model_dump() for doc in docs]
-    added = indexer.index(docs_dict)
-    return {"added": added, "message": f"Добавлено {len(added)} документов"}
+    return _submit_job("index_text", _indexer().index_stream, docs_dict)
 
-@app.post("/index_file")
+@app.post("/index_file", status_code=202)
 async def index_documents_file(file: UploadFile = File(...)):
     """
-    Индексирует документы из загруженного JSON-файла.
+    Ставит в очередь потоковую индексацию загруженного файла (JSON-массив или JSONL).
+    Файл сохраняется во временный файл, затем документы разбираются инкрементально
+    и индексируются батчами фиксированного размера в фоновой задаче.
     
     Args:
-        file (UploadFile): JSON-файл со списком документов для индексации.
+        file (UploadFile): JSON- или JSONL-файл со списком документов для индексации.
     
     Raises:
-        HTTPException: Если файл не .json, формат неверный или ошибка чтения.
+        HTTPException: Если формат файла не поддерживается, ошибка сохранения файла или очередь заполнена.
     
     Returns:
-        dict: Информация о статусе и количестве добавленных документов.
+        dict: Идентификатор фоновой задачи индексации.
     """
-    if not file.filename.endswith(".json"):
-        raise HTTPException(status_code=400, detail="Только .json файлы поддерживаются.")
-    try:
-        content = await file.read()
-        docs = json.loads(content)
-        if not isinstance(docs, list):
-            raise ValueError("В JSON должен быть список документов")
-        added = indexer.index(docs)
-        return {"status": "ok", "added_docs": added}
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Ошибка загрузки: {e}")
-        
+    return await _submit_uploaded_file("index_file", _indexer().index_file, file)
+
+@app.post("/upsert_text", status_code=202)
+async def upsert_documents_text(docs: list[Document]):
+    """
+    Ставит в очередь upsert документов по uid: новые добавляются, изменившиеся (текст или метаданные)
+    перезаписываются, не изменившиеся пропускаются без пересчёта эмбеддингов.
+    Результат задачи — количество добавленных, изменённых и не изменившихся документов.
+
+    Args:
+        docs (list[Document]): Список документов с полями 'uid', 'text' и произвольными полями метаданных.
+
+    Returns:
+        dict: Идентификатор фоновой задачи.
+    """
+    docs_dict = [doc.model_dump() for doc in docs]
+    return _submit_job("upsert_text", _indexer().upsert_stream, docs_dict)
+
+@app.post("/upsert_file", status_code=202)
+async def upsert_documents_file(file: UploadFile = File(...)):
+    """
+    Ставит в очередь потоковый upsert документов из загруженного файла (JSON-массив или JSONL).
+
+    Args:
+        file (UploadFile): JSON- или JSONL-файл со списком документов.
+
+    Raises:
+        HTTPException: Если формат файла не поддерживается, ошибка сохранения файла или очередь заполнена.
+
+    Returns:
+        dict: Идентификатор фоновой задачи.
+    """
+    return await _submit_uploaded_file("upsert_file", _indexer().upsert_file, file)
+
+@app.post("/delete")
+async def delete_documents(request: DeleteRequest):
+    """
+    Удаляет документы по uid и/или по фильтру метаданных (поле -> значение или список значений)
+    из векторной БД, BM25-индекса и индекса почти-дубликатов.
+
+    Args:
+        request (DeleteRequest): uid документов и/или фильтр по метаданным.
+
+    Raises:
+        HTTPException: Если не переданы ни uid, ни фильтр.
+
+    Returns:
+        dict: Количество удалённых документов и не найденных uid.
+    """
+    if not request.uids and not request.where:
+        raise HTTPException(status_code=400, detail="Нужно передать uids или where")
+    return await run_in_threadpool(_indexer().delete, request.uids, request.where)
+
+@app.get("/jobs")
+async def list_jobs():
+    """
+    Возвращает список фоновых задач индексации с их статусом и прогрессом.
+
+    Returns:
+        list[dict]: Состояние задач.
+    """
+    return [job.to_dict() for job in services.job_manager.list()]
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Возвращает статус и прогресс задачи индексации: сколько документов прочитано,
+    отфильтровано, пропущено через эмбеддер и записано в БД.
+
+    Args:
+        job_id (str): Идентификатор задачи.
+
+    Raises:
+        HTTPException: Если задача не найдена.
+
+    Returns:
+        dict: Состояние задачи.
+    """
+    job = services.job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Отменяет задачу индексации. Задача в очереди снимается сразу,
+    выполняющаяся останавливается на границе ближайшего батча.
+
+    Args:
+        job_id (str): Идентификатор задачи.
+
+    Raises:
+        HTTPException: Если задача не найдена.
+
+    Returns:
+        dict: Состояние задачи после запроса отмены.
+    """
+    job = services.job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job.to_dict()
+
+@app.get("/healthz")
+async def healthz():
+    """
+    Проверка живости процесса (liveness): отвечает сразу после запуска, не дожидаясь загрузки моделей.
+    Возвращает 503, только если инициализация сервиса завершилась ошибкой и процесс нужно перезапустить.
+
+    Returns:
+        dict | JSONResponse: Статус процесса.
+    """
+    if services.error is not None:
+        return JSONResponse({"status": "failed", "error": services.error}, status_code=503)
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Проверка готовности (readiness): 200, когда хранилища открыты и модель эмбеддингов загружена и прогрета,
+    иначе 503. В ответе — время этапов старта в секундах.
+
+    Returns:
+        JSONResponse: Статус готовности и время этапов старта.
+    """
+    if services.ready:
+        return JSONResponse({"status": "ready", "timings": services.timings})
+    status = "failed" if services.error is not None else "starting"
+    return JSONResponse({"status": status, "timings": services.timings, "error": services.error}, status_code=503)
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Метрики процесса в текстовом формате Prometheus: длительности этапов пайплайнов и HTTP-запросов,
+    отброшенные предобработкой документы, попадания в кэши, дедупликация при записи и токены LLM.
+
+    Returns:
+        PlainTextResponse: Метрики (`text/plain; version=0.0.4`).
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.post("/query")
 async def generate_answer(query: QueryRequest):
@@ -78,8 +339,61 @@ async def generate_answer(query: QueryRequest):
     Returns:
         dict: Ответ модели (LLM) на заданный вопрос.
     """
-    answer = generator.generate(query.question)
+    answer = await _generator().agenerate(query.question)
     
     if not answer:
         raise HTTPException(status_code=500, detail="Ошибка генерации ответа")
-    return {"answer": answer}
\ No newline at end of file
+    return {"answer": answer}
+
+@app.post("/query_batch")
+async def generate_answers_batch(query: QueryBatchRequest):
+    """
+    Генерирует ответы на пакет вопросов: эмбеддинг и поиск выполняются сразу для всех вопросов,
+    вызовы LLM — параллельно с ограничением конкурентности. Ошибка на отдельном вопросе
+    не прерывает пакет и возвращается в поле `error` этого вопроса.
+
+    Args:
+        query (QueryBatchRequest): Объект со списком вопросов.
+
+    Raises:
+        HTTPException: Если вопросов больше `answer_generator.batch.max_questions`.
+
+    Returns:
+        dict: Результаты в порядке вопросов (`question`, `answer`, `error`).
+    """
+    max_questions = config['answer_generator']['batch']['max_questions']
+    if len(query.questions) > max_questions:
+        raise HTTPException(status_code=413, detail=f"Слишком много вопросов в пакете (максимум {max_questions})")
+    return {"results": await _generator().agenerate_batch(query.questions)}
+
+@app.post("/query/stream")
+async def stream_answer(query: QueryRequest):
+    """
+    Генерирует ответ на вопрос пользователя потоком Server-Sent Events.
+
+    События:
+    - `sources` — найденные документы (отправляется первым, сразу после поиска);
+    - `token` — очередной фрагмент ответа LLM;
+    - `done` — генерация завершена;
+    - `error` — ошибка генерации.
+
+    Args:
+        query (QueryRequest): Объект с вопросом пользователя.
+
+    Returns:
+        StreamingResponse: Поток событий `text/event-stream`.
+    """
+    generator = _generator()
+
+    async def events():
+        try:
+            async for event, data in generator.astream(query.question):
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps(str(e), ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,100 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from configs import config, setup_logger
+from src.indexing import Indexer, JobManager, model_registry
+from src.answer_generator import Generator
+from src.vector_db import LexicalIndex, VectorStore, create_lexical_index, create_vector_store
+from src.metrics import STAGE_DURATION
+
+WARM_UP_TEXT = "Кто был первым президентом России?"
+
+
+class Services:
+    """
+    Компоненты сервиса: хранилища, индексатор, генератор ответов и пул фоновых задач.
+
+    Тяжёлая часть (открытие хранилищ, загрузка модели эмбеддингов, пробный эмбеддинг) выполняется
+    в `initialize` при старте приложения, а не при импорте модуля. Пока инициализация не завершена,
+    `ready` — False, и сервис отвечает 503 на запросы, которым нужны модели и хранилища.
+    """
+    def __init__(self):
+        self.config = config['api']['startup']
+        self.logger = setup_logger("api.log")
+        self.vector_db: VectorStore | None = None
+        self.lexical_index: LexicalIndex | None = None
+        self.indexer: Indexer | None = None
+        self.generator: Generator | None = None
+        self.job_manager = JobManager(**config['indexing']['jobs'])
+        self.timings: dict[str, float] = {}
+        self.error: str | None = None
+        self._finished = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._finished.is_set() and self.error is None
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """
+        Ждёт завершения инициализации (успешного или с ошибкой).
+
+        Args:
+            timeout (float | None, optional): Максимальное время ожидания в секундах.
+
+        Returns:
+            bool: True, если сервис готов.
+        """
+        self._finished.wait(timeout)
+        return self.ready
+
+    @contextmanager
+    def _stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - started
+        self.timings[name] = round(seconds, 3)
+        STAGE_DURATION.observe(seconds, pipeline="startup", stage=name)
+
+    def initialize(self) -> None:
+        """
+        Создаёт хранилища, индексатор и генератор, при необходимости загружает модель эмбеддингов
+        и прогревает её пробным эмбеддингом, затем пишет в лог время каждого этапа.
+        Ошибка инициализации не пробрасывается, а сохраняется в `error` (сервис остаётся неготовым).
+        """
+        started = time.perf_counter()
+        try:
+            with self._stage("vector_db"):
+                self.vector_db = create_vector_store()
+            with self._stage("lexical_index"):
+                self.lexical_index = create_lexical_index(vector_db=self.vector_db)
+            with self._stage("indexer"):
+                self.indexer = Indexer(self.vector_db, self.lexical_index)
+            with self._stage("generator"):
+                self.generator = Generator(self.vector_db, self.lexical_index)
+            if config['embedder'].get('warm_up_on_startup', False):
+                with self._stage("model"):
+                    model_registry.warm_up()
+            if self.config.get('warm_up_encode', False):
+                with self._stage("warm_up_encode"):
+                    self.generator.embedder.encode([WARM_UP_TEXT], use_cache=False)
+                    if self.generator.context_builder is not None:
+                        self.generator.context_builder.count_tokens(WARM_UP_TEXT)
+            self.timings["total"] = round(time.perf_counter() - started, 3)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.logger.exception(f"Ошибка инициализации сервиса: {self.error}")
+            return
+        finally:
+            self._finished.set()
+        stages = ", ".join(f"{name} {seconds:.2f} с" for name, seconds in self.timings.items())
+        self.logger.info(f"Сервис готов к работе. Время старта: {stages}")
+
+    def shutdown(self) -> None:
+        """
+        Останавливает пул фоновых задач и пул процессов предобработки.
+        """
+        self.job_manager.shutdown(wait=False)
+        if self.indexer is not None:
+            self.indexer.preprocessor.shutdown()
@@ -1,2 +1,4 @@
+from . import model_registry
 from .embedding import Embedder
-from .indexer import Indexer
\ No newline at end of file
+from .indexer import Indexer
+from .jobs import JobManager, IndexingJob, JobCancelled, JobQueueFull
\ No newline at end of file
@@ -0,0 +1,131 @@
+from typing import Any, Callable
+
+from configs import config, setup_logger
+
+CHUNK_SEPARATOR = "#"
+
+
+class Chunker:
+    """
+    Разбивает длинные документы на чанки по числу токенов токенизатора модели эмбеддингов
+    с перекрытием, чтобы текст не терялся при обрезке по максимальной длине последовательности.
+
+    Границы чанков берутся из offset mapping токенизатора, поэтому текст чанка — точная подстрока
+    исходного документа. Документы, которые помещаются в модель целиком, не меняются (uid тот же),
+    чанки длинных документов получают uid вида `<uid>#<номер>`.
+    """
+    def __init__(self, tokenizer_provider: Callable[[], Any], max_seq_length_provider: Callable[[], int]):
+        """
+        Args:
+            tokenizer_provider (Callable[[], Any]): Возвращает быстрый токенизатор HuggingFace
+                (вызывается лениво, при первом разбиении, чтобы не загружать модель раньше времени).
+            max_seq_length_provider (Callable[[], int]): Возвращает максимальную длину последовательности модели.
+        """
+        self.config = config['indexing']['chunking']
+        self._tokenizer_provider = tokenizer_provider
+        self._max_seq_length_provider = max_seq_length_provider
+        self.logger = setup_logger("chunker.log")
+
+    @property
+    def max_tokens(self) -> int:
+        """
+        Максимальное число токенов в чанке: из конфигурации или длина последовательности модели
+        за вычетом служебных токенов [CLS]/[SEP].
+        """
+        return self.config.get('max_tokens') or self._max_seq_length_provider() - 2
+
+    def split(self, docs: list[dict], metadatas: list[dict[str, Any]]) -> tuple[list[dict], list[dict[str, Any]]]:
+        """
+        Разбивает документы на чанки. Все тексты токенизируются одним батчем.
+
+        Args:
+            docs (list[dict]): Документы с полями 'uid' и 'text'.
+            metadatas (list[dict[str, Any]]): Метаданные документов (по одному словарю на документ).
+
+        Returns:
+            tuple[list[dict], list[dict[str, Any]]]: Чанки (uid, text) и их метаданные:
+                к метаданным документа добавляются `parent_uid`, `chunk_index`, `n_chunks`,
+                `char_start`, `char_end`.
+        """
+        if not docs:
+            return [], []
+        max_tokens = self.max_tokens
+        overlap = self.config['overlap_tokens']
+        if not 0 <= overlap < max_tokens:
+            raise ValueError(f"overlap_tokens должен быть в диапазоне [0, {max_tokens})")
+        stride = max_tokens - overlap
+
+        encoded = self._tokenizer_provider()(
+            [doc["text"] for doc in docs], add_special_tokens=False, return_offsets_mapping=True
+        )
+        chunks, chunk_metadatas, n_split = [], [], 0
+        for doc, metadata, offsets in zip(docs, metadatas, encoded["offset_mapping"]):
+            text = doc["text"]
+            windows = [(0, len(text))]
+            if len(offsets) > max_tokens:
+                windows = []
+                for start in range(0, len(offsets), stride):
+                    end = min(start + max_tokens, len(offsets))
+                    windows.append((offsets[start][0], offsets[end - 1][1]))
+                    if end == len(offsets):
+                        break
+                n_split += 1
+
+            for index, (char_start, char_end) in enumerate(windows):
+                uid = doc["uid"] if len(windows) == 1 else f"{doc['uid']}{CHUNK_SEPARATOR}{index}"
+                chunks.append({"uid": uid, "text": text[char_start:char_end]})
+                chunk_metadatas.append({
+                    **metadata,
+                    "parent_uid": doc["uid"],
+                    "chunk_index": index,
+                    "n_chunks": len(windows),
+                    "char_start": char_start,
+                    "char_end": char_end,
+                })
+        if n_split:
+            self.logger.info(f"Разбито на чанки документов: {n_split}, всего чанков: {len(chunks)} из {len(docs)} документов")
+        return chunks, chunk_metadatas
+
+
+def collapse_chunks(results: dict) -> dict:
+    """
+    Склеивает найденные соседние чанки одного документа в один фрагмент.
+    Фрагмент занимает место самого релевантного из своих чанков, чанки склеиваются по порядку,
+    перекрывающиеся части (по `char_start`/`char_end`) не дублируются.
+
+    Args:
+        results (dict): Результаты поиска в формате ChromaDB.
+
+    Returns:
+        dict: Результаты того же формата, где чанки одного документа объединены.
+    """
+    ids = results.get("ids", [[]])[0]
+    documents = results.get("documents", [[]])[0]
+    metadatas = results.get("metadatas", [[]])[0] or [None] * len(ids)
+    extras = {key: results[key][0] for key in ("distances", "scores") if results.get(key) and results[key][0]}
+
+    groups: dict[str, list[int]] = {}
+    for i, metadata in enumerate(metadatas):
+        key = metadata.get("parent_uid", ids[i]) if metadata and metadata.get("n_chunks", 1) > 1 else ids[i]
+        groups.setdefault(key, []).append(i)
+    if len(groups) == len(ids):
+        return results
+
+    collapsed = {key: [] for key in ("ids", "documents", "metadatas", *extras)}
+    for key, members in groups.items():
+        first = members[0]
+        text = documents[first]
+        if len(members) > 1:
+            ordered = sorted(members, key=lambda i: metadatas[i]["chunk_index"])
+            text, end = documents[ordered[0]], metadatas[ordered[0]]["char_end"]
+            for i in ordered[1:]:
+                start = metadatas[i]["char_start"]
+                separator = "" if start <= end else " ... "
+                text += separator + documents[i][max(end - start, 0):]
+                end = max(end, metadatas[i]["char_end"])
+        collapsed["ids"].append(key if len(members) > 1 else ids[first])
+        collapsed["documents"].append(text)
+        collapsed["metadatas"].append(metadatas[first])
+        for name, values in extras.items():
+            collapsed[name].append(values[first])
+    return {key: [values] for key, values in collapsed.items()}
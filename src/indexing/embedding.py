@@ -1,34 +1,171 @@
-from sentence_transformers import SentenceTransformer
+import threading
+
 import numpy as np
 from configs import config
+from src.indexing import model_registry
+from src.indexing.embedding_cache import get_embedding_cache
+from src.utils import calculate_text_hash
 
 class Embedder:
     """
-    Класс для генерации эмбеддингов текстов с помощью SentenceTransformer.
+    Класс для генерации эмбеддингов текстов с помощью SentenceTransformer
+    (на PyTorch или через ONNX Runtime, см. `embedder.backend`).
 
-    Позволяет преобразовывать список строк в нормализованные эмбеддинги 
+    Позволяет преобразовывать список строк в нормализованные эмбеддинги
     для дальнейшего использования в retrieval/search задачах.
+    Сама модель хранится в реестре моделей процесса и загружается один раз
+    при первом обращении, поэтому несколько эмбеддеров разделяют одни веса.
+    Эмбеддинги списков текстов кэшируются на диске по хешу текста (если кэш включён).
+    Списки текстов кодируются батчами из текстов близкой длины в токенах (см. `embedder.batching`),
+    чтобы батчи не дополнялись паддингом до самого длинного текста.
     """
     def __init__(self):
         """
-        Инициализация эмбеддера и загрузка выбранной модели.
+        Инициализация эмбеддера. Модель загружается лениво из реестра моделей.
         """
         self.config = config['embedder']
-        self.model = SentenceTransformer(self.config['model_name'])
+        self.model_name = self.config['model_name']
+        self.backend = self.config.get('backend', 'torch')
+        cache_name = self.model_name if self.backend == 'torch' else f"{self.model_name}@{self.backend}"
+        cache_config = self.config.get('cache', {})
+        self.cache = (
+            get_embedding_cache(cache_config['dir'], cache_name, cache_config.get('dtype', 'float32'))
+            if cache_config.get('enabled', False) else None
+        )
+        self.batching_config = self.config.get('batching', {})
+        self._batching_stats = {"texts": 0, "batches": 0, "tokens": 0, "padded_tokens": 0}
+        # encode вызывается одновременно из задач индексации, пула эмбеддинга /query и микробатчера
+        self._stats_lock = threading.Lock()
+
+    @property
+    def model(self):
+        """
+        Общая для процесса модель из реестра моделей (SentenceTransformer или ONNX Runtime,
+        в зависимости от `embedder.backend`).
+        """
+        return model_registry.get_model(self.model_name, self.backend)
 
-    def encode(self, texts: list[str]) -> np.ndarray:
+    def warm_up(self) -> None:
+        """
+        Явно загружает модель в реестр, не дожидаясь первого запроса.
+        """
+        model_registry.get_model(self.model_name, self.backend)
+
+    def encode(self, texts: list[str], use_cache: bool = True) -> np.ndarray:
         """
         Преобразует список текстов в массив нормализованных эмбеддингов.
+        При включённом кэше модель кодирует только тексты, которых ещё нет в кэше.
 
         Args:
             texts (list[str]): Список строк (предложений или документов) для эмбеддинга.
+            use_cache (bool, optional): Использовать дисковый кэш эмбеддингов.
+                Для вопросов пользователей кэш документов не используется. Defaults to True.
 
         Returns:
             np.ndarray: Массив нормализованных эмбеддингов формы (n_texts, embedding_dim).
         """
-        return self.model.encode(
-            texts,
-            show_progress_bar=True,
-            convert_to_numpy=True,
-            normalize_embeddings=True  
-        )
+        if self.cache is None or not use_cache or isinstance(texts, str) or not texts:
+            return self._encode(texts)
+
+        keys = [calculate_text_hash(text) for text in texts]
+        cached = self.cache.get(keys)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            new_embeddings = self._encode([texts[i] for i in missing])
+            self.cache.put([keys[i] for i in missing], new_embeddings)
+            for i, vector in zip(missing, new_embeddings):
+                cached[i] = vector
+        return np.stack(cached).astype(np.float32, copy=False)
+
+    def cache_stats(self) -> dict:
+        """
+        Возвращает статистику кэша эмбеддингов.
+
+        Returns:
+            dict: Статистика кэша или пустой словарь, если кэш выключен.
+        """
+        return self.cache.stats() if self.cache is not None else {}
+
+    def batching_stats(self) -> dict:
+        """
+        Возвращает накопленную статистику батчинга по длине.
+
+        Returns:
+            dict: Число текстов и батчей, реальные и дополненные паддингом токены
+                и эффективность паддинга (доля реальных токенов во всех обработанных моделью).
+        """
+        with self._stats_lock:
+            stats = dict(self._batching_stats)
+        stats["padding_efficiency"] = stats["tokens"] / stats["padded_tokens"] if stats["padded_tokens"] else 1.0
+        return stats
+
+    def _encode(self, texts: list[str] | str) -> np.ndarray:
+        if isinstance(texts, str) or len(texts) < 2 or not self.batching_config.get('enabled', False):
+            return self.model.encode(
+                texts,
+                show_progress_bar=True,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+        return self._encode_bucketed(texts)
+
+    def _encode_bucketed(self, texts: list[str]) -> np.ndarray:
+        """
+        Кодирует тексты батчами по длине: тексты сортируются по числу токенов (по убыванию),
+        размер каждого батча подбирается так, чтобы batch_size * max_len не превышал бюджет токенов,
+        затем эмбеддинги возвращаются в исходном порядке.
+
+        Args:
+            texts (list[str]): Список текстов.
+
+        Returns:
+            np.ndarray: Массив нормализованных эмбеддингов формы (n_texts, embedding_dim).
+        """
+        model = self.model
+        token_budget = self.batching_config['token_budget']
+        max_batch_size = self.batching_config['max_batch_size']
+        lengths = self._token_lengths(model, texts)
+        order = np.argsort(-lengths, kind="stable")
+
+        embeddings = None
+        padded_tokens = batches = 0
+        start = 0
+        while start < len(order):
+            max_len = int(lengths[order[start]])
+            size = max(1, min(max_batch_size, token_budget // max(max_len, 1)))
+            batch = order[start:start + size]
+            batch_embeddings = model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype=batch_embeddings.dtype)
+            embeddings[batch] = batch_embeddings
+            padded_tokens += len(batch) * max_len
+            batches += 1
+            start += len(batch)
+
+        with self._stats_lock:
+            self._batching_stats["texts"] += len(texts)
+            self._batching_stats["batches"] += batches
+            self._batching_stats["tokens"] += int(lengths.sum())
+            self._batching_stats["padded_tokens"] += padded_tokens
+        return embeddings
+
+    @staticmethod
+    def _token_lengths(model, texts: list[str]) -> np.ndarray:
+        """
+        Считает длину текстов в токенах модели (с учётом обрезки по максимальной длине последовательности).
+
+        Args:
+            model (SentenceTransformer | OnnxSentenceEncoder): Модель эмбеддингов.
+            texts (list[str]): Список текстов.
+
+        Returns:
+            np.ndarray: Длины текстов в токенах.
+        """
+        encoded = model.tokenizer(texts, truncation=True, max_length=model.max_seq_length)
+        return np.fromiter((len(ids) for ids in encoded["input_ids"]), dtype=np.int64, count=len(texts))
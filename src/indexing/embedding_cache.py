@@ -0,0 +1,192 @@
+import json
+import os
+import threading
+
+import numpy as np
+from filelock import FileLock
+
+from src.metrics import CACHE_LOOKUPS
+
+_caches: dict[str, "EmbeddingCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(cache_dir: str, model_name: str, dtype: str = "float32") -> "EmbeddingCache":
+    """
+    Возвращает общий для процесса экземпляр кэша для пары (папка, модель),
+    чтобы несколько эмбеддеров не дописывали одни и те же файлы независимо.
+
+    Args:
+        cache_dir (str): Корневая папка кэша.
+        model_name (str): Название модели.
+        dtype (str, optional): Тип хранения векторов. Defaults to "float32".
+
+    Returns:
+        EmbeddingCache: Экземпляр кэша.
+    """
+    key = os.path.join(os.path.abspath(cache_dir), model_name)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = EmbeddingCache(cache_dir, model_name, dtype)
+        return _caches[key]
+
+
+class EmbeddingCache:
+    """
+    Контентно-адресуемый дисковый кэш эмбеддингов.
+
+    Ключ — хеш текста (`calculate_text_hash`), кэш ведётся отдельно для каждой модели.
+    Векторы хранятся подряд в бинарном файле и читаются через memory-map,
+    ключи — в текстовом файле (по ключу на строку, номер строки = номер вектора).
+    Запись только дописывает в конец файлов, поэтому прерванная запись не портит кэш:
+    при загрузке учитываются только строки, для которых есть и ключ, и вектор.
+    Дописывание из нескольких процессов сериализуется файловой блокировкой; перед записью
+    кэш перечитывается, если файл ключей дописал другой процесс.
+    """
+    def __init__(self, cache_dir: str, model_name: str, dtype: str = "float32"):
+        """
+        Args:
+            cache_dir (str): Корневая папка кэша.
+            model_name (str): Название модели (кэш разных моделей не пересекается).
+            dtype (str, optional): Тип хранения векторов ("float32" или "float16"). Defaults to "float32".
+        """
+        self.dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        os.makedirs(self.dir, exist_ok=True)
+        self.keys_path = os.path.join(self.dir, "keys.txt")
+        self.vectors_path = os.path.join(self.dir, "vectors.bin")
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.dtype = np.dtype(dtype)
+        self.dim: int | None = None
+        self.hits = 0
+        self.misses = 0
+        self._rows: dict[str, int] = {}
+        self._matrix: np.ndarray | None = None
+        self._keys_size = 0
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(os.path.join(self.dir, "write.lock"))
+        with self._file_lock:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _load(self) -> None:
+        """
+        Загружает ключи кэша и отображает файл векторов в память.
+        """
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        self.dtype = np.dtype(meta["dtype"])
+
+        keys = []
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "r", encoding="utf-8") as f:
+                keys = f.read().splitlines()
+        vectors_size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        n_vectors = vectors_size // (self.dim * self.dtype.itemsize)
+        n_rows = min(len(keys), n_vectors)
+        if n_rows != len(keys) or n_rows != n_vectors:
+            self._truncate(keys[:n_rows])
+        self._rows = {key: row for row, key in enumerate(keys[:n_rows])}
+        self._keys_size = self._file_size(self.keys_path)
+        self._remap()
+
+    @staticmethod
+    def _file_size(path: str) -> int:
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _truncate(self, keys: list[str]) -> None:
+        """
+        Обрезает файлы кэша до согласованного количества строк после прерванной записи,
+        чтобы последующие дописывания не нарушили соответствие ключей и векторов.
+        """
+        with open(self.keys_path, "w", encoding="utf-8") as f:
+            f.write("".join(f"{key}\n" for key in keys))
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(len(keys) * self.dim * self.dtype.itemsize)
+
+    def _remap(self) -> None:
+        n_rows = len(self._rows)
+        if n_rows == 0:
+            self._matrix = None
+            return
+        self._matrix = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(n_rows, self.dim))
+
+    def get(self, keys: list[str]) -> list[np.ndarray | None]:
+        """
+        Возвращает закэшированные эмбеддинги по ключам и обновляет статистику попаданий.
+
+        Args:
+            keys (list[str]): Хеши текстов.
+
+        Returns:
+            list[np.ndarray | None]: Эмбеддинг (float32) или None для промаха, по одному на ключ.
+        """
+        rows = [self._rows.get(key) for key in keys]
+        matrix = self._matrix
+        result = [
+            None if row is None or matrix is None or row >= len(matrix) else np.asarray(matrix[row], dtype=np.float32)
+            for row in rows
+        ]
+        found = sum(1 for vector in result if vector is not None)
+        with self._lock:
+            self.hits += found
+            self.misses += len(keys) - found
+        CACHE_LOOKUPS.inc(found, cache="document_embeddings", result="hit")
+        CACHE_LOOKUPS.inc(len(keys) - found, cache="document_embeddings", result="miss")
+        return result
+
+    def put(self, keys: list[str], vectors: np.ndarray) -> None:
+        """
+        Дописывает новые эмбеддинги в кэш. Уже присутствующие ключи пропускаются.
+
+        Args:
+            keys (list[str]): Хеши текстов.
+            vectors (np.ndarray): Эмбеддинги формы (len(keys), dim).
+        """
+        if not keys:
+            return
+        vectors = np.asarray(vectors)
+        with self._lock, self._file_lock:
+            if self._file_size(self.keys_path) != self._keys_size:
+                self._load()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim, "dtype": self.dtype.name}, f)
+
+            new_rows = {}
+            for i, key in enumerate(keys):
+                if key not in self._rows and key not in new_rows:
+                    new_rows[key] = i
+            if not new_rows:
+                return
+
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors[list(new_rows.values())].astype(self.dtype).tobytes())
+            with open(self.keys_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{key}\n" for key in new_rows))
+            self._keys_size = self._file_size(self.keys_path)
+
+            start = len(self._rows)
+            for offset, key in enumerate(new_rows):
+                self._rows[key] = start + offset
+            self._remap()
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику кэша.
+
+        Returns:
+            dict: Размер кэша, количество попаданий и промахов, доля попаданий.
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._rows),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -1,53 +1,356 @@
+import json
+import time
+from typing import Iterable
+
 from src.preprocessing import Preprocessor
 from src.indexing import Embedder
-from src.vector_db import Chroma_db
+from src.indexing.chunking import Chunker
+from src.indexing.streaming import batched, iter_documents
+from src.indexing.jobs import IndexingJob
+from src.vector_db import LexicalIndex, VectorStore, create_lexical_index, create_vector_store
+from src.utils import calculate_text_hash
+from src.metrics import DEDUP_DOCUMENTS, STAGE_DURATION, SYNC_DOCUMENTS
+from configs import config
 from configs.logging_config import setup_logger
 
+
+def document_hash(text: str, metadata: dict) -> str:
+    """
+    Хеш версии документа: текст после предобработки и метаданные. По нему upsert определяет,
+    изменился ли документ с тем же uid.
+
+    Args:
+        text (str): Текст документа после предобработки.
+        metadata (dict): Метаданные документа.
+
+    Returns:
+        str: MD5-хеш версии документа.
+    """
+    return calculate_text_hash(text + "\n" + json.dumps(metadata, ensure_ascii=False, sort_keys=True, default=str))
+
+
 class Indexer:
     """
     Класс для пайплайна индексации документов в ChromaDB.
     """
-    def __init__(self):
-        self.vector_db = Chroma_db()
+    def __init__(self, vector_db: VectorStore | None = None, lexical_index: LexicalIndex | None = None):
+        """
+        Args:
+            vector_db (VectorStore | None, optional): Общее векторное хранилище. Если не передано, создаётся по конфигурации.
+            lexical_index (LexicalIndex | None, optional): Общий BM25-индекс. Если не передан, создаётся по конфигурации.
+        """
+        self.vector_db = vector_db or create_vector_store()
+        self.lexical_index = lexical_index if lexical_index is not None else create_lexical_index(vector_db=self.vector_db)
+        self.config = config['indexing']
         self.preprocessor = Preprocessor()
         self.embedder = Embedder()
+        self.chunker = Chunker(
+            lambda: self.embedder.model.tokenizer,
+            lambda: self.embedder.model.max_seq_length
+        ) if self.config['chunking'].get('enabled', False) else None
         self.logger = setup_logger("indexer.log")
         
-    def index(self, raw_docs: list[dict]) -> int:
+    def index(self, raw_docs: list[dict], job: IndexingJob | None = None) -> int:
         """
         Индексирует список документов: выделяет текст, uid, сохраняет все остальные поля как метадату.
         Дубликаты (по uid и тексту) отфильтровываются в процессе.
 
         Args:
             raw_docs (list[dict]): Список документов c обязательными полями 'uid' и 'text'.
+            job (IndexingJob | None, optional): Фоновая задача, в которую пишется прогресс.
 
         Returns:
             int: Количество реально добавленных новых документов (без дублей). 
                  Если нет валидных документов, возвращает 0.
         """
         self.logger.info(f"Начало индексации документов. Количество документов {len(raw_docs)}")
+        processed_docs, metadatas = self._preprocess(raw_docs, job)
+        if not processed_docs:
+            self.logger.warning("Нет валидных документов для индексации.")
+            return 0
+
+        try:
+            _, added = self._embed_and_write(processed_docs, metadatas, job)
+        except BaseException:
+            self.preprocessor.rollback_near_duplicates()
+            raise
+        self.preprocessor.commit_near_duplicates()
+        self.logger.info(f"Конец индексации документов. Добавлено: {added}")
+        return added
+
+    def upsert(self, raw_docs: list[dict], job: IndexingJob | None = None) -> dict[str, int]:
+        """
+        Добавляет новые документы и обновляет изменившиеся по uid. Хеш документа после предобработки
+        (текст и метаданные) сравнивается с сохранённым, поэтому эмбеддинги считаются только для новых
+        и изменённых документов. Чанки прошлой версии документа, которых нет в новой,
+        удаляются из векторной БД и BM25-индекса.
+
+        Args:
+            raw_docs (list[dict]): Список документов c обязательными полями 'uid' и 'text'.
+            job (IndexingJob | None, optional): Фоновая задача, в которую пишется прогресс.
+
+        Returns:
+            dict[str, int]: Количество добавленных (`added`), изменённых (`changed`)
+                и не изменившихся (`unchanged`) документов.
+        """
+        self.logger.info(f"Начало upsert документов. Количество документов {len(raw_docs)}")
+        counts = {"added": 0, "changed": 0, "unchanged": 0}
+        processed_docs, metadatas = self._preprocess(raw_docs, job, replace_existing=True)
+        if not processed_docs:
+            self.logger.warning("Нет валидных документов для upsert.")
+            return counts
+
+        stored = self.vector_db.document_hashes([doc["uid"] for doc in processed_docs])
+        to_write, changed = [], []
+        for doc in processed_docs:
+            uid = doc["uid"]
+            if uid not in stored:
+                counts["added"] += 1
+            elif stored[uid] == document_hash(doc["text"], metadatas[uid]):
+                counts["unchanged"] += 1
+                continue
+            else:
+                counts["changed"] += 1
+                changed.append(uid)
+            to_write.append(doc)
+
+        old_ids = self.vector_db.chunk_ids(changed)
+        try:
+            written_ids = self._embed_and_write(to_write, metadatas, job, upsert=True)[0] if to_write else []
+        except BaseException:
+            self.preprocessor.rollback_near_duplicates()
+            raise
+        self.preprocessor.commit_near_duplicates()
+        written = set(written_ids)
+        stale_ids = [uid for uid in old_ids if uid not in written]
+        if stale_ids:
+            self._delete_records(stale_ids)
+        for result, count in counts.items():
+            SYNC_DOCUMENTS.inc(count, result=result)
+        self.logger.info(f"Конец upsert документов: {counts}, удалено устаревших чанков: {len(stale_ids)}")
+        return counts
+
+    def delete(self, uids: list[str] | None = None, where: dict | None = None) -> dict[str, int]:
+        """
+        Удаляет документы (все их чанки) из векторной БД, BM25-индекса и индекса почти-дубликатов.
+
+        Args:
+            uids (list[str] | None, optional): uid документов.
+            where (dict | None, optional): Фильтр по метаданным: поле -> значение (или список значений).
+
+        Returns:
+            dict[str, int]: Количество удалённых документов (`deleted`) и не найденных uid (`not_found`).
+        """
+        requested = list(dict.fromkeys(str(uid) for uid in uids or []))
+        found = self.vector_db.document_hashes(requested)
+        targets = [uid for uid in requested if uid in found]
+        if where:
+            targets = list(dict.fromkeys(targets + self.vector_db.find_documents(where)))
+        ids = self.vector_db.chunk_ids(targets)
+        if ids:
+            self._delete_records(ids)
+        self.preprocessor.remove_near_duplicates(targets)
+        counts = {"deleted": len(targets), "not_found": len(requested) - len(found)}
+        SYNC_DOCUMENTS.inc(len(targets), result="deleted")
+        self.logger.info(f"Удаление документов: {counts}, удалено записей: {len(ids)}")
+        return counts
+
+    def _preprocess(
+        self, raw_docs: list[dict], job: IndexingJob | None, replace_existing: bool = False
+    ) -> tuple[list[dict], dict]:
+        """
+        Выделяет из документов текст и метаданные (все поля, кроме текста) и выполняет предобработку.
+
+        Returns:
+            tuple[list[dict], dict]: Документы после предобработки и метаданные документов по uid.
+        """
         prep_docs = []
-        metadatas = []
+        metadatas = {}
         for doc in raw_docs:
             prep_doc = {"uid": doc.get("uid"), "text": doc.get("text", "")}
             prep_docs.append(prep_doc)
-            meta = {k: v for k, v in doc.items() if k != "text"}
-            metadatas.append(meta)
+            metadatas.setdefault(doc.get("uid"), {k: v for k, v in doc.items() if k != "text"})
 
-        processed_docs = self.preprocessor.preprocess_pipeline(prep_docs)
-        if not processed_docs:
-            self.logger.warning("Нет валидных документов для индексации.")
-            return 0
+        started = time.perf_counter()
+        processed_docs = self.preprocessor.preprocess_pipeline(prep_docs, replace_existing=replace_existing)
+        self._observe("preprocess", time.perf_counter() - started, job)
+        if job:
+            job.add_progress(parsed=len(raw_docs), filtered=len(raw_docs) - len(processed_docs))
+            if self.preprocessor.last_near_duplicates:
+                job.add_near_duplicates(self.preprocessor.last_near_duplicates)
+        return processed_docs, metadatas
+
+    def _embed_and_write(
+        self, processed_docs: list[dict], metadatas: dict, job: IndexingJob | None, upsert: bool = False
+    ) -> tuple[list[str], int]:
+        """
+        Разбивает документы на чанки, считает эмбеддинги и записывает их в векторную БД и BM25-индекс.
+        В метаданные каждого чанка записываются хеш версии документа (`doc_hash`) для последующих upsert
+        и хеш всего текста документа (`text_hash`), по которому хранилище отсекает дубликаты.
 
-        valid_uids = set(doc["uid"] for doc in processed_docs)
-        valid_metadatas = [meta for meta in metadatas if meta["uid"] in valid_uids]
+        Без `upsert` дубликаты отсекаются по документу до разбиения: документ с уже сохранённым uid
+        или текстом не разбивается и не эмбеддится, а чанки принятого документа записываются все,
+        даже если текст какого-то из них совпадает с уже сохранённым чанком.
+
+        Args:
+            processed_docs (list[dict]): Документы после предобработки.
+            metadatas (dict): Метаданные документов по uid.
+            job (IndexingJob | None): Фоновая задача, в которую пишется прогресс.
+            upsert (bool, optional): Перезаписывать документы с теми же uid вместо отсечения дублей. Defaults to False.
+
+        Returns:
+            tuple[list[str], int]: Id реально записанных записей (чанков) и количество записанных документов.
+        """
+        started = time.perf_counter()
+        n_docs = len(processed_docs)
+        valid_metadatas = [
+            {
+                **metadatas[doc["uid"]],
+                "doc_hash": document_hash(doc["text"], metadatas[doc["uid"]]),
+                "text_hash": calculate_text_hash(doc["text"]),
+            }
+            for doc in processed_docs
+        ]
+        if not upsert:
+            stored = self.vector_db.document_hashes([doc["uid"] for doc in processed_docs])
+            selected = [
+                i for i, doc in enumerate(processed_docs)
+                if doc["uid"] not in stored and not self.vector_db.has_hash(valid_metadatas[i]["text_hash"])
+            ]
+            processed_docs = [processed_docs[i] for i in selected]
+            valid_metadatas = [valid_metadatas[i] for i in selected]
+        if job:
+            job.add_progress(embedded=len(processed_docs))
+        if self.chunker is not None:
+            processed_docs, valid_metadatas = self.chunker.split(processed_docs, valid_metadatas)
         texts = [doc["text"] for doc in processed_docs]
-        
         embeddings = self.embedder.encode(texts)
+        if self.embedder.cache is not None:
+            self.logger.info(f"Кэш эмбеддингов: {self.embedder.cache_stats()}")
+        self.logger.info(f"Батчинг по длине: {self.embedder.batching_stats()}")
         ids = [doc["uid"] for doc in processed_docs]
+        parents = {uid: metadata.get("parent_uid", uid) for uid, metadata in zip(ids, valid_metadatas)}
+        self._observe("embed", time.perf_counter() - started, job)
+
+        started = time.perf_counter()
+        if upsert:
+            added_ids = self.vector_db.upsert(ids, texts, embeddings, valid_metadatas)
+        else:
+            added_ids = self.vector_db.add_unique_by_hash(ids, texts, embeddings, valid_metadatas)
+        if self.lexical_index is not None and added_ids:
+            text_by_id = {}
+            for uid, text in zip(ids, texts):
+                text_by_id.setdefault(uid, text)
+            self.lexical_index.add(added_ids, [text_by_id[uid] for uid in added_ids])
+        self._observe("write", time.perf_counter() - started, job)
+        added_docs = len({parents[uid] for uid in added_ids})
+        if not upsert:
+            DEDUP_DOCUMENTS.inc(added_docs, result="added")
+            DEDUP_DOCUMENTS.inc(n_docs - added_docs, result="duplicate")
+        if job:
+            job.add_progress(written=added_docs, chunks=len(added_ids))
+        return added_ids, added_docs
+
+    def _delete_records(self, ids: list[str]) -> None:
+        """
+        Удаляет записи (чанки) по id из векторной БД и BM25-индекса.
+        """
+        self.vector_db.delete_by_id(ids)
+        if self.lexical_index is not None:
+            self.lexical_index.remove(ids)
+
+    @staticmethod
+    def _observe(stage: str, seconds: float, job: IndexingJob | None) -> None:
+        """
+        Записывает длительность этапа индексации в метрики и во время этапов задачи.
+        """
+        STAGE_DURATION.observe(seconds, pipeline="indexing", stage=stage)
+        if job:
+            job.add_timing(stage, seconds)
+
+    def index_stream(self, docs: Iterable[dict], batch_size: int | None = None, job: IndexingJob | None = None) -> int:
+        """
+        Индексирует документы из итератора батчами фиксированного размера.
+        Каждый батч проходит предобработку, эмбеддинг и запись в БД целиком до чтения следующего,
+        поэтому пиковое потребление памяти не зависит от общего числа документов.
+        Дубликаты между батчами отсекаются индексом хешей векторной БД.
+
+        Args:
+            docs (Iterable[dict]): Итератор документов c обязательными полями 'uid' и 'text'.
+            batch_size (int | None, optional): Размер батча. По умолчанию — `indexing.batch_size` из конфига.
+            job (IndexingJob | None, optional): Фоновая задача: в неё пишется прогресс,
+                а запрос отмены прерывает индексацию на границе батча.
+
+        Raises:
+            JobCancelled: Если задача была отменена.
+
+        Returns:
+            int: Количество реально добавленных новых документов.
+        """
+        batch_size = batch_size or self.config['batch_size']
+        added = 0
+        for batch_no, batch in enumerate(batched(docs, batch_size), start=1):
+            if job:
+                job.raise_if_cancelled()
+            added += self.index(batch, job)
+            self.logger.info(f"Обработан батч {batch_no}. Всего добавлено: {added}")
+        return added
 
-        before_count = len(self.vector_db.get_existing_ids())
-        self.vector_db.add_unique_by_hash(ids, texts, embeddings, valid_metadatas)
-        after_count = len(self.vector_db.get_existing_ids())
-        self.logger.info(f"Конец индексации документов.")
-        return after_count - before_count
+    def index_file(self, path: str, file_format: str, job: IndexingJob | None = None) -> int:
+        """
+        Потоково индексирует документы из файла на диске (JSON-массив или JSONL).
+
+        Args:
+            path (str): Путь к файлу.
+            file_format (str): "json" или "jsonl".
+            job (IndexingJob | None, optional): Фоновая задача для прогресса и отмены.
+
+        Returns:
+            int: Количество реально добавленных новых документов.
+        """
+        with open(path, "rb") as f:
+            docs = iter_documents(f, file_format, self.config['read_chunk_size'])
+            return self.index_stream(docs, job=job)
+
+    def upsert_stream(
+        self, docs: Iterable[dict], batch_size: int | None = None, job: IndexingJob | None = None
+    ) -> dict[str, int]:
+        """
+        Выполняет upsert документов из итератора батчами фиксированного размера (см. `upsert`).
+
+        Args:
+            docs (Iterable[dict]): Итератор документов c обязательными полями 'uid' и 'text'.
+            batch_size (int | None, optional): Размер батча. По умолчанию — `indexing.batch_size` из конфига.
+            job (IndexingJob | None, optional): Фоновая задача для прогресса и отмены.
+
+        Raises:
+            JobCancelled: Если задача была отменена.
+
+        Returns:
+            dict[str, int]: Суммарное количество добавленных, изменённых и не изменившихся документов.
+        """
+        batch_size = batch_size or self.config['batch_size']
+        counts = {"added": 0, "changed": 0, "unchanged": 0}
+        for batch_no, batch in enumerate(batched(docs, batch_size), start=1):
+            if job:
+                job.raise_if_cancelled()
+            for result, count in self.upsert(batch, job).items():
+                counts[result] += count
+            self.logger.info(f"Обработан батч {batch_no}. Итого: {counts}")
+        return counts
+
+    def upsert_file(self, path: str, file_format: str, job: IndexingJob | None = None) -> dict[str, int]:
+        """
+        Потоково выполняет upsert документов из файла на диске (JSON-массив или JSONL).
+
+        Args:
+            path (str): Путь к файлу.
+            file_format (str): "json" или "jsonl".
+            job (IndexingJob | None, optional): Фоновая задача для прогресса и отмены.
+
+        Returns:
+            dict[str, int]: Суммарное количество добавленных, изменённых и не изменившихся документов.
+        """
+        with open(path, "rb") as f:
+            docs = iter_documents(f, file_format, self.config['read_chunk_size'])
+            return self.upsert_stream(docs, job=job)
@@ -0,0 +1,315 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from configs import request_id_var, setup_logger
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+MAX_REPORTED_PAIRS = 100
+
+
+class JobCancelled(Exception):
+    """
+    Исключение, которым задача индексации прерывается после запроса отмены.
+    """
+
+
+class JobQueueFull(Exception):
+    """
+    Исключение при попытке поставить задачу, когда очередь задач заполнена.
+    """
+
+
+class IndexingJob:
+    """
+    Фоновая задача индексации: статус, счётчики прогресса и флаг отмены.
+
+    Счётчики прогресса:
+    - parsed — документов прочитано из источника;
+    - filtered — документов отброшено предобработкой;
+    - embedded — документов прошло через эмбеддер (без отсечённых как дубликаты до эмбеддинга);
+    - written — документов реально записано в векторную БД;
+    - chunks — записей (чанков) этих документов в векторной БД.
+
+    Кроме того, задача хранит число отброшенных почти-дубликатов и первые пары
+    (документ, найденный дубликат, близость) для отчёта, а также суммарное время
+    этапов пайплайна в секундах (preprocess, embed, write).
+
+    `on_finish` вызывается один раз при переходе задачи в любой конечный статус, в том числе
+    при отмене до запуска (например, для удаления временного файла загрузки).
+    """
+    def __init__(self, kind: str, on_finish: Callable[[], None] | None = None):
+        """
+        Args:
+            kind (str): Тип задачи (например, "index_text" или "index_file").
+            on_finish (Callable[[], None] | None, optional): Функция, вызываемая по завершении задачи.
+        """
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.parsed = 0
+        self.filtered = 0
+        self.embedded = 0
+        self.written = 0
+        self.chunks = 0
+        self.near_duplicates = 0
+        self.near_duplicate_pairs: list[dict] = []
+        self.timings: dict[str, float] = {}
+        self.result: Any = None
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.future: Future | None = None
+        self.on_finish = on_finish
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        Была ли запрошена отмена задачи.
+        """
+        return self._cancel_event.is_set()
+
+    def add_progress(
+        self, parsed: int = 0, filtered: int = 0, embedded: int = 0, written: int = 0, chunks: int = 0
+    ) -> None:
+        """
+        Потокобезопасно увеличивает счётчики прогресса.
+        """
+        with self._lock:
+            self.parsed += parsed
+            self.filtered += filtered
+            self.embedded += embedded
+            self.written += written
+            self.chunks += chunks
+
+    def add_near_duplicates(self, pairs: list[dict]) -> None:
+        """
+        Потокобезопасно учитывает отброшенные почти-дубликаты (в отчёте хранятся первые MAX_REPORTED_PAIRS пар).
+        """
+        with self._lock:
+            self.near_duplicates += len(pairs)
+            free = MAX_REPORTED_PAIRS - len(self.near_duplicate_pairs)
+            self.near_duplicate_pairs.extend(pairs[:max(free, 0)])
+
+    def add_timing(self, stage: str, seconds: float) -> None:
+        """
+        Потокобезопасно добавляет время выполнения этапа пайплайна (в секундах).
+        """
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def raise_if_cancelled(self) -> None:
+        """
+        Прерывает выполнение задачи, если была запрошена отмена.
+
+        Raises:
+            JobCancelled: Если задача отменена.
+        """
+        if self.cancelled:
+            raise JobCancelled(f"Задача {self.id} отменена")
+
+    def cancel(self) -> bool:
+        """
+        Запрашивает отмену задачи. Задача в очереди снимается сразу,
+        выполняющаяся — останавливается на ближайшей границе батча.
+
+        Returns:
+            bool: False, если задача уже завершена.
+        """
+        with self._lock:
+            if self.status in FINISHED_STATUSES:
+                return False
+            self._cancel_event.set()
+            dequeued = self.future is not None and self.future.cancel()
+            if dequeued:
+                self.status = CANCELLED
+                self.finished_at = time.time()
+        if dequeued:
+            self._finish()
+        return True
+
+    def _finish(self) -> None:
+        """
+        Вызывает `on_finish` (не более одного раза).
+        """
+        with self._lock:
+            callback, self.on_finish = self.on_finish, None
+        if callback is not None:
+            callback()
+
+    def to_dict(self) -> dict:
+        """
+        Возвращает состояние задачи в виде словаря для API.
+
+        Returns:
+            dict: Статус, счётчики прогресса, результат и ошибка.
+        """
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "progress": {
+                    "parsed": self.parsed,
+                    "filtered": self.filtered,
+                    "embedded": self.embedded,
+                    "written": self.written,
+                    "chunks": self.chunks,
+                },
+                "near_duplicates": {
+                    "count": self.near_duplicates,
+                    "pairs": list(self.near_duplicate_pairs),
+                },
+                "timings": {stage: round(seconds, 4) for stage, seconds in self.timings.items()},
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """
+    Менеджер фоновых задач индексации на ограниченном пуле потоков.
+
+    Хранит состояние задач в памяти процесса; завершённые задачи вытесняются,
+    когда их становится больше `max_finished_jobs`.
+    """
+    def __init__(self, max_workers: int = 1, max_queued: int = 16, max_finished_jobs: int = 100):
+        """
+        Args:
+            max_workers (int, optional): Количество одновременно выполняемых задач. Defaults to 1.
+            max_queued (int, optional): Максимум задач, ожидающих выполнения. Defaults to 16.
+            max_finished_jobs (int, optional): Сколько завершённых задач хранить. Defaults to 100.
+        """
+        self.max_queued = max_queued
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="indexing-job")
+        self._jobs: OrderedDict[str, IndexingJob] = OrderedDict()
+        self._lock = threading.Lock()
+        self.logger = setup_logger("jobs.log")
+
+    def submit(
+        self, kind: str, fn: Callable[..., Any], *args, on_finish: Callable[[], None] | None = None, **kwargs
+    ) -> IndexingJob:
+        """
+        Ставит задачу в очередь. Функция вызывается с дополнительным аргументом `job`.
+
+        Args:
+            kind (str): Тип задачи.
+            fn (Callable[..., Any]): Функция, выполняющая индексацию.
+            on_finish (Callable[[], None] | None, optional): Функция, вызываемая при любом конечном статусе задачи,
+                в том числе при отмене до запуска и при остановке менеджера.
+
+        Raises:
+            JobQueueFull: Если в очереди уже `max_queued` задач.
+
+        Returns:
+            IndexingJob: Созданная задача.
+        """
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            if queued >= self.max_queued:
+                raise JobQueueFull(f"В очереди уже {queued} задач")
+            job = IndexingJob(kind, on_finish)
+            self._jobs[job.id] = job
+            self._evict_finished()
+        job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        self.logger.info(f"Задача {job.id} ({kind}) поставлена в очередь")
+        return job
+
+    def get(self, job_id: str) -> IndexingJob | None:
+        """
+        Возвращает задачу по id.
+
+        Args:
+            job_id (str): Идентификатор задачи.
+
+        Returns:
+            IndexingJob | None: Задача или None, если не найдена.
+        """
+        return self._jobs.get(job_id)
+
+    def list(self) -> list[IndexingJob]:
+        """
+        Возвращает все известные задачи в порядке постановки.
+
+        Returns:
+            list[IndexingJob]: Список задач.
+        """
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> IndexingJob | None:
+        """
+        Запрашивает отмену задачи по id.
+
+        Args:
+            job_id (str): Идентификатор задачи.
+
+        Returns:
+            IndexingJob | None: Задача или None, если не найдена.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None and job.cancel():
+            self.logger.info(f"Запрошена отмена задачи {job_id}")
+        return job
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Отменяет задачи и останавливает пул потоков.
+
+        Args:
+            wait (bool, optional): Дождаться завершения выполняющихся задач. Defaults to True.
+        """
+        for job in self.list():
+            job.cancel()
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job: IndexingJob, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        with job._lock:
+            cancelled = job.cancelled
+            if cancelled:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+            else:
+                job.status = RUNNING
+                job.started_at = time.time()
+        if cancelled:
+            job._finish()
+            return
+        token = request_id_var.set(job.id)
+        try:
+            result = fn(*args, job=job, **kwargs)
+            status, error = COMPLETED, None
+        except JobCancelled:
+            result, status, error = None, CANCELLED, None
+        except Exception as e:
+            self.logger.exception(f"Задача {job.id} завершилась с ошибкой")
+            result, status, error = None, FAILED, str(e)
+        with job._lock:
+            job.result, job.status, job.error = result, status, error
+            job.finished_at = time.time()
+        self.logger.info(f"Задача {job.id} завершена со статусом {status}")
+        try:
+            job._finish()
+        except Exception:
+            self.logger.exception(f"Ошибка в on_finish задачи {job.id}")
+        request_id_var.reset(token)
+
+    def _evict_finished(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
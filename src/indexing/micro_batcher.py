@@ -0,0 +1,110 @@
+import asyncio
+from collections import Counter
+from concurrent.futures import Executor
+from typing import Callable
+
+import numpy as np
+
+class MicroBatcher:
+    """
+    Динамический микробатчинг эмбеддингов запросов.
+
+    Собирает одиночные вызовы `encode` от конкурентных запросов в течение `max_wait_ms`
+    (или пока не наберётся `max_batch_size` текстов), выполняет один батчевый вызов модели
+    в пуле потоков и раздаёт результаты вызывающим. Так накладные расходы трансформера
+    амортизируются на батч, а не платятся за каждое предложение.
+    """
+    def __init__(
+        self,
+        encode_fn: Callable[[list[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        executor: Executor | None = None,
+        limit: asyncio.Semaphore | None = None,
+    ):
+        """
+        Args:
+            encode_fn (Callable[[list[str]], np.ndarray]): Батчевая функция эмбеддинга.
+            max_batch_size (int, optional): Максимальный размер батча. Defaults to 32.
+            max_wait_ms (float, optional): Максимальное ожидание сбора батча в миллисекундах. Defaults to 5.0.
+            executor (Executor | None, optional): Пул для вызова модели (по умолчанию — пул event loop).
+            limit (asyncio.Semaphore | None, optional): Ограничение одновременно выполняемых батчей.
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self.limit = limit
+        self.batch_sizes: Counter = Counter()
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def encode(self, text: str) -> np.ndarray:
+        """
+        Возвращает эмбеддинг одного текста, вычисленный в составе общего батча.
+
+        Args:
+            text (str): Текст запроса.
+
+        Returns:
+            np.ndarray: Нормализованный эмбеддинг формы (embedding_dim,).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def stats(self) -> dict:
+        """
+        Возвращает метрики размеров батчей.
+
+        Returns:
+            dict: Количество батчей и текстов, средний и максимальный размер батча,
+                распределение размеров батчей.
+        """
+        batches = sum(self.batch_sizes.values())
+        items = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": items / batches if batches else 0.0,
+            "max_batch_size": max(self.batch_sizes, default=0),
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            task = loop.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        texts = [text for text, _ in batch]
+        self.batch_sizes[len(batch)] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            if self.limit is not None:
+                async with self.limit:
+                    vectors = await loop.run_in_executor(self.executor, self.encode_fn, texts)
+            else:
+                vectors = await loop.run_in_executor(self.executor, self.encode_fn, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
@@ -0,0 +1,114 @@
+import threading
+from typing import Any
+
+from configs import config, setup_logger
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+_models: dict[str, Any] = {}
+_lock = threading.Lock()
+logger = setup_logger("model_registry.log")
+
+
+def _load_model(model_name: str) -> Any:
+    """
+    Загружает модель SentenceTransformer с диска или из HuggingFace Hub.
+
+    Импорт sentence_transformers выполняется лениво, чтобы импорт модулей
+    сервиса не тянул за собой torch до первого реального использования модели.
+
+    Args:
+        model_name (str): Название модели SentenceTransformer.
+
+    Returns:
+        SentenceTransformer: Загруженная модель.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+def _load_onnx_model(model_name: str, quantize: bool) -> Any:
+    """
+    Загружает ONNX Runtime-версию модели (экспортируя её при первом использовании).
+
+    Args:
+        model_name (str): Название модели SentenceTransformer.
+        quantize (bool): Использовать динамически int8-квантизованную модель.
+
+    Returns:
+        OnnxSentenceEncoder: Энкодер на ONNX Runtime.
+    """
+    from src.indexing.onnx_backend import OnnxSentenceEncoder
+
+    return OnnxSentenceEncoder(model_name, quantize=quantize)
+
+
+def get_model(model_name: str, backend: str = "torch") -> Any:
+    """
+    Возвращает модель из реестра процесса, загружая её при первом обращении.
+
+    Каждая модель загружается не более одного раза на процесс и разделяется
+    между всеми потребителями (индексация и генерация ответов).
+
+    Args:
+        model_name (str): Название модели SentenceTransformer.
+        backend (str, optional): "torch", "onnx" или "onnx-int8". Defaults to "torch".
+
+    Raises:
+        ValueError: Если бэкенд не поддерживается.
+
+    Returns:
+        SentenceTransformer | OnnxSentenceEncoder: Общий для процесса экземпляр модели.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Неподдерживаемый бэкенд эмбеддера: {backend}")
+    key = model_name if backend == "torch" else f"{model_name}@{backend}"
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            logger.info(f"Загрузка модели {key} в реестр моделей")
+            if backend == "torch":
+                model = _load_model(model_name)
+            else:
+                model = _load_onnx_model(model_name, quantize=backend == "onnx-int8")
+            _models[key] = model
+            logger.info(f"Модель {key} загружена")
+    return model
+
+
+def warm_up(model_names: list[str] | None = None) -> None:
+    """
+    Заранее загружает модели в реестр (например, при старте сервиса).
+
+    Args:
+        model_names (list[str] | None, optional): Список моделей для загрузки.
+            По умолчанию — модель эмбеддера из конфигурации.
+    """
+    if model_names is None:
+        model_names = [config['embedder']['model_name']]
+    backend = config['embedder'].get('backend', 'torch')
+    for model_name in model_names:
+        get_model(model_name, backend)
+
+
+def loaded_models() -> list[str]:
+    """
+    Возвращает список уже загруженных в процессе моделей.
+
+    Returns:
+        list[str]: Названия загруженных моделей.
+    """
+    return list(_models)
+
+
+def clear() -> None:
+    """
+    Очищает реестр моделей (используется в тестах и при перезагрузке конфигурации).
+    """
+    with _lock:
+        _models.clear()
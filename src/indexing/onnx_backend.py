@@ -0,0 +1,247 @@
+import json
+import os
+import time
+
+import numpy as np
+from filelock import FileLock
+
+from configs import config, setup_logger
+
+logger = setup_logger("onnx_backend.log")
+
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+META_FILE = "meta.json"
+
+
+def mean_pool(last_hidden_state: np.ndarray, attention_mask: np.ndarray, normalize: bool = True) -> np.ndarray:
+    """
+    Mean pooling по токенам с учётом attention mask (как в SentenceTransformer) и L2-нормализация.
+
+    Args:
+        last_hidden_state (np.ndarray): Выход трансформера формы (batch, seq_len, hidden).
+        attention_mask (np.ndarray): Маска токенов формы (batch, seq_len).
+        normalize (bool, optional): Нормализовать эмбеддинги по L2. Defaults to True.
+
+    Returns:
+        np.ndarray: Эмбеддинги формы (batch, hidden).
+    """
+    mask = attention_mask[..., None].astype(np.float32)
+    summed = (last_hidden_state * mask).sum(axis=1)
+    embeddings = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+    if normalize:
+        embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+    return embeddings.astype(np.float32)
+
+
+def export_dir_for(model_name: str) -> str:
+    """
+    Возвращает папку с ONNX-экспортом модели.
+
+    Args:
+        model_name (str): Название модели SentenceTransformer.
+
+    Returns:
+        str: Путь к папке экспорта.
+    """
+    return os.path.join(config['embedder']['onnx']['export_dir'], model_name.replace("/", "__"))
+
+
+def export_onnx(model_name: str, export_dir: str, quantize: bool = False) -> str:
+    """
+    Экспортирует трансформер модели SentenceTransformer в ONNX (с динамическими осями batch/seq_len)
+    и, опционально, делает динамическую int8-квантизацию весов. Токенизатор и параметры
+    пулинга сохраняются рядом, поэтому последующие загрузки не требуют torch.
+
+    Args:
+        model_name (str): Название модели SentenceTransformer.
+        export_dir (str): Папка для экспорта.
+        quantize (bool, optional): Создать также int8-версию модели. Defaults to False.
+
+    Raises:
+        ValueError: Если модель использует пулинг, отличный от mean pooling.
+
+    Returns:
+        str: Путь к ONNX-файлу, который нужно загружать.
+    """
+    os.makedirs(export_dir, exist_ok=True)
+    onnx_path = os.path.join(export_dir, ONNX_FILE)
+    int8_path = os.path.join(export_dir, ONNX_INT8_FILE)
+    target_path = int8_path if quantize else onnx_path
+    if os.path.exists(target_path):
+        return target_path
+
+    # Экспорт может одновременно начаться в нескольких процессах (воркеры gunicorn): файлы пишутся
+    # под файловой блокировкой во временные и переименовываются атомарно, поэтому наличие ONNX-файла
+    # означает, что экспорт завершён
+    with FileLock(os.path.join(export_dir, "export.lock")):
+        if not os.path.exists(onnx_path):
+            import torch
+            from sentence_transformers import SentenceTransformer
+
+            logger.info(f"Экспорт модели {model_name} в ONNX: {onnx_path}")
+            st_model = SentenceTransformer(model_name, device="cpu")
+            pooling = st_model[1].get_config_dict()
+            if not pooling.get("pooling_mode_mean_tokens", False):
+                raise ValueError(f"ONNX-бэкенд поддерживает только mean pooling, у модели: {pooling}")
+
+            transformer = st_model[0].auto_model.eval()
+            tokenizer = st_model.tokenizer
+            sample = tokenizer(["пример текста"], return_tensors="pt")
+            input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+            dynamic_axes = {name: {0: "batch", 1: "seq_len"} for name in input_names}
+            dynamic_axes["last_hidden_state"] = {0: "batch", 1: "seq_len"}
+            tmp_path = f"{onnx_path}.tmp"
+            with torch.no_grad():
+                torch.onnx.export(
+                    transformer,
+                    tuple(sample[name] for name in input_names),
+                    tmp_path,
+                    input_names=input_names,
+                    output_names=["last_hidden_state"],
+                    dynamic_axes=dynamic_axes,
+                    opset_version=config['embedder']['onnx']['opset'],
+                )
+            tokenizer.save_pretrained(export_dir)
+            meta_tmp_path = os.path.join(export_dir, f"{META_FILE}.tmp")
+            with open(meta_tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "model_name": model_name,
+                    "max_seq_length": st_model.max_seq_length,
+                    "dim": st_model.get_sentence_embedding_dimension(),
+                    "input_names": input_names,
+                }, f)
+            os.replace(meta_tmp_path, os.path.join(export_dir, META_FILE))
+            os.replace(tmp_path, onnx_path)
+
+        if quantize and not os.path.exists(int8_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info(f"Динамическая int8-квантизация: {int8_path}")
+            tmp_path = f"{int8_path}.tmp"
+            quantize_dynamic(onnx_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, int8_path)
+    return target_path
+
+
+class OnnxSentenceEncoder:
+    """
+    Энкодер предложений на ONNX Runtime (CPU) с mean pooling и нормализацией,
+    совместимый с используемым в сервисе подмножеством API SentenceTransformer
+    (`encode`, `tokenizer`, `max_seq_length`, `get_sentence_embedding_dimension`).
+    """
+    def __init__(self, model_name: str, quantize: bool = False):
+        """
+        Экспортирует модель при первом использовании (экспорт кэшируется на диске) и открывает сессию ONNX Runtime.
+
+        Args:
+            model_name (str): Название модели SentenceTransformer.
+            quantize (bool, optional): Использовать int8-квантизованную модель. Defaults to False.
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        export_dir = export_dir_for(model_name)
+        onnx_path = export_onnx(model_name, export_dir, quantize)
+        with open(os.path.join(export_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        onnx_config = config['embedder']['onnx']
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if onnx_config.get('intra_op_num_threads'):
+            options.intra_op_num_threads = onnx_config['intra_op_num_threads']
+
+        self.model_name = model_name
+        self.max_seq_length = meta["max_seq_length"]
+        self.dim = meta["dim"]
+        self.input_names = meta["input_names"]
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        logger.info(f"ONNX-модель загружена: {onnx_path}")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(
+        self,
+        texts: list[str] | str,
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = True,
+    ) -> np.ndarray:
+        """
+        Кодирует тексты в эмбеддинги.
+
+        Args:
+            texts (list[str] | str): Текст или список текстов.
+            batch_size (int, optional): Размер батча. Defaults to 32.
+            show_progress_bar (bool, optional): Не используется, для совместимости API.
+            convert_to_numpy (bool, optional): Не используется, результат всегда np.ndarray.
+            normalize_embeddings (bool, optional): L2-нормализация эмбеддингов. Defaults to True.
+
+        Returns:
+            np.ndarray: Эмбеддинги формы (n_texts, dim) или (dim,) для одной строки.
+        """
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            tokens = self.tokenizer(
+                batch, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np"
+            )
+            feeds = {name: tokens[name].astype(np.int64) for name in self.input_names}
+            last_hidden_state = self.session.run(["last_hidden_state"], feeds)[0]
+            outputs.append(mean_pool(last_hidden_state, tokens["attention_mask"], normalize_embeddings))
+        embeddings = np.concatenate(outputs) if outputs else np.zeros((0, self.dim), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def compare_backends(texts: list[str], model_name: str, backend: str = "onnx-int8", batch_size: int = 32) -> dict:
+    """
+    Сравнивает ONNX-бэкенд с torch-бэкендом: косинусная близость эмбеддингов одних и тех же текстов
+    (паритет) и пропускная способность (текстов в секунду).
+
+    Args:
+        texts (list[str]): Тексты для сравнения.
+        model_name (str): Название модели SentenceTransformer.
+        backend (str, optional): "onnx" или "onnx-int8". Defaults to "onnx-int8".
+        batch_size (int, optional): Размер батча. Defaults to 32.
+
+    Returns:
+        dict: Средняя и минимальная косинусная близость, скорость обоих бэкендов и ускорение.
+    """
+    from src.indexing import model_registry
+
+    results = {}
+    embeddings = {}
+    for name in ("torch", backend):
+        model = model_registry.get_model(model_name, name)
+        model.encode(texts[:batch_size], batch_size=batch_size)
+        started = time.perf_counter()
+        embeddings[name] = model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+        results[f"{name}_texts_per_sec"] = len(texts) / (time.perf_counter() - started)
+
+    cosine = np.sum(embeddings["torch"] * embeddings[backend], axis=1)
+    results["cosine_mean"] = float(cosine.mean())
+    results["cosine_min"] = float(cosine.min())
+    results["speedup"] = results[f"{backend}_texts_per_sec"] / results["torch_texts_per_sec"]
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Паритет и скорость ONNX-бэкенда относительно torch")
+    parser.add_argument("--file", default="data/test.json", help="JSON-файл с документами (поле text)")
+    parser.add_argument("--backend", default="onnx-int8", choices=["onnx", "onnx-int8"])
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    with open(args.file, "r", encoding="utf-8") as f:
+        sample_texts = [doc["text"] for doc in json.load(f)]
+    report = compare_backends(sample_texts, config['embedder']['model_name'], args.backend, args.batch_size)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,172 @@
+import codecs
+import json
+import re
+from itertools import islice
+from typing import IO, Any, Iterable, Iterator
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def _iter_text_chunks(stream: IO, chunk_size: int) -> Iterator[str]:
+    """
+    Читает поток кусками фиксированного размера и декодирует их как UTF-8.
+    Многобайтовые символы на границах кусков декодируются корректно.
+
+    Args:
+        stream (IO): Бинарный или текстовый файловый объект.
+        chunk_size (int): Размер читаемого куска.
+
+    Yields:
+        str: Очередной декодированный кусок текста.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        text = chunk if isinstance(chunk, str) else decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_json_array(stream: IO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Инкрементально разбирает JSON-массив и по одному возвращает его элементы.
+    В памяти одновременно держится только текущий кусок файла и текущий элемент.
+
+    Args:
+        stream (IO): Файловый объект с JSON-массивом.
+        chunk_size (int, optional): Размер читаемого куска. Defaults to 1 MiB.
+
+    Raises:
+        ValueError: Если содержимое не является корректным JSON-массивом.
+
+    Yields:
+        Any: Очередной элемент массива.
+    """
+    chunks = _iter_text_chunks(stream, chunk_size)
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def read_more() -> None:
+        nonlocal buffer, pos, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+        else:
+            buffer, pos = buffer[pos:] + chunk, 0
+
+    def next_char() -> str:
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof:
+                return ""
+            read_more()
+
+    if next_char() != "[":
+        raise ValueError("В JSON должен быть список документов")
+    pos += 1
+    if next_char() == "]":
+        return
+
+    while True:
+        next_char()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                if end < len(buffer) or eof:
+                    break
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(f"Некорректный JSON: {e}") from e
+            read_more()
+        pos = end
+        yield item
+
+        separator = next_char()
+        if separator == ",":
+            pos += 1
+        elif separator == "]":
+            return
+        else:
+            raise ValueError("Некорректный JSON: ожидалась ',' или ']' между документами")
+
+
+def iter_jsonl(stream: IO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Построчно разбирает JSONL (один JSON-объект на строку), пропуская пустые строки.
+
+    Args:
+        stream (IO): Файловый объект в формате JSONL.
+        chunk_size (int, optional): Размер читаемого куска. Defaults to 1 MiB.
+
+    Raises:
+        ValueError: Если какая-либо строка не является корректным JSON.
+
+    Yields:
+        Any: Очередной разобранный объект.
+    """
+    pending = ""
+    line_no = 0
+
+    def parse(line: str) -> Any:
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Некорректный JSON в строке {line_no}: {e}") from e
+
+    for chunk in _iter_text_chunks(stream, chunk_size):
+        lines = (pending + chunk).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield parse(line)
+    if pending.strip():
+        line_no += 1
+        yield parse(pending)
+
+
+def iter_documents(stream: IO, file_format: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Потоково читает документы из файла в формате JSON-массива или JSONL.
+
+    Args:
+        stream (IO): Файловый объект.
+        file_format (str): "json" или "jsonl".
+        chunk_size (int, optional): Размер читаемого куска. Defaults to 1 MiB.
+
+    Raises:
+        ValueError: Если формат не поддерживается.
+
+    Returns:
+        Iterator[Any]: Итератор по документам.
+    """
+    if file_format == "json":
+        return iter_json_array(stream, chunk_size)
+    if file_format == "jsonl":
+        return iter_jsonl(stream, chunk_size)
+    raise ValueError(f"Неподдерживаемый формат файла: {file_format}")
+
+
+def batched(items: Iterable[Any], batch_size: int) -> Iterator[list[Any]]:
+    """
+    Разбивает итерируемый объект на списки фиксированного размера (последний может быть короче).
+
+    Args:
+        items (Iterable[Any]): Исходная последовательность.
+        batch_size (int): Размер батча.
+
+    Yields:
+        list[Any]: Очередной батч.
+    """
+    iterator = iter(items)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
@@ -0,0 +1,5 @@
+from .registry import Counter, Histogram, Registry
+from .instruments import (
+    REGISTRY, STAGE_DURATION, HTTP_REQUEST_DURATION, PREPROCESS_FILTERED,
+    CACHE_LOOKUPS, DEDUP_DOCUMENTS, SYNC_DOCUMENTS, LLM_REQUESTS, LLM_TOKENS
+)
@@ -0,0 +1,44 @@
+from src.metrics.registry import Registry
+
+REGISTRY = Registry()
+
+STAGE_DURATION = REGISTRY.histogram(
+    "rag_stage_duration_seconds",
+    "Длительность этапов пайплайнов: query (embed, retrieve, prompt, llm) и indexing (preprocess, embed, write)",
+    ("pipeline", "stage")
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "rag_http_request_duration_seconds",
+    "Длительность HTTP-запросов к сервису",
+    ("method", "path", "status")
+)
+PREPROCESS_FILTERED = REGISTRY.counter(
+    "rag_preprocess_filtered_documents_total",
+    "Документы, отброшенные шагами предобработки",
+    ("step",)
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "rag_cache_lookups_total",
+    "Обращения к кэшам (эмбеддингов документов и уровням кэша запросов): попадания и промахи",
+    ("cache", "result")
+)
+DEDUP_DOCUMENTS = REGISTRY.counter(
+    "rag_dedup_documents_total",
+    "Документы при записи в векторную БД: добавлены или отсечены как дубликаты по uid/хешу текста",
+    ("result",)
+)
+SYNC_DOCUMENTS = REGISTRY.counter(
+    "rag_sync_documents_total",
+    "Документы при upsert и удалении: добавлены, изменены, не изменились, удалены",
+    ("result",)
+)
+LLM_REQUESTS = REGISTRY.counter(
+    "rag_llm_requests_total",
+    "Вызовы LLM",
+    ("model", "status")
+)
+LLM_TOKENS = REGISTRY.counter(
+    "rag_llm_tokens_total",
+    "Токены LLM по данным провайдера (prompt, completion)",
+    ("model", "kind")
+)
@@ -0,0 +1,231 @@
+import os
+import sqlite3
+import threading
+import zlib
+
+import numpy as np
+
+
+def choose_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """
+    Подбирает разбиение сигнатуры на полосы (bands x rows = num_perm), при котором порог
+    срабатывания LSH (1 / bands) ** (1 / rows) ближе всего к заданному порогу Жаккара.
+
+    Args:
+        num_perm (int): Длина MinHash-сигнатуры.
+        threshold (float): Порог близости Жаккара.
+
+    Returns:
+        tuple[int, int]: Число полос и строк в полосе.
+    """
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold))
+
+
+class NearDuplicateIndex:
+    """
+    Индекс почти-дубликатов на MinHash-сигнатурах и LSH-разбиении на полосы.
+
+    Сигнатуры хранятся в SQLite и переживают перезапуски, так что новые батчи сверяются
+    со всем уже проиндексированным корпусом. В памяти держатся корзины полос
+    (полоса сигнатуры -> uid), поэтому поиск кандидатов не зависит от размера корпуса;
+    кандидаты подтверждаются оценкой близости Жаккара по совпадению сигнатур.
+
+    Документы текущего батча сначала добавляются в индекс временно (`stage`) и записываются
+    на диск только после успешной записи в векторную БД (`commit`), иначе откатываются (`rollback`).
+    Сигнатуры, записанные другими процессами, подхватываются через `refresh`.
+    """
+    def __init__(self, path: str, threshold: float = 0.8, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        """
+        Открывает (или создаёт) индекс.
+
+        Args:
+            path (str): Путь к SQLite-файлу с сигнатурами.
+            threshold (float, optional): Порог близости Жаккара для почти-дубликатов. Defaults to 0.8.
+            num_perm (int, optional): Длина MinHash-сигнатуры. Defaults to 128.
+            shingle_size (int, optional): Размер шингла в словах. Defaults to 5.
+            seed (int, optional): Сид хеш-функций (должен совпадать между запусками). Defaults to 1.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS signatures (uid TEXT PRIMARY KEY, signature BLOB NOT NULL)")
+        self._conn.commit()
+        self._staged: dict[str, np.ndarray] = {}
+        self._replaced: dict[str, np.ndarray] = {}
+        self._load()
+
+    def _load(self) -> None:
+        """
+        Загружает сохранённые сигнатуры в память и заново строит корзины полос
+        (временно добавленные документы сохраняются).
+        """
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self._signatures: dict[str, np.ndarray] = {}
+        self._buckets: list[dict[bytes, list[str]]] = [{} for _ in range(self.bands)]
+        for uid, blob in self._conn.execute("SELECT uid, signature FROM signatures"):
+            signature = np.frombuffer(blob, dtype=np.uint32)
+            if len(signature) == self.num_perm and uid not in self._staged:
+                self._insert(uid, signature)
+        for uid, signature in self._staged.items():
+            self._insert(uid, signature)
+
+    def refresh(self) -> bool:
+        """
+        Перечитывает сигнатуры, если файл индекса изменил другой процесс (`PRAGMA data_version`).
+
+        Returns:
+            bool: True, если индекс был перечитан.
+        """
+        with self._lock:
+            if self._conn.execute("PRAGMA data_version").fetchone()[0] == self._data_version:
+                return False
+            self._load()
+            return True
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Считает MinHash-сигнатуру текста по шинглам из `shingle_size` слов
+        (хеши шинглов — crc32, перестановки — multiply-shift хеширование).
+
+        Args:
+            text (str): Текст документа.
+
+        Returns:
+            np.ndarray: Сигнатура формы (num_perm,) типа uint32.
+        """
+        words = text.split()
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) >> np.uint64(32)
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def find(self, signature: np.ndarray, uid: str | None = None) -> tuple[str, float] | None:
+        """
+        Ищет самый близкий почти-дубликат среди сохранённых и временно добавленных документов.
+
+        Args:
+            signature (np.ndarray): MinHash-сигнатура документа.
+            uid (str | None, optional): uid самого документа (совпадение с собой не считается).
+
+        Returns:
+            tuple[str, float] | None: uid найденного документа и оценка близости Жаккара
+                или None, если близость ниже порога.
+        """
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        candidates.discard(uid)
+        best = None
+        for candidate in candidates:
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (candidate, similarity)
+        return best
+
+    def stage(self, uid: str, signature: np.ndarray, replace: bool = False) -> None:
+        """
+        Временно добавляет документ в индекс (до `commit` или `rollback`).
+
+        Args:
+            uid (str): Идентификатор документа.
+            signature (np.ndarray): MinHash-сигнатура документа.
+            replace (bool, optional): Заменить сигнатуру уже сохранённого документа с тем же uid
+                (новая версия документа); при `rollback` старая сигнатура восстанавливается. Defaults to False.
+        """
+        with self._lock:
+            old = self._signatures.get(uid)
+            if old is not None:
+                if not replace or uid in self._staged:
+                    return
+                self._replaced[uid] = old
+                self._remove_from_memory([uid])
+            self._staged[uid] = signature
+            self._insert(uid, signature)
+
+    def commit(self) -> int:
+        """
+        Записывает временно добавленные документы на диск.
+
+        Returns:
+            int: Количество записанных сигнатур.
+        """
+        with self._lock:
+            staged, self._staged = self._staged, {}
+            self._replaced = {}
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO signatures (uid, signature) VALUES (?, ?)",
+                    [(uid, signature.tobytes()) for uid, signature in staged.items()]
+                )
+        return len(staged)
+
+    def rollback(self) -> None:
+        """
+        Убирает из индекса временно добавленные документы и восстанавливает заменённые сигнатуры.
+        """
+        with self._lock:
+            staged, self._staged = self._staged, {}
+            replaced, self._replaced = self._replaced, {}
+            self._remove_from_memory(list(staged))
+            for uid, signature in replaced.items():
+                self._insert(uid, signature)
+
+    def remove(self, uids: list[str]) -> None:
+        """
+        Удаляет документы из индекса.
+
+        Args:
+            uids (list[str]): Идентификаторы документов.
+        """
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("DELETE FROM signatures WHERE uid = ?", [(uid,) for uid in uids])
+            self._remove_from_memory(uids)
+
+    def clear(self) -> None:
+        """
+        Полностью очищает индекс.
+        """
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM signatures")
+            self._signatures = {}
+            self._staged = {}
+            self._replaced = {}
+            self._buckets = [{} for _ in range(self.bands)]
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _insert(self, uid: str, signature: np.ndarray) -> None:
+        self._signatures[uid] = signature
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, []).append(uid)
+
+    def _remove_from_memory(self, uids: list[str]) -> None:
+        for uid in uids:
+            signature = self._signatures.pop(uid, None)
+            if signature is None:
+                continue
+            self._staged.pop(uid, None)
+            for band, key in enumerate(self._band_keys(signature)):
+                bucket = self._buckets[band].get(key)
+                if bucket and uid in bucket:
+                    bucket.remove(uid)
+                    if not bucket:
+                        del self._buckets[band][key]
@@ -1,7 +1,88 @@
 import hashlib
+import multiprocessing
+import os
 import re
 import html
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
 from configs import config, setup_logger
+from src.preprocessing.near_duplicates import NearDuplicateIndex
+from src.metrics import PREPROCESS_FILTERED
+
+
+HTML_TAG_RE = re.compile(r"<.*?>")
+
+
+def compile_transform(preprocessing_config: dict) -> Callable[[str], str]:
+    """
+    Компилирует секцию `preprocessing` конфигурации в одну функцию преобразования текста:
+    нижний регистр, HTML (unescape и удаление тегов предкомпилированным шаблоном), замена/удаление
+    одиночных символов (битые символы, невидимые пробелы, табуляции и переводы строк)
+    и схлопывание пробелов. Результат совпадает с поочерёдным применением шагов очистки.
+
+    Замены одиночных символов собираются в один список и выполняются через `str.replace`
+    только для символов, которые есть в тексте: на кириллических текстах `str.translate`
+    со словарём в разы медленнее. Пробелы схлопываются через `split`/`join`, что эквивалентно
+    `re.sub(r"\\s+", " ", text).strip()`, но быстрее.
+
+    Args:
+        preprocessing_config (dict): Секция `preprocessing` (используются `lowercase` и `clean_text`).
+
+    Returns:
+        Callable[[str], str]: Преобразование одного текста.
+    """
+    lowercase = preprocessing_config.get("lowercase", False)
+    clean_text_config = preprocessing_config.get("clean_text") or {}
+    clear_html = clean_text_config.get('clear_html', False)
+    clear_multiple_spaces = clean_text_config.get('clear_multiple_spaces', False)
+    replacements = []
+    if clean_text_config.get('clear_broken_bits', False):
+        replacements.append(("�", ""))
+    if clean_text_config.get('clear_invisible_spaces', False):
+        replacements += [("\xa0", " "), ("\u200b", "")]
+    if clean_text_config.get('clear_tabs_and_line_breaks', False):
+        replacements += [("\t", " "), ("\n", " ")]
+    replacements = tuple(replacements)
+
+    def transform(text: str) -> str:
+        if lowercase:
+            text = text.lower()
+        if clear_html:
+            if "&" in text:
+                text = html.unescape(text)
+            if "<" in text:
+                text = HTML_TAG_RE.sub(" ", text)
+        for old, new in replacements:
+            if old in text:
+                text = text.replace(old, new)
+        if clear_multiple_spaces:
+            text = " ".join(text.split())
+        return text
+
+    return transform
+
+
+def _process_shard(texts: list[str], preprocessing_config: dict) -> list[tuple[str, bool]]:
+    """
+    Выполняет подокументные шаги предобработки для части документов в процессе-воркере:
+    скомпилированное преобразование текста и проверку длины.
+
+    Args:
+        texts (list[str]): Тексты документов.
+        preprocessing_config (dict): Секция `preprocessing` конфигурации.
+
+    Returns:
+        list[tuple[str, bool]]: Для каждого текста — обработанный текст и признак прохождения фильтра по длине.
+    """
+    transform = compile_transform(preprocessing_config)
+    filter_config = preprocessing_config['filter_by_length']
+    min_length = filter_config['min_length'] if filter_config['working'] else 0
+    results = []
+    for text in texts:
+        text = transform(text)
+        results.append((text, len(text) >= min_length))
+    return results
+
 
 class Preprocessor:
     """
@@ -17,50 +98,138 @@ class Preprocessor:
         if self.config['filter_by_length']['working']:
             self.min_length = self.config['filter_by_length']['min_length']
         self.logger = setup_logger("preprocessor.log")
-
-    def preprocess_pipeline(self, docs: list[dict]) -> list[dict]:
+        self.parallel_config = self.config.get('parallel', {})
+        self._pool = None
+        self.transform = compile_transform(self.config)
+        near_duplicates_config = self.config.get('near_duplicates', {})
+        self.near_duplicates = NearDuplicateIndex(
+            near_duplicates_config['path'],
+            threshold=near_duplicates_config['threshold'],
+            num_perm=near_duplicates_config['num_perm'],
+            shingle_size=near_duplicates_config['shingle_size']
+        ) if near_duplicates_config.get('enabled', False) else None
+        self.last_near_duplicates: list[dict] = []
+
+    def preprocess_pipeline(self, docs: list[dict], replace_existing: bool = False) -> list[dict]:
         """
-        Последовательно обрабатывает список документов по шагам из конфигурации:
+        Обрабатывает список документов по шагам из конфигурации:
         приведение к нижнему регистру, очистка текста, удаление дубликатов и фильтрация по длине.
         Если проверка качества не пройдена (все пустые, битые или неверной структуры),
         возвращается пустой список.
 
+        Шаги выполняются за один проход по документам (см. `_fused_pipeline`),
+        большие наборы при включённом `parallel` — в пуле процессов.
+
         Args:
             docs (list[dict]): список документов (каждый документ — словарь с ключами 'uid', 'text' и др.).
+            replace_existing (bool, optional): Документы с уже известными uid — новые версии (upsert):
+                их сигнатуры в индексе почти-дубликатов заменяются. Defaults to False.
 
         Returns:
             list[dict]: список обработанных документов (может быть пустым).
         """
-        if self.config.get("quality_check", False):
-            docs_quality = self._quality_check(docs)
-            if not docs_quality:
+        if self.parallel_config.get('enabled', False) and len(docs) >= self.parallel_config['min_docs']:
+            if self.config.get("quality_check", False) and not self._quality_check(docs):
                 self.logger.warning(f"Документы не прошли проверку - возврщается пустой список.")
+                PREPROCESS_FILTERED.inc(len(docs), step="quality_check")
                 return []
+            self.logger.info(f"Начало предобработки: {len(docs)} документов")
+            docs = self._parallel_pipeline(docs)
+        else:
+            self.logger.info(f"Начало предобработки: {len(docs)} документов")
+            docs = self._fused_pipeline(docs)
+
+        if self.near_duplicates is not None:
+            docs = self._remove_near_duplicates(docs, replace_existing)
+        self.logger.info(f"Предоработка завершена. Итог: {len(docs)} документов")
+        return docs
 
-        self.logger.info(f"Начало предобработки: {len(docs)} документов")
-
-        if self.config.get("lowercase", False):
-            docs = self._to_lowercase(docs)
-            self.logger.info(f"Успешное приведения документов к нижнему регистру: {len(docs)} документов")
-
-        if self.config.get("clean_text", False):
-            docs = self._clean_text(docs)
-            self.logger.info(f"Успешная очистка: {len(docs)} документов")
+    def _fused_pipeline(self, docs: list[dict]) -> list[dict]:
+        """
+        Однопроходная предобработка: для каждого документа собирается статистика качества,
+        применяется скомпилированное преобразование текста, затем проверки на дубликат по uid,
+        дубликат по тексту (первое вхождение среди документов, прошедших проверку по uid)
+        и фильтр по длине. Результат совпадает с поочерёдным выполнением шагов.
 
-        if self.config["remove_duplicates"].get('by_id', False):
-            docs = self._remove_duplicates_by_id(docs)
-            self.logger.info(f"Успешное удаление дубликатов по ID: {len(docs)} документов")
-        if self.config["remove_duplicates"].get('by_hash', False):
-            docs = self._remove_duplicates_by_hash(docs)
-            self.logger.info(f"Успешное удаление дубликатов по Hash: {len(docs)} документов")
+        Args:
+            docs (list[dict]): список документов.
 
-        if self.config['filter_by_length']['working']:
-            docs = self._filter_by_length(docs)
-            self.logger.info(f"Успешная фильтрация по кол-ву символов {self.min_length}: {len(docs)} документов")
+        Returns:
+            list[dict]: список обработанных документов (пустой, если проверка качества не пройдена).
+        """
+        quality_check = self.config.get("quality_check", False)
+        by_id = self.config["remove_duplicates"].get('by_id', False)
+        by_hash = self.config["remove_duplicates"].get('by_hash', False)
+        min_length = self.min_length if self.config['filter_by_length']['working'] else 0
+        transform = self.transform
+
+        raw_uids, raw_texts = set(), set()
+        empty = short = broken = 0
+        seen_ids, seen_texts = set(), set()
+        removed_by_id = removed_by_hash = removed_by_length = 0
+        result = []
+        for doc in docs:
+            if quality_check:
+                if not isinstance(doc, dict) or "uid" not in doc or "text" not in doc:
+                    invalid = sum(1 for d in docs if not isinstance(d, dict) or "uid" not in d or "text" not in d)
+                    self.logger.error(f"Документы с неверной структурой: {invalid}")
+                    self.logger.warning(f"Документы не прошли проверку - возврщается пустой список.")
+                    PREPROCESS_FILTERED.inc(len(docs), step="quality_check")
+                    return []
+                raw_text = doc["text"]
+                raw_uids.add(doc["uid"])
+                raw_texts.add(raw_text)
+                if not raw_text.strip():
+                    empty += 1
+                if len(raw_text) < min_length:
+                    short += 1
+                if "�" in raw_text:
+                    broken += raw_text.count("�")
+
+            text = transform(doc["text"])
+            doc["text"] = text
+            if by_id:
+                if doc["uid"] in seen_ids:
+                    removed_by_id += 1
+                    continue
+                seen_ids.add(doc["uid"])
+            if by_hash:
+                if text in seen_texts:
+                    removed_by_hash += 1
+                    continue
+                seen_texts.add(text)
+            if len(text) < min_length:
+                removed_by_length += 1
+                continue
+            result.append(doc)
+
+        if quality_check:
+            self.logger.info(f"Проверка качества данных: всего {len(docs)} документов")
+            if empty:
+                self.logger.warning(f"Пустые документы: {empty}")
+            if empty == len(docs):
+                self.logger.error("Все документы пустые — пайплайн остановлен")
+                self.logger.warning(f"Документы не прошли проверку - возврщается пустой список.")
+                PREPROCESS_FILTERED.inc(len(docs), step="quality_check")
+                return []
+            self.logger.info(f"Дубликаты: {len(docs) - len(raw_uids)} по UID, {len(docs) - len(raw_texts)} по тексту")
+            self.logger.info(f"Короткие тексты (<{min_length} символов): {short}")
+            if broken:
+                self.logger.warning(f"Найдено битых символов: {broken}")
+
+        self.logger.info(
+            f"Удалено дубликатов: {removed_by_id} по ID, {removed_by_hash} по тексту; "
+            f"коротких текстов (<{min_length} символов): {removed_by_length}"
+        )
+        self._count_filtered(removed_by_id, removed_by_hash, removed_by_length)
+        return result
+
+    @staticmethod
+    def _count_filtered(by_id: int, by_hash: int, by_length: int) -> None:
+        PREPROCESS_FILTERED.inc(by_id, step="remove_duplicates_by_id")
+        PREPROCESS_FILTERED.inc(by_hash, step="remove_duplicates_by_hash")
+        PREPROCESS_FILTERED.inc(by_length, step="filter_by_length")
 
-        self.logger.info(f"Предоработка завершена. Итог: {len(docs)} документов")
-        return docs
-    
     def _quality_check(self, docs: list[dict]) -> bool:
         """
         Проверяет качество данных перед препроцессингом:
@@ -82,35 +251,47 @@ class Preprocessor:
             bool: True — данные пригодны для обработки, False — обработка прерывается.
         """
         self.logger.info(f"Проверка качества данных: всего {len(docs)} документов")
+        min_length = self.min_length if self.config['filter_by_length']['working'] else 0
+
+        invalid = 0
+        uids, texts = set(), set()
+        empty = short = broken = 0
+        for d in docs:
+            if not isinstance(d, dict) or "uid" not in d or "text" not in d:
+                invalid += 1
+                continue
+            text = d["text"]
+            uids.add(d["uid"])
+            texts.add(text)
+            if not text.strip():
+                empty += 1
+            if len(text) < min_length:
+                short += 1
+            if "�" in text:
+                broken += text.count("�")
+        if invalid:
+            self.logger.error(f"Документы с неверной структурой: {invalid}")
+            return False
 
-        invalid_docs = [d for d in docs if not isinstance(d, dict) or "uid" not in d or "text" not in d]
-        if invalid_docs:
-            self.logger.error(f"Документы с неверной структурой: {len(invalid_docs)}")
-            return False  
-
-        empty_docs = [d for d in docs if not d["text"].strip()]
-        if empty_docs:
-            self.logger.warning(f"Пустые документы: {len(empty_docs)}")
+        if empty:
+            self.logger.warning(f"Пустые документы: {empty}")
 
-        if len(empty_docs) == len(docs):
+        if empty == len(docs):
             self.logger.error("Все документы пустые — пайплайн остановлен")
             return False
 
-        uid_dupes = len(docs) - len({d["uid"] for d in docs})
-        text_dupes = len(docs) - len({d["text"] for d in docs})
-        self.logger.info(f"Дубликаты: {uid_dupes} по UID, {text_dupes} по тексту")
-
-        short_docs = [d for d in docs if len(d["text"]) < self.min_length]
-        self.logger.info(f"Короткие тексты (<{self.min_length} символов): {len(short_docs)}")
-
-        broken_count = sum(d["text"].count("�") for d in docs)
-        if broken_count:
-            self.logger.warning(f"Найдено битых символов: {broken_count}")
+        self.logger.info(f"Дубликаты: {len(docs) - len(uids)} по UID, {len(docs) - len(texts)} по тексту")
+        self.logger.info(f"Короткие тексты (<{min_length} символов): {short}")
+        if broken:
+            self.logger.warning(f"Найдено битых символов: {broken}")
 
         self.logger.info("Проверка качества завершена — данные пригодны для обработки")
         return True
 
 
+    # Пошаговые методы ниже — эталонная реализация шагов предобработки: `preprocess_pipeline` их не вызывает
+    # (см. `_fused_pipeline` и `compile_transform`), они нужны тестам для сверки с однопроходным путём.
+
     def _to_lowercase(self, docs: list[dict]) -> list[dict]:
         """
         Приводит текст всех документов в списке к нижнему регистру.
@@ -121,10 +302,9 @@ class Preprocessor:
         Returns:
             list[dict]: тот же список документов с изменённым текстом.
         """
-        for i, doc in enumerate(docs):
+        for doc in docs:
             doc['text'] = doc['text'].lower()
-            self.logger.debug(f"[to_lowercase] Документ {i}")
-        return docs 
+        return docs
 
     def _clean_text(self, docs: list[dict]) -> list[dict]:
         """
@@ -139,8 +319,7 @@ class Preprocessor:
             list[dict]: список документов с очищенными текстами.
         """
         clean_text_config = self.config['clean_text']
-        for i, doc in enumerate(docs):
-            original_len = len(doc['text'])
+        for doc in docs:
             if clean_text_config.get('clear_html', False):
                 doc['text'] = html.unescape(doc['text'])
                 doc['text'] = re.sub(r"<.*?>", " ", doc['text'])
@@ -152,7 +331,6 @@ class Preprocessor:
                 doc['text'] = doc['text'].replace("\t", " ").replace("\n", " ")
             if clean_text_config.get('clear_multiple_spaces', False):
                 doc['text'] = re.sub(r"\s+", " ", doc['text']).strip()
-            self.logger.debug(f"[clean_text] Документ {i}: длина {original_len} → {len(doc['text'])}")
         return docs
 
     def _remove_duplicates_by_id(self, docs: list[dict]) -> list[dict]:
@@ -208,3 +386,124 @@ class Preprocessor:
         filtered = [doc for doc in docs if len(doc['text']) >= self.min_length]
         self.logger.debug(f"[filter_by_length] Удалено {len(docs) - len(filtered)} коротких текстов (<{self.min_length} символов)")
         return filtered
+
+    def _remove_near_duplicates(self, docs: list[dict], replace_existing: bool = False) -> list[dict]:
+        """
+        Удаляет почти-дубликаты (MinHash + LSH) среди документов батча и уже проиндексированного корпуса.
+        Оставшиеся документы временно добавляются в индекс почти-дубликатов: после записи в векторную БД
+        их нужно подтвердить через `commit_near_duplicates` (или откатить через `rollback_near_duplicates`).
+        Пары (удалённый документ, найденный дубликат, близость) сохраняются в `last_near_duplicates`.
+
+        Args:
+            docs (list[dict]): список документов.
+            replace_existing (bool, optional): Заменять сигнатуры документов с уже известными uid. Defaults to False.
+
+        Returns:
+            list[dict]: список документов без почти-дубликатов.
+        """
+        self.last_near_duplicates = []
+        self.near_duplicates.refresh()
+        unique_docs = []
+        for doc in docs:
+            uid = str(doc['uid'])
+            signature = self.near_duplicates.signature(doc['text'])
+            match = self.near_duplicates.find(signature, uid)
+            if match is not None:
+                self.last_near_duplicates.append({"uid": uid, "duplicate_of": match[0], "similarity": round(match[1], 3)})
+                continue
+            self.near_duplicates.stage(uid, signature, replace=replace_existing)
+            unique_docs.append(doc)
+        for pair in self.last_near_duplicates:
+            self.logger.info(f"[near_duplicates] {pair['uid']} ~ {pair['duplicate_of']} (Жаккар ≈ {pair['similarity']})")
+        self.logger.info(f"Удалено почти-дубликатов: {len(self.last_near_duplicates)}")
+        PREPROCESS_FILTERED.inc(len(self.last_near_duplicates), step="near_duplicates")
+        return unique_docs
+
+    def commit_near_duplicates(self) -> None:
+        """
+        Сохраняет сигнатуры документов последнего батча в индексе почти-дубликатов.
+        """
+        if self.near_duplicates is not None:
+            self.near_duplicates.commit()
+
+    def remove_near_duplicates(self, uids: list[str]) -> None:
+        """
+        Удаляет сигнатуры документов из индекса почти-дубликатов (при удалении документов из хранилища).
+
+        Args:
+            uids (list[str]): uid документов.
+        """
+        if self.near_duplicates is not None:
+            self.near_duplicates.remove([str(uid) for uid in uids])
+
+    def rollback_near_duplicates(self) -> None:
+        """
+        Убирает сигнатуры документов последнего батча из индекса почти-дубликатов (например, при ошибке записи).
+        """
+        if self.near_duplicates is not None:
+            self.near_duplicates.rollback()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """
+        Возвращает пул процессов (создаётся при первом использовании и переиспользуется).
+        Процессы запускаются через spawn, чтобы не наследовать потоки и состояние сервиса.
+        При `workers: 0` ядра делятся между воркерами сервиса (`WEB_CONCURRENCY`, его выставляет
+        configs/gunicorn.conf.py), чтобы каждый воркер gunicorn не запускал пул на все ядра.
+        """
+        if self._pool is None:
+            server_workers = int(os.environ.get("WEB_CONCURRENCY") or 1)
+            workers = self.parallel_config.get('workers') or max(1, (os.cpu_count() or 1) // server_workers)
+            self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            self.logger.info(f"Запущен пул предобработки: {workers} процессов")
+        return self._pool
+
+    def _parallel_pipeline(self, docs: list[dict]) -> list[dict]:
+        """
+        Параллельная предобработка с результатом, идентичным последовательному пути.
+
+        Map: документы делятся на шарды, в процессах пула выполняются подокументные шаги
+        (скомпилированное преобразование текста и проверка длины).
+        Reduce: в исходном порядке документов удаляются дубликаты по uid, затем по тексту
+        (остаётся первое вхождение) и применяется фильтр по длине — так же, как в последовательном пути,
+        где фильтр идёт после удаления дубликатов.
+
+        Args:
+            docs (list[dict]): список документов (каждый содержит 'uid' и 'text').
+
+        Returns:
+            list[dict]: список обработанных документов.
+        """
+        shard_size = self.parallel_config['shard_size']
+        shards = [[doc['text'] for doc in docs[i:i + shard_size]] for i in range(0, len(docs), shard_size)]
+        pool = self._get_pool()
+        processed = [item for shard in pool.map(_process_shard, shards, [self.config] * len(shards)) for item in shard]
+
+        by_id = self.config["remove_duplicates"].get('by_id', False)
+        by_hash = self.config["remove_duplicates"].get('by_hash', False)
+        seen_ids, seen_texts, result = set(), set(), []
+        removed_by_id = removed_by_hash = 0
+        for doc, (text, long_enough) in zip(docs, processed):
+            doc['text'] = text
+            if by_id:
+                if doc['uid'] in seen_ids:
+                    removed_by_id += 1
+                    continue
+                seen_ids.add(doc['uid'])
+            if by_hash:
+                if text in seen_texts:
+                    removed_by_hash += 1
+                    continue
+                seen_texts.add(text)
+            if long_enough:
+                result.append(doc)
+        self.logger.info(f"Параллельная предобработка: {len(shards)} шардов, {len(docs)} -> {len(result)} документов")
+        self._count_filtered(removed_by_id, removed_by_hash, len(docs) - removed_by_id - removed_by_hash - len(result))
+        return result
+
+    def shutdown(self) -> None:
+        """
+        Останавливает пул процессов параллельной предобработки.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
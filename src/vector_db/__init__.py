@@ -1 +1,15 @@
-from .chroma_db import Chroma_db
\ No newline at end of file
+from .base import VectorStore
+from .lexical_index import LexicalIndex
+from .factory import create_vector_store, create_lexical_index
+from .snapshot import export_snapshot, import_snapshot, read_manifest, SnapshotMismatch
+
+_BACKENDS = {"Chroma_db": "chroma_db", "NumpyStore": "numpy_store"}
+
+
+def __getattr__(name: str):
+    # Бэкенды импортируются лениво: chromadb тяжёлый и нужен, только если выбран в конфигурации
+    if name in _BACKENDS:
+        from importlib import import_module
+
+        return getattr(import_module(f"{__name__}.{_BACKENDS[name]}"), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,133 @@
+from abc import ABC, abstractmethod
+from typing import Any, Iterator
+
+class VectorStore(ABC):
+    """
+    Абстрактный интерфейс векторного хранилища документов.
+
+    Реализации хранят эмбеддинги, тексты и метаданные документов, отсекают дубликаты
+    по хешу текста и возвращают результаты поиска в формате ChromaDB:
+    словарь со списками `ids`, `documents`, `metadatas`, `distances` (по одному списку на запрос).
+    """
+    @property
+    @abstractmethod
+    def generation(self) -> int:
+        """
+        Номер поколения хранилища: увеличивается при каждом изменении содержимого.
+        """
+
+    @abstractmethod
+    def add_unique_by_hash(self, ids: list[str], texts: list[str], embeddings: list, metadatas: list[dict[str, Any]]) -> list[str]:
+        """
+        Добавляет документы, пропуская уже существующие uid и тексты с уже известным хешем.
+
+        Returns:
+            list[str]: Id реально добавленных документов.
+        """
+
+    @abstractmethod
+    def upsert(self, ids: list[str], texts: list[str], embeddings: list, metadatas: list[dict[str, Any]]) -> list[str]:
+        """
+        Добавляет документы или заменяет существующие с теми же uid.
+
+        Returns:
+            list[str]: Id записанных документов.
+        """
+
+    @abstractmethod
+    def query(self, embedding: list, top_k: int = 5) -> dict:
+        """
+        Ищет наиболее похожие документы по эмбеддингу.
+
+        Returns:
+            dict: Результаты поиска в формате ChromaDB.
+        """
+
+    @abstractmethod
+    def query_batch(self, embeddings: list, top_k: int = 5) -> dict:
+        """
+        Ищет наиболее похожие документы сразу для нескольких эмбеддингов одним вызовом.
+
+        Returns:
+            dict: Результаты поиска в формате ChromaDB: по одному списку на каждый запрос, в порядке запросов.
+        """
+
+    @abstractmethod
+    def get(self, ids: list[str]) -> dict:
+        """
+        Возвращает документы по id (отсутствующие id пропускаются).
+
+        Returns:
+            dict: Словарь со списками `ids`, `documents`, `metadatas` (формат `get` ChromaDB).
+        """
+
+    @abstractmethod
+    def delete_by_id(self, ids: list[str]) -> int:
+        """
+        Удаляет документы по id.
+
+        Returns:
+            int: Оставшееся число документов.
+        """
+
+    @abstractmethod
+    def document_hashes(self, uids: list[str]) -> dict[str, str | None]:
+        """
+        Возвращает хеши версий (`doc_hash`) сохранённых документов по uid документа (для чанков — uid исходного документа).
+
+        Returns:
+            dict[str, str | None]: Хеш версии для каждого найденного документа
+                (None, если документ записан без хеша).
+        """
+
+    @abstractmethod
+    def chunk_ids(self, uids: list[str]) -> list[str]:
+        """
+        Возвращает id всех записей (чанков) документов.
+
+        Returns:
+            list[str]: id записей в хранилище.
+        """
+
+    @abstractmethod
+    def find_documents(self, where: dict[str, Any]) -> list[str]:
+        """
+        Ищет документы по равенству полей метаданных (все условия одновременно;
+        значение-список означает совпадение с любым из значений).
+
+        Returns:
+            list[str]: uid найденных документов (для чанков — uid исходного документа).
+        """
+
+    @abstractmethod
+    def iter_records(self, batch_size: int = 4096) -> Iterator[dict]:
+        """
+        Обходит все записи хранилища пачками (для экспорта снимка).
+
+        Returns:
+            Iterator[dict]: Пачки со списками `ids`, `documents`, `metadatas` и матрицей `embeddings` (np.ndarray).
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        """
+        Возвращает количество документов.
+        """
+
+    @abstractmethod
+    def has_hash(self, text_hash: str) -> bool:
+        """
+        Проверяет, есть ли документ с таким хешем текста.
+        """
+
+    @abstractmethod
+    def get_existing_ids(self) -> list[str]:
+        """
+        Возвращает id всех документов.
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Полностью очищает хранилище.
+        """
@@ -1,26 +1,80 @@
 import chromadb
 from chromadb.config import Settings
-from typing import Any
+from filelock import FileLock
+from typing import Any, Iterator
+import os
+import threading
+
+import numpy as np
 
 from configs import setup_logger
 from src.utils import calculate_text_hash
+from src.vector_db.base import VectorStore
+from src.vector_db.hash_index import HashIndex, document_entry, record_hash
 
-class Chroma_db:
+class Chroma_db(VectorStore):
     """
     Класс-обёртка для работы с ChromaDB: хранение и поиск эмбеддингов документов.
+
+    Режимы клиента:
+    - `persistent` — коллекция хранится в файлах `persist_dir` и открывается в процессе
+      (один процесс на папку: HNSW-индекс Chroma держится в памяти процесса);
+    - `http` — коллекция хранится на отдельном сервере Chroma (`chroma run --path <папка>`),
+      общем для всех воркеров сервиса; клиент держит пул HTTP-соединений.
+
+    Индекс хешей лежит в `persist_dir` в обоих режимах. Запись сериализуется между процессами
+    файловой блокировкой, а изменения индекса хешей, сделанные другими воркерами, подхватываются перед чтением.
     """
-    def __init__(self, persist_dir: str = "vector_db"):
+    def __init__(self, persist_dir: str = "vector_db", mode: str = "persistent", host: str = "127.0.0.1", port: int = 8100):
         """
-        Инициализирует клиента и коллекцию ChromaDB, настраивает логирование.
+        Инициализирует клиента и коллекцию ChromaDB, индекс хешей текстов и логирование.
 
         Args:
-            persist_dir (str, optional): Папка для хранения ChromaDB. Defaults to "vector_db".
+            persist_dir (str, optional): Папка для хранения ChromaDB и индекса хешей. Defaults to "vector_db".
+            mode (str, optional): "persistent" или "http". Defaults to "persistent".
+            host (str, optional): Хост сервера Chroma в режиме "http". Defaults to "127.0.0.1".
+            port (int, optional): Порт сервера Chroma в режиме "http". Defaults to 8100.
+
+        Raises:
+            ValueError: Если режим клиента не поддерживается.
         """
-        self.client = chromadb.Client(Settings(persist_directory=persist_dir))
+        settings = Settings(anonymized_telemetry=False)
+        if mode == "persistent":
+            self.client = chromadb.PersistentClient(path=persist_dir, settings=settings)
+        elif mode == "http":
+            self.client = chromadb.HttpClient(host=host, port=port, settings=settings)
+        else:
+            raise ValueError(f"Неподдерживаемый режим клиента Chroma: {mode}")
         self.collection = self.client.get_or_create_collection("documents")
         self.logger = setup_logger("chroma_db.log")
-        self.logger.info(f"Chroma DB инициализирована, путь: {persist_dir}")
+        self.hash_index = HashIndex(os.path.join(persist_dir, "hash_index.sqlite3"))
+        self._write_lock = threading.Lock()
+        self._file_lock = FileLock(os.path.join(persist_dir, "write.lock"))
+        with self._file_lock:
+            self._sync_hash_index()
+        location = f"{host}:{port}" if mode == "http" else persist_dir
+        self.logger.info(f"Chroma DB инициализирована, режим: {mode}, путь: {location}")
         
+    def _sync_hash_index(self) -> None:
+        """
+        Сверяет индекс хешей с коллекцией и пересобирает его, если количество записей расходится
+        (например, коллекция была создана до появления индекса или очищена вне этого класса).
+        Полный проход по коллекции выполняется только в этом случае.
+        """
+        collection_count = self.collection.count()
+        if collection_count == len(self.hash_index):
+            return
+        self.logger.warning(
+            f"Индекс хешей рассинхронизирован с коллекцией ({len(self.hash_index)} != {collection_count}), пересборка"
+        )
+        result = self.collection.get(include=["metadatas", "documents"])
+        pairs, documents = [], []
+        for uid, meta, text in zip(result["ids"], result["metadatas"] or [], result["documents"] or []):
+            text_hash = meta.get("text_hash") if meta else None
+            pairs.append((uid, text_hash or calculate_text_hash(text or "")))
+            documents.append(document_entry(uid, meta))
+        self.hash_index.rebuild(pairs, documents)
+
     def get_existing_ids(self) -> list[str]:
         """
         Получает все id, уже сохранённые в коллекции.
@@ -28,62 +82,120 @@ class Chroma_db:
         Returns:
             list[str]: Список строковых id.
         """
-        all_ids = self.collection.get(include=["documents"])["ids"]
+        self.hash_index.refresh()
+        all_ids = self.hash_index.uids
         self.logger.debug(f"Текущее количество документов в базе: {len(all_ids)}")
-        qnique_all_lids = set(all_ids)
-        list_all_ids = list(qnique_all_lids)
-        return list_all_ids
-        
-    def _get_existing_hashes(self) -> set:
+        return all_ids
+
+    def count(self) -> int:
         """
-        Получает все text_hash, уже сохранённые в коллекции.
+        Возвращает количество документов в коллекции за O(1) по индексу хешей.
 
         Returns:
-            set: Множество строковых md5-хешей текстов.
-        """
-        hashes = set()
-        result = self.collection.get(include=["metadatas"])
-        metadatas = result["metadatas"] or []
-        for meta in metadatas:
-            if meta and "text_hash" in meta:
-                hashes.add(meta["text_hash"])
-        self.logger.info(f"Количество уникальных text_hash: {len(hashes)}")
-        
-        return hashes
-    
-    def add_unique_by_hash(self, ids: list[str], texts: list[str], embeddings: list[str], metadatas: list[dict[str, Any]]) -> None:
+            int: Количество документов.
         """
-        Добавляет только уникальные документы по хешу текста (text_hash).
+        self.hash_index.refresh()
+        return len(self.hash_index)
+
+    @property
+    def generation(self) -> int:
+        """
+        Номер поколения коллекции: увеличивается при каждом добавлении, удалении и очистке.
+        Используется кэшами запросов для автоматической инвалидации.
+        """
+        self.hash_index.refresh()
+        return self.hash_index.generation
+
+    def has_hash(self, text_hash: str) -> bool:
+        """
+        Проверяет, есть ли в коллекции документ с таким хешем текста.
+
+        Args:
+            text_hash (str): MD5-хеш текста.
+
+        Returns:
+            bool: True, если такой текст уже сохранён.
+        """
+        self.hash_index.refresh()
+        return self.hash_index.has_hash(text_hash)
+
+    def add_unique_by_hash(self, ids: list[str], texts: list[str], embeddings: list[str], metadatas: list[dict[str, Any]]) -> list[str]:
+        """
+        Добавляет только уникальные документы по хешу текста (text_hash) и uid.
+        Проверка уникальности выполняется по индексу хешей без чтения коллекции. Чанки одного документа
+        (`parent_uid`) отбираются вместе: документ записывается целиком или отсекается целиком.
 
         Args:
             ids (list[str]): Уникальные идентификаторы документов.
             texts (list[str]): Исходные тексты документов.
             embeddings (list[list[float]]): Эмбеддинги документов.
             metadatas (list[dict[str, Any]]): Метаданные документов (по одному словарю на документ).
+
+        Returns:
+            list[str]: Id реально добавленных документов.
         """
-        existing_hashes = self._get_existing_hashes()
-        new_ids, new_embeddings, new_metadatas = [], [], []
-        for i, text in enumerate(texts):
-            hashed_text = calculate_text_hash(text)
-            if hashed_text not in existing_hashes:
+        with self._write_lock, self._file_lock:
+            self.hash_index.refresh()
+            selected = self.hash_index.select_new_documents([
+                (uid, document_entry(uid, metadata)[0], record_hash(text, metadata))
+                for uid, text, metadata in zip(ids, texts, metadatas or [None] * len(ids))
+            ])
+            new_ids, new_texts, new_embeddings, new_metadatas, new_hashes = [], [], [], [], []
+            for i in selected:
+                text = texts[i]
                 metadata = dict(metadatas[i]) if metadatas else {}
+                hashed_text = record_hash(text, metadata)
                 metadata["text_hash"] = hashed_text
                 new_ids.append(ids[i])
+                new_texts.append(text)
                 new_embeddings.append(embeddings[i])
                 new_metadatas.append(metadata)
-                
-        if new_ids:
-            self.collection.add(
-                ids=new_ids,
-                documents=[texts[i] for i in range(len(new_ids))],
-                embeddings=new_embeddings,
-                metadatas=new_metadatas
+                new_hashes.append(hashed_text)
+
+            if new_ids:
+                self.collection.add(
+                    ids=new_ids,
+                    documents=new_texts,
+                    embeddings=new_embeddings,
+                    metadatas=new_metadatas
+                )
+                self.hash_index.add(
+                    list(zip(new_ids, new_hashes)),
+                    [document_entry(uid, meta) for uid, meta in zip(new_ids, new_metadatas)]
+                )
+                self.logger.info(f"Добавлено {len(new_ids)} новых уникальных документов.")
+            else:
+                self.logger.info("Новых уникальных документов дял добавления не обнаружено.")
+        return new_ids
+
+    def upsert(self, ids: list[str], texts: list[str], embeddings: list, metadatas: list[dict[str, Any]]) -> list[str]:
+        """
+        Добавляет документы или заменяет существующие с теми же id.
+
+        Args:
+            ids (list[str]): Идентификаторы документов.
+            texts (list[str]): Тексты документов.
+            embeddings (list[list[float]]): Эмбеддинги документов.
+            metadatas (list[dict[str, Any]]): Метаданные документов.
+
+        Returns:
+            list[str]: Id записанных документов.
+        """
+        if not ids:
+            return []
+        hashes = [record_hash(text, metadatas[i] if metadatas else None) for i, text in enumerate(texts)]
+        new_metadatas = [
+            {**(dict(metadatas[i]) if metadatas else {}), "text_hash": hashes[i]} for i in range(len(ids))
+        ]
+        with self._write_lock, self._file_lock:
+            self.hash_index.refresh()
+            self.collection.upsert(ids=ids, documents=texts, embeddings=embeddings, metadatas=new_metadatas)
+            self.hash_index.add(
+                list(zip(ids, hashes)), [document_entry(uid, meta) for uid, meta in zip(ids, new_metadatas)]
             )
-            self.logger.info(f"Добавлено {len(new_ids)} новых уникальных документов.")
-        else:
-            self.logger.info("Новых уникальных документов дял добавления не обнаружено.")
-            
-            
+        self.logger.info(f"Записано (upsert) {len(ids)} документов.")
+        return list(ids)
+
     def query(self, embedding: list, top_k: int = 5) -> dict:
         """
         Ищет наиболее похожие документы по эмбеддингу.
@@ -98,7 +210,109 @@ class Chroma_db:
         result = self.collection.query(query_embeddings=[embedding], n_results=top_k)
         self.logger.debug(f"Выполнен поиск: top_k={top_k}, найден результатов: {len(result)}")
         return result
-        
+
+    def query_batch(self, embeddings: list, top_k: int = 5) -> dict:
+        """
+        Ищет наиболее похожие документы сразу для нескольких эмбеддингов одним запросом к коллекции.
+
+        Args:
+            embeddings (list[list[float]]): Векторы эмбеддингов запросов.
+            top_k (int, optional): Сколько результатов вернуть на каждый запрос. Defaults to 5.
+
+        Returns:
+            dict: Результаты поиска: по одному списку ids/documents/metadatas/distances на запрос.
+        """
+        if len(embeddings) == 0:
+            return {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        result = self.collection.query(query_embeddings=list(embeddings), n_results=top_k)
+        self.logger.debug(f"Выполнен пакетный поиск: запросов={len(embeddings)}, top_k={top_k}")
+        return result
+
+    def get(self, ids: list[str]) -> dict:
+        """
+        Возвращает документы по id (отсутствующие id пропускаются).
+
+        Args:
+            ids (list[str]): Список id.
+
+        Returns:
+            dict: Словарь со списками `ids`, `documents`, `metadatas`.
+        """
+        if not ids:
+            return {"ids": [], "documents": [], "metadatas": []}
+        result = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        return {"ids": result["ids"], "documents": result["documents"], "metadatas": result["metadatas"]}
+
+    def document_hashes(self, uids: list[str]) -> dict[str, str | None]:
+        """
+        Возвращает хеши версий (`doc_hash`) сохранённых документов по индексу хешей, без чтения коллекции.
+
+        Args:
+            uids (list[str]): uid документов.
+
+        Returns:
+            dict[str, str | None]: Хеш версии для каждого найденного документа.
+        """
+        self.hash_index.refresh()
+        return self.hash_index.document_hashes(uids)
+
+    def chunk_ids(self, uids: list[str]) -> list[str]:
+        """
+        Возвращает id всех записей (чанков) документов.
+
+        Args:
+            uids (list[str]): uid документов.
+
+        Returns:
+            list[str]: id записей в коллекции.
+        """
+        self.hash_index.refresh()
+        return self.hash_index.chunk_uids(uids)
+
+    def find_documents(self, where: dict[str, Any]) -> list[str]:
+        """
+        Ищет документы по равенству полей метаданных (фильтр `where` ChromaDB).
+
+        Args:
+            where (dict[str, Any]): Поле -> значение (или список допустимых значений).
+
+        Returns:
+            list[str]: uid найденных документов.
+        """
+        if not where:
+            return []
+        clauses = [
+            {key: {"$in": list(value)} if isinstance(value, (list, tuple)) else {"$eq": value}}
+            for key, value in where.items()
+        ]
+        result = self.collection.get(where=clauses[0] if len(clauses) == 1 else {"$and": clauses}, include=["metadatas"])
+        return list(dict.fromkeys(document_entry(uid, meta)[0] for uid, meta in zip(result["ids"], result["metadatas"])))
+
+    def iter_records(self, batch_size: int = 4096) -> Iterator[dict]:
+        """
+        Обходит все записи коллекции пачками по списку uid из индекса хешей.
+        Записи, удалённые другим процессом во время обхода, пропускаются.
+
+        Args:
+            batch_size (int, optional): Записей в пачке. Defaults to 4096.
+
+        Yields:
+            dict: Списки `ids`, `documents`, `metadatas` и матрица `embeddings`.
+        """
+        uids = self.get_existing_ids()
+        for start in range(0, len(uids), batch_size):
+            result = self.collection.get(
+                ids=uids[start:start + batch_size], include=["documents", "metadatas", "embeddings"]
+            )
+            if not result["ids"]:
+                continue
+            yield {
+                "ids": result["ids"],
+                "documents": result["documents"],
+                "metadatas": result["metadatas"],
+                "embeddings": np.asarray(result["embeddings"], dtype=np.float32),
+            }
+
     def delete_by_id(self, ids: list[int]) -> int: 
         """
         Удаляет документы по их id.
@@ -109,19 +323,29 @@ class Chroma_db:
         Returns:
             int: Оставшееся число документов в коллекции.
         """
-        self.collection.delete(ids=ids)
-        remaining = len(self.get_existing_ids())
+        with self._write_lock, self._file_lock:
+            self.hash_index.refresh()
+            self.collection.delete(ids=ids)
+            self.hash_index.remove(ids)
+        remaining = self.count()
         self.logger.info(f"Удалено {len(ids)} документов. В коллекции осталось: {remaining}")
         
         return remaining
         
     def clear(self) -> None:
         """
-        Полностью очищает коллекцию от всех документов.
+        Полностью очищает коллекцию от всех документов. Документы удаляются батчами, а сама коллекция
+        не пересоздаётся, чтобы клиенты других воркеров продолжали работать с ней.
         """
-        all_ids = self.get_existing_ids()
-        if all_ids:
-            self.collection.delete(ids=all_ids)
-            self.logger.info(f"Коллекция полностью очищена. Было удалено: {len(all_ids)}")
+        with self._write_lock, self._file_lock:
+            removed = self.count()
+            if removed:
+                ids = self.collection.get(include=[])["ids"]
+                batch_size = self.client.get_max_batch_size()
+                for start in range(0, len(ids), batch_size):
+                    self.collection.delete(ids=ids[start:start + batch_size])
+                self.hash_index.clear()
+        if removed:
+            self.logger.info(f"Коллекция полностью очищена. Было удалено: {removed}")
         else:
             self.logger.info("Коллекция уже пуста. Удалять нечего.")
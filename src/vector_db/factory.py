@@ -0,0 +1,79 @@
+import os
+
+from configs import config
+from src.vector_db.base import VectorStore
+from src.vector_db.lexical_index import LexicalIndex
+
+BACKENDS = ("chroma", "numpy")
+
+
+def chroma_settings() -> dict:
+    """
+    Настройки клиента ChromaDB из `vector_db.chroma`. Переменные окружения `CHROMA_MODE`, `CHROMA_HOST`
+    и `CHROMA_PORT` переопределяют конфигурацию (например, в docker-compose с отдельным сервером Chroma).
+
+    Returns:
+        dict: mode, host и port.
+    """
+    chroma_config = config.get('vector_db', {}).get('chroma', {})
+    return {
+        "mode": os.environ.get("CHROMA_MODE") or chroma_config.get('mode', 'persistent'),
+        "host": os.environ.get("CHROMA_HOST") or chroma_config.get('host', '127.0.0.1'),
+        "port": int(os.environ.get("CHROMA_PORT") or chroma_config.get('port', 8100)),
+    }
+
+
+def create_vector_store(backend: str | None = None, persist_dir: str | None = None) -> VectorStore:
+    """
+    Создаёт векторное хранилище выбранного бэкенда.
+
+    Args:
+        backend (str | None, optional): "chroma" или "numpy". По умолчанию — из конфигурации.
+        persist_dir (str | None, optional): Папка хранилища. По умолчанию — из конфигурации.
+
+    Raises:
+        ValueError: Если бэкенд не поддерживается.
+
+    Returns:
+        VectorStore: Экземпляр хранилища.
+    """
+    cfg = config.get('vector_db', {})
+    backend = backend or cfg.get('backend', 'chroma')
+    persist_dir = persist_dir or cfg.get('persist_dir', 'vector_db')
+    if backend == "chroma":
+        from src.vector_db.chroma_db import Chroma_db
+
+        return Chroma_db(persist_dir, **chroma_settings())
+    if backend == "numpy":
+        from src.vector_db.numpy_store import NumpyStore
+
+        return NumpyStore(persist_dir, compact_dead_ratio=cfg.get('numpy', {}).get('compact_dead_ratio', 0.3))
+    raise ValueError(f"Неподдерживаемый бэкенд векторного хранилища: {backend}")
+
+
+def create_lexical_index(persist_dir: str | None = None, vector_db: VectorStore | None = None) -> LexicalIndex | None:
+    """
+    Создаёт лексический (BM25) индекс в подпапке `lexical` хранилища, если он включён в конфигурации.
+    Если передано векторное хранилище, пустой индекс заполняется его документами (`LexicalIndex.backfill`).
+
+    Args:
+        persist_dir (str | None, optional): Папка хранилища. По умолчанию — из конфигурации.
+        vector_db (VectorStore | None, optional): Векторное хранилище для заполнения пустого индекса.
+
+    Returns:
+        LexicalIndex | None: Индекс или None, если лексический поиск выключен.
+    """
+    cfg = config.get('vector_db', {})
+    lexical_config = cfg.get('lexical', {})
+    if not lexical_config.get('enabled', False):
+        return None
+    persist_dir = persist_dir or cfg.get('persist_dir', 'vector_db')
+    lexical_index = LexicalIndex(
+        os.path.join(persist_dir, "lexical"),
+        k1=lexical_config['k1'],
+        b=lexical_config['b'],
+        max_segments=lexical_config['max_segments']
+    )
+    if vector_db is not None:
+        lexical_index.backfill(vector_db)
+    return lexical_index
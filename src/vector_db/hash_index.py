@@ -0,0 +1,319 @@
+import os
+import sqlite3
+import threading
+from collections import Counter
+
+from src.utils import calculate_text_hash
+
+
+def record_hash(text: str, metadata: dict | None) -> str:
+    """
+    Возвращает хеш текста для записи хранилища: у чанков это хеш всего текста документа
+    (`text_hash`, который проставляет индексатор до разбиения), иначе — хеш текста самой записи.
+
+    Args:
+        text (str): Текст записи.
+        metadata (dict | None): Метаданные записи.
+
+    Returns:
+        str: MD5-хеш текста документа.
+    """
+    return (metadata or {}).get("text_hash") or calculate_text_hash(text)
+
+
+def document_entry(uid: str, metadata: dict | None) -> tuple[str, str | None]:
+    """
+    Возвращает uid документа и хеш его текста для записи хранилища по её метаданным
+    (`parent_uid` у чанков и `doc_hash`, которые проставляет индексатор).
+
+    Args:
+        uid (str): uid записи.
+        metadata (dict | None): Метаданные записи.
+
+    Returns:
+        tuple[str, str | None]: uid документа и хеш его текста (None, если не записан).
+    """
+    metadata = metadata or {}
+    return metadata.get("parent_uid", uid), metadata.get("doc_hash")
+
+
+class HashIndex:
+    """
+    Персистентный индекс uid -> text_hash, который ведётся инкрементально рядом с коллекцией.
+    Для каждой записи хранится также uid исходного документа (для чанков — `parent_uid`)
+    и хеш всего текста документа (`doc_hash`), по которому upsert определяет изменившиеся документы.
+
+    Данные хранятся в SQLite-файле и дублируются в памяти процесса, поэтому проверки
+    наличия uid/хеша и подсчёт количества документов выполняются за O(1)
+    без выгрузки всей коллекции. Каждое изменение увеличивает номер поколения (`generation`),
+    по которому кэши определяют, что содержимое коллекции изменилось.
+    Изменения, сделанные другими процессами (воркерами сервиса), подхватываются через `refresh`.
+    """
+    def __init__(self, path: str):
+        """
+        Открывает (или создаёт) файл индекса и загружает его содержимое в память.
+
+        Args:
+            path (str): Путь к SQLite-файлу индекса.
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes (uid TEXT PRIMARY KEY, text_hash TEXT NOT NULL, parent_uid TEXT, doc_hash TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(hashes)")}
+        if "parent_uid" not in columns:
+            # Индекс старого формата без документов: очищается, и хранилище пересобирает его по коллекции
+            self._conn.execute("DROP TABLE hashes")
+            self._conn.execute(
+                "CREATE TABLE hashes (uid TEXT PRIMARY KEY, text_hash TEXT NOT NULL, parent_uid TEXT, doc_hash TEXT)"
+            )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+        self._conn.commit()
+        self._load()
+
+    def _load(self) -> None:
+        """
+        Загружает пары uid -> text_hash из файла в память.
+        """
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        rows = self._conn.execute("SELECT uid, text_hash, parent_uid, doc_hash FROM hashes").fetchall()
+        self._uid_to_hash = {uid: text_hash for uid, text_hash, _, _ in rows}
+        self._hash_counts = Counter(self._uid_to_hash.values())
+        self._uid_to_parent: dict[str, str] = {}
+        self._parent_uids: dict[str, set[str]] = {}
+        self._doc_hashes: dict[str, str | None] = {}
+        for uid, _, parent_uid, doc_hash in rows:
+            self._link(uid, parent_uid or uid, doc_hash)
+        self.generation = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def refresh(self) -> bool:
+        """
+        Перечитывает индекс, если файл изменил другой процесс. Проверка — один запрос
+        `PRAGMA data_version`, который меняется только после чужих коммитов.
+
+        Returns:
+            bool: True, если индекс был перечитан.
+        """
+        with self._lock:
+            if self._conn.execute("PRAGMA data_version").fetchone()[0] == self._data_version:
+                return False
+            self._load()
+            return True
+
+    def __len__(self) -> int:
+        return len(self._uid_to_hash)
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self._uid_to_hash
+
+    @property
+    def uids(self) -> list[str]:
+        """
+        Список всех uid в индексе.
+        """
+        return list(self._uid_to_hash)
+
+    def has_uid(self, uid: str) -> bool:
+        """
+        Проверяет, есть ли документ с таким uid.
+
+        Args:
+            uid (str): Идентификатор документа.
+
+        Returns:
+            bool: True, если uid уже проиндексирован.
+        """
+        return uid in self._uid_to_hash
+
+    def has_hash(self, text_hash: str) -> bool:
+        """
+        Проверяет, есть ли документ с таким хешем текста.
+
+        Args:
+            text_hash (str): MD5-хеш текста.
+
+        Returns:
+            bool: True, если текст с таким хешем уже проиндексирован.
+        """
+        return self._hash_counts.get(text_hash, 0) > 0
+
+    def get_hash(self, uid: str) -> str | None:
+        """
+        Возвращает хеш текста документа по его uid.
+
+        Args:
+            uid (str): Идентификатор документа.
+
+        Returns:
+            str | None: Хеш текста или None, если uid не найден.
+        """
+        return self._uid_to_hash.get(uid)
+
+    def document_hashes(self, parent_uids: list[str]) -> dict[str, str | None]:
+        """
+        Возвращает хеши версий (`doc_hash`) документов по uid документов (для чанкованных — по `parent_uid`).
+
+        Args:
+            parent_uids (list[str]): uid документов.
+
+        Returns:
+            dict[str, str | None]: Хеш версии документа для каждого найденного uid
+                (None, если запись сделана до появления хешей документов).
+        """
+        return {uid: self._doc_hashes[uid] for uid in parent_uids if uid in self._doc_hashes}
+
+    def chunk_uids(self, parent_uids: list[str]) -> list[str]:
+        """
+        Возвращает uid всех записей (чанков) документов.
+
+        Args:
+            parent_uids (list[str]): uid документов.
+
+        Returns:
+            list[str]: uid записей в хранилище.
+        """
+        return [uid for parent in dict.fromkeys(parent_uids) for uid in sorted(self._parent_uids.get(parent, ()))]
+
+    def select_new_documents(self, records: list[tuple[str, str, str]]) -> list[int]:
+        """
+        Отбирает записи новых документов: документ (все его чанки) отсекается целиком, если его uid
+        уже есть в индексе или его текст совпадает с уже сохранённым или выбранным ранее в этом списке.
+
+        Args:
+            records (list[tuple[str, str, str]]): Для каждой записи — uid, uid документа и хеш текста документа.
+
+        Returns:
+            list[int]: Позиции выбранных записей (повторы uid внутри списка пропускаются).
+        """
+        accepted: dict[str, bool] = {}
+        seen_uids, seen_hashes, selected = set(), set(), []
+        for i, (uid, parent, text_hash) in enumerate(records):
+            if parent not in accepted:
+                accepted[parent] = not (
+                    parent in self._parent_uids or uid in self._uid_to_hash
+                    or text_hash in seen_hashes or self.has_hash(text_hash)
+                )
+                if accepted[parent]:
+                    seen_hashes.add(text_hash)
+            if accepted[parent] and uid not in seen_uids:
+                seen_uids.add(uid)
+                selected.append(i)
+        return selected
+
+    def parent_uid(self, uid: str) -> str | None:
+        """
+        Возвращает uid документа, которому принадлежит запись.
+
+        Args:
+            uid (str): uid записи (чанка).
+
+        Returns:
+            str | None: uid документа или None, если запись не найдена.
+        """
+        return self._uid_to_parent.get(uid)
+
+    def add(self, pairs: list[tuple[str, str]], documents: list[tuple[str, str | None]] | None = None) -> None:
+        """
+        Добавляет (или перезаписывает) пары uid -> text_hash.
+
+        Args:
+            pairs (list[tuple[str, str]]): Пары (uid, text_hash).
+            documents (list[tuple[str, str | None]] | None, optional): Для каждой пары — uid документа
+                и хеш его текста. По умолчанию запись считается отдельным документом без хеша.
+        """
+        if not pairs:
+            return
+        documents = documents or [(uid, None) for uid, _ in pairs]
+        rows = [(uid, text_hash, parent, doc_hash) for (uid, text_hash), (parent, doc_hash) in zip(pairs, documents)]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO hashes (uid, text_hash, parent_uid, doc_hash) VALUES (?, ?, ?, ?)", rows
+                )
+                self._bump_generation()
+            for uid, text_hash, parent, doc_hash in rows:
+                old_hash = self._uid_to_hash.get(uid)
+                if old_hash is not None:
+                    self._decrement(old_hash)
+                    self._unlink(uid)
+                self._uid_to_hash[uid] = text_hash
+                self._hash_counts[text_hash] += 1
+                self._link(uid, parent, doc_hash)
+
+    def remove(self, uids: list[str]) -> int:
+        """
+        Удаляет записи по uid.
+
+        Args:
+            uids (list[str]): Идентификаторы документов.
+
+        Returns:
+            int: Количество реально удалённых записей.
+        """
+        with self._lock:
+            present = [uid for uid in dict.fromkeys(uids) if uid in self._uid_to_hash]
+            if not present:
+                return 0
+            with self._conn:
+                self._conn.executemany("DELETE FROM hashes WHERE uid = ?", [(uid,) for uid in present])
+                self._bump_generation()
+            for uid in present:
+                self._decrement(self._uid_to_hash.pop(uid))
+                self._unlink(uid)
+            return len(present)
+
+    def clear(self) -> None:
+        """
+        Полностью очищает индекс.
+        """
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM hashes")
+                self._bump_generation()
+            self._uid_to_hash = {}
+            self._hash_counts = Counter()
+            self._uid_to_parent = {}
+            self._parent_uids = {}
+            self._doc_hashes = {}
+
+    def rebuild(self, pairs: list[tuple[str, str]], documents: list[tuple[str, str | None]] | None = None) -> None:
+        """
+        Пересобирает индекс с нуля по переданным парам (например, по содержимому коллекции).
+
+        Args:
+            pairs (list[tuple[str, str]]): Пары (uid, text_hash).
+            documents (list[tuple[str, str | None]] | None, optional): uid документа и хеш его текста для каждой пары.
+        """
+        with self._lock:
+            self.clear()
+            self.add(pairs, documents)
+
+    def _bump_generation(self) -> None:
+        self.generation = self._conn.execute(
+            "UPDATE meta SET value = value + 1 WHERE key = 'generation' RETURNING value"
+        ).fetchone()[0]
+
+    def _link(self, uid: str, parent: str, doc_hash: str | None) -> None:
+        self._uid_to_parent[uid] = parent
+        self._parent_uids.setdefault(parent, set()).add(uid)
+        self._doc_hashes[parent] = doc_hash
+
+    def _unlink(self, uid: str) -> None:
+        parent = self._uid_to_parent.pop(uid, None)
+        if parent is None:
+            return
+        uids = self._parent_uids[parent]
+        uids.discard(uid)
+        if not uids:
+            del self._parent_uids[parent]
+            del self._doc_hashes[parent]
+
+    def _decrement(self, text_hash: str) -> None:
+        self._hash_counts[text_hash] -= 1
+        if self._hash_counts[text_hash] <= 0:
+            del self._hash_counts[text_hash]
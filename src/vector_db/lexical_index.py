@@ -0,0 +1,415 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+import numpy as np
+from filelock import FileLock
+
+from configs import setup_logger
+from src.vector_db.base import VectorStore
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+CYRILLIC_RE = re.compile(r"^[а-я]+$")
+
+STOPWORDS = frozenset(
+    "а без более бы был была были было быть в вам вас весь во вот все всего всех вы где да даже для до "
+    "его ее если есть еще же за здесь и из или им их к как ко когда кто ли либо мне может мы на над "
+    "надо наш не него нее нет ни них но ну о об однако он она они оно от очень по под при с со так "
+    "также такой там те тем то того тоже той только том ты у уже хотя чего чей чем что чтобы чье чья "
+    "эта эти это я".split()
+)
+
+# Окончания русских словоформ, от длинных к коротким: облегчённый стемминг без словарей,
+# чтобы «эйнштейна» и «эйнштейном» давали один терм.
+SUFFIXES = tuple(sorted(
+    (
+        "иями ями ами ией иям ием иях ого его ому ему ыми ими ой ей ий ый ая яя ое ее ые ие ую юю "
+        "ом ем ам ям ах ях ов ев ью ия ья ию ьи ии ей "
+        "ешь ете ишь ите ет ит ут ют ат ят ла ли ло ть ти "
+        "а я о е ы и у ю ь й"
+    ).split(),
+    key=len,
+    reverse=True,
+))
+MIN_STEM = 3
+
+
+def stem(token: str) -> str:
+    """
+    Отрезает типичное окончание у кириллического слова, оставляя основу не короче MIN_STEM символов.
+    Латиница и числа (даты, годы, коды) не изменяются.
+
+    Args:
+        token (str): Токен в нижнем регистре.
+
+    Returns:
+        str: Основа слова.
+    """
+    if len(token) <= MIN_STEM + 1 or not CYRILLIC_RE.match(token):
+        return token
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Разбивает текст на термы: нижний регистр, ё -> е, слова и числа, без стоп-слов, со стеммингом.
+
+    Args:
+        text (str): Исходный текст.
+
+    Returns:
+        list[str]: Термы текста.
+    """
+    text = text.lower().replace("ё", "е")
+    return [stem(token) for token in TOKEN_RE.findall(text) if token not in STOPWORDS]
+
+
+class _Segment:
+    """
+    Неизменяемый сегмент инвертированного индекса: постинги всех термов сегмента
+    лежат в двух сплошных массивах (номера документов и частоты), терм указывает на срез.
+    """
+    __slots__ = ("terms", "doc_ids", "tfs")
+
+    def __init__(self, terms: dict[str, tuple[int, int]], doc_ids: np.ndarray, tfs: np.ndarray):
+        self.terms = terms
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+
+    @classmethod
+    def build(cls, postings: dict[str, list[tuple[int, int]]]) -> "_Segment":
+        terms, doc_ids, tfs, offset = {}, [], [], 0
+        for term in sorted(postings):
+            items = postings[term]
+            terms[term] = (offset, offset + len(items))
+            offset += len(items)
+            doc_ids.extend(doc_id for doc_id, _ in items)
+            tfs.extend(tf for _, tf in items)
+        return cls(terms, np.asarray(doc_ids, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+
+    @classmethod
+    def load(cls, path: str) -> "_Segment":
+        with np.load(path, allow_pickle=False) as data:
+            offsets = data["offsets"]
+            terms = {str(term): (int(offsets[i]), int(offsets[i + 1])) for i, term in enumerate(data["terms"])}
+            return cls(terms, data["doc_ids"], data["tfs"])
+
+    def save(self, path: str) -> None:
+        terms = list(self.terms)
+        offsets = np.asarray([self.terms[t][0] for t in terms] + [len(self.doc_ids)], dtype=np.int64)
+        with open(path, "wb") as f:
+            np.savez(f, terms=np.asarray(terms, dtype=str), offsets=offsets, doc_ids=self.doc_ids, tfs=self.tfs)
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray] | None:
+        span = self.terms.get(term)
+        if span is None:
+            return None
+        return self.doc_ids[span[0]:span[1]], self.tfs[span[0]:span[1]]
+
+
+class LexicalIndex:
+    """
+    Инкрементальный инвертированный индекс с ранжированием BM25.
+
+    Каждый батч индексации записывается отдельным неизменяемым сегментом (`.npz` с массивами постингов),
+    таблица документов (uid, длина, признак удаления) — в SQLite. Когда сегментов становится
+    больше `max_segments`, они сливаются в один, а постинги удалённых документов выбрасываются.
+    Поиск векторизован: постинги всех термов запроса собираются в один массив,
+    вклады BM25 считаются разом и суммируются по документам через `np.bincount`.
+
+    Индекс можно открыть из нескольких процессов: запись (и слияние сегментов) сериализуется
+    файловой блокировкой, остальные процессы перечитывают индекс перед поиском, если он изменился.
+    """
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75, max_segments: int = 8):
+        """
+        Открывает (или создаёт) индекс в папке.
+
+        Args:
+            path (str): Папка индекса.
+            k1 (float, optional): Параметр насыщения частоты терма BM25. Defaults to 1.2.
+            b (float, optional): Параметр нормализации по длине документа BM25. Defaults to 0.75.
+            max_segments (int, optional): Порог числа сегментов для слияния. Defaults to 8.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max_segments
+        self.logger = setup_logger("lexical_index.log")
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(os.path.join(path, "write.lock"))
+        self._conn = sqlite3.connect(os.path.join(path, "docs.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs (doc_id INTEGER PRIMARY KEY, uid TEXT NOT NULL, length INTEGER NOT NULL, alive INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS segments (name TEXT PRIMARY KEY)")
+        self._conn.commit()
+        with self._file_lock:
+            self._load()
+
+    def _load(self) -> None:
+        """
+        Загружает таблицу документов и сегменты в память.
+        """
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        rows = self._conn.execute("SELECT doc_id, uid, length, alive FROM docs ORDER BY doc_id").fetchall()
+        self._uids = [uid for _, uid, _, _ in rows]
+        self._lengths = np.asarray([length for _, _, length, _ in rows], dtype=np.float32)
+        self._alive = np.asarray([bool(alive) for _, _, _, alive in rows], dtype=bool)
+        self._uid_to_doc = {uid: doc_id for doc_id, uid, _, alive in rows if alive}
+        names = [name for (name,) in self._conn.execute("SELECT name FROM segments ORDER BY name")]
+        self._segment_names = names
+        self._segments = [_Segment.load(os.path.join(self.path, name)) for name in names]
+        self._refresh_stats()
+
+    def refresh(self) -> bool:
+        """
+        Перечитывает индекс, если его изменил другой процесс (`PRAGMA data_version`).
+        Чтение идёт под файловой блокировкой, чтобы не попасть на удаление сегментов при слиянии.
+
+        Returns:
+            bool: True, если индекс был перечитан.
+        """
+        with self._lock:
+            if not self._changed():
+                return False
+            with self._file_lock:
+                self._load()
+        self.logger.debug(f"Лексический индекс перечитан после записи другим процессом, документов: {self._n_alive}")
+        return True
+
+    def _changed(self) -> bool:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version
+
+    def _refresh_stats(self) -> None:
+        self._n_alive = int(self._alive.sum())
+        self._avg_length = float(self._lengths[self._alive].mean()) if self._n_alive else 0.0
+
+    def __len__(self) -> int:
+        return self._n_alive
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self._uid_to_doc
+
+    def add(self, uids: list[str], texts: list[str]) -> None:
+        """
+        Добавляет документы новым сегментом. Документ с уже известным uid заменяется.
+
+        Args:
+            uids (list[str]): Идентификаторы документов.
+            texts (list[str]): Тексты документов.
+        """
+        if not uids:
+            return
+        with self._lock, self._file_lock:
+            if self._changed():
+                self._load()
+            replaced = [self._uid_to_doc[uid] for uid in uids if uid in self._uid_to_doc]
+            start = len(self._uids)
+            postings: dict[str, list[tuple[int, int]]] = {}
+            lengths = []
+            for offset, text in enumerate(texts):
+                tokens = tokenize(text)
+                lengths.append(len(tokens))
+                for term, tf in Counter(tokens).items():
+                    postings.setdefault(term, []).append((start + offset, tf))
+
+            segment = _Segment.build(postings)
+            name = self._next_segment_name()
+            segment.save(os.path.join(self.path, name))
+            with self._conn:
+                self._conn.executemany("UPDATE docs SET alive = 0 WHERE doc_id = ?", [(d,) for d in replaced])
+                self._conn.executemany(
+                    "INSERT INTO docs (doc_id, uid, length, alive) VALUES (?, ?, ?, 1)",
+                    [(start + i, uid, lengths[i]) for i, uid in enumerate(uids)]
+                )
+                self._conn.execute("INSERT INTO segments (name) VALUES (?)", (name,))
+
+            alive = np.concatenate([self._alive, np.ones(len(uids), dtype=bool)])
+            alive[replaced] = False
+            self._lengths = np.concatenate([self._lengths, np.asarray(lengths, dtype=np.float32)])
+            self._alive = alive
+            self._uids.extend(uids)
+            for i, uid in enumerate(uids):
+                self._uid_to_doc[uid] = start + i
+            self._segments = self._segments + [segment]
+            self._segment_names = self._segment_names + [name]
+            if len(self._segments) > self.max_segments:
+                self._merge()
+            self._refresh_stats()
+        self.logger.debug(f"Добавлено в лексический индекс: {len(uids)}, сегментов: {len(self._segments)}")
+
+    def _next_segment_name(self) -> str:
+        last = int(self._segment_names[-1][4:10]) if self._segment_names else 0
+        return f"seg_{last + 1:06d}.npz"
+
+    def _merge(self) -> None:
+        """
+        Сливает все сегменты в один, отбрасывая постинги удалённых документов.
+        """
+        postings: dict[str, list[tuple[np.ndarray, np.ndarray]]] = {}
+        for segment in self._segments:
+            for term, (begin, end) in segment.terms.items():
+                doc_ids = segment.doc_ids[begin:end]
+                keep = self._alive[doc_ids]
+                if keep.any():
+                    postings.setdefault(term, []).append((doc_ids[keep], segment.tfs[begin:end][keep]))
+
+        terms, doc_ids, tfs, offset = {}, [], [], 0
+        for term in sorted(postings):
+            term_docs = np.concatenate([d for d, _ in postings[term]])
+            terms[term] = (offset, offset + len(term_docs))
+            offset += len(term_docs)
+            doc_ids.append(term_docs)
+            tfs.append(np.concatenate([t for _, t in postings[term]]))
+        merged = _Segment(
+            terms,
+            np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int32),
+            np.concatenate(tfs) if tfs else np.zeros(0, dtype=np.float32),
+        )
+        name = self._next_segment_name()
+        merged.save(os.path.join(self.path, name))
+        old_names = self._segment_names
+        with self._conn:
+            self._conn.execute("DELETE FROM segments")
+            self._conn.execute("INSERT INTO segments (name) VALUES (?)", (name,))
+        for old in old_names:
+            os.remove(os.path.join(self.path, old))
+        self._segments = [merged]
+        self._segment_names = [name]
+        self.logger.info(f"Сегменты лексического индекса слиты: {len(old_names)} -> 1")
+
+    def remove(self, uids: list[str]) -> int:
+        """
+        Помечает документы удалёнными (их постинги выбрасываются при следующем слиянии).
+
+        Args:
+            uids (list[str]): Идентификаторы документов.
+
+        Returns:
+            int: Количество реально удалённых документов.
+        """
+        with self._lock, self._file_lock:
+            if self._changed():
+                self._load()
+            doc_ids = [self._uid_to_doc.pop(uid) for uid in dict.fromkeys(uids) if uid in self._uid_to_doc]
+            if doc_ids:
+                with self._conn:
+                    self._conn.executemany("UPDATE docs SET alive = 0 WHERE doc_id = ?", [(d,) for d in doc_ids])
+                alive = self._alive.copy()
+                alive[doc_ids] = False
+                self._alive = alive
+                self._refresh_stats()
+        return len(doc_ids)
+
+    def backfill(self, vector_db: VectorStore, batch_size: int = 4096, rebuild: bool = False) -> int:
+        """
+        Заполняет индекс текстами документов векторного хранилища, если индекс пуст, а хранилище — нет
+        (например, хранилище проиндексировано до включения BM25). Выполняется под файловой блокировкой,
+        поэтому при старте нескольких воркеров индекс заполняет только первый.
+
+        Args:
+            vector_db (VectorStore): Векторное хранилище.
+            batch_size (int, optional): Документов в сегменте. Defaults to 4096.
+            rebuild (bool, optional): Очистить и перестроить индекс, даже если он не пуст. Defaults to False.
+
+        Returns:
+            int: Количество добавленных документов.
+        """
+        with self._file_lock:
+            if rebuild:
+                self.clear()
+            else:
+                self.refresh()
+            if len(self) or not vector_db.count():
+                return 0
+            self.logger.info(f"Заполнение лексического индекса из векторного хранилища: {vector_db.count()} документов")
+            added = 0
+            for batch in vector_db.iter_records(batch_size):
+                self.add(batch["ids"], batch["documents"])
+                added += len(batch["ids"])
+        self.logger.info(f"Лексический индекс заполнен: {added} документов, сегментов: {len(self._segments)}")
+        return added
+
+    def clear(self) -> None:
+        """
+        Полностью очищает индекс.
+        """
+        with self._lock, self._file_lock:
+            names = [name for (name,) in self._conn.execute("SELECT name FROM segments")]
+            with self._conn:
+                self._conn.execute("DELETE FROM docs")
+                self._conn.execute("DELETE FROM segments")
+            for name in names:
+                os.remove(os.path.join(self.path, name))
+            self._load()
+
+    def search(self, query: str, top_k: int = 5) -> list[tuple[str, float]]:
+        """
+        Ищет документы по BM25.
+
+        Args:
+            query (str): Текст запроса.
+            top_k (int, optional): Сколько результатов вернуть. Defaults to 5.
+
+        Returns:
+            list[tuple[str, float]]: Пары (uid, score) по убыванию score.
+        """
+        self.refresh()
+        segments, alive, lengths = self._segments, self._alive, self._lengths
+        n_alive, avg_length = self._n_alive, self._avg_length
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not n_alive:
+            return []
+
+        doc_parts, tf_parts, idf_parts = [], [], []
+        for term in terms:
+            found = [p for p in (segment.postings(term) for segment in segments) if p is not None]
+            if not found:
+                continue
+            doc_ids = np.concatenate([d for d, _ in found])
+            doc_freq = int(alive[doc_ids].sum())
+            if not doc_freq:
+                continue
+            idf = math.log(1.0 + (n_alive - doc_freq + 0.5) / (doc_freq + 0.5))
+            doc_parts.append(doc_ids)
+            tf_parts.append(np.concatenate([t for _, t in found]))
+            idf_parts.append(np.full(len(doc_ids), idf, dtype=np.float32))
+        if not doc_parts:
+            return []
+
+        doc_ids = np.concatenate(doc_parts)
+        tfs = np.concatenate(tf_parts)
+        norm = self.k1 * (1.0 - self.b + self.b * lengths[doc_ids] / max(avg_length, 1e-9))
+        contributions = np.concatenate(idf_parts) * tfs * (self.k1 + 1.0) / (tfs + norm)
+        scores = np.bincount(doc_ids, weights=contributions * alive[doc_ids], minlength=len(alive))
+
+        candidates = np.flatnonzero(scores > 0)
+        k = min(top_k, len(candidates))
+        if k == 0:
+            return []
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(self._uids[doc_id], float(scores[doc_id])) for doc_id in top]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.vector_db.factory import create_lexical_index, create_vector_store
+
+    parser = argparse.ArgumentParser(description="Перестройка лексического (BM25) индекса по векторному хранилищу")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    args = parser.parse_args()
+
+    lexical_index = create_lexical_index()
+    if lexical_index is None:
+        parser.error("Лексический индекс выключен (vector_db.lexical.enabled)")
+    print(f"Добавлено документов: {lexical_index.backfill(create_vector_store(), args.batch_size, rebuild=True)}")
@@ -0,0 +1,474 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Iterator
+
+import numpy as np
+from filelock import FileLock
+
+from configs import setup_logger
+from src.vector_db.base import VectorStore
+from src.vector_db.hash_index import HashIndex, document_entry, record_hash
+
+VECTORS_FILE_RE = re.compile(r"^vectors(\.\d+)?\.f32(\.tmp)?$")
+COMPACT_CHUNK_ROWS = 65536
+
+class NumpyStore(VectorStore):
+    """
+    Векторное хранилище в процессе на NumPy: точный (brute force) поиск top-k.
+
+    Нормализованные эмбеддинги дописываются в бинарный файл и читаются через memory-map,
+    поэтому несколько воркеров могут разделять одни и те же страницы файла.
+    Тексты и метаданные лежат в SQLite рядом с векторами (номер строки = база + номер вектора в файле).
+    Удалённые и заменённые документы помечаются в маске живых строк; когда их доля превышает
+    `compact_dead_ratio`, файл векторов переписывается без них (`_compact`). Уплотнённый файл получает
+    новую базу номеров строк, поэтому номера строк никогда не переиспользуются: поиск, начатый до уплотнения,
+    не найдёт в SQLite старых строк и пропустит их, а не вернёт чужие документы.
+
+    Хранилище можно открыть из нескольких процессов: запись сериализуется файловой блокировкой,
+    а остальные процессы перечитывают состояние перед чтением, если файлы изменились (`refresh`).
+    """
+    def __init__(self, persist_dir: str = "vector_db", compact_dead_ratio: float = 0.3):
+        """
+        Открывает (или создаёт) хранилище в папке.
+
+        Args:
+            persist_dir (str, optional): Папка для хранения файлов. Defaults to "vector_db".
+            compact_dead_ratio (float, optional): Доля удалённых и заменённых строк, при которой файл векторов
+                уплотняется. Defaults to 0.3.
+        """
+        os.makedirs(persist_dir, exist_ok=True)
+        self.persist_dir = persist_dir
+        self.compact_dead_ratio = compact_dead_ratio
+        self.logger = setup_logger("numpy_store.log")
+        self.hash_index = HashIndex(os.path.join(persist_dir, "hash_index.sqlite3"))
+        self._write_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._file_lock = FileLock(os.path.join(persist_dir, "write.lock"))
+        self._conn = sqlite3.connect(os.path.join(persist_dir, "docs.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs (row INTEGER PRIMARY KEY, uid TEXT NOT NULL, text TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+        with self._file_lock:
+            self._load()
+            if len(self.hash_index) != len(self._uid_to_row):
+                self.logger.warning("Индекс хешей рассинхронизирован с хранилищем, пересборка")
+                rows = self._conn.execute("SELECT uid, text, metadata FROM docs").fetchall()
+                self.hash_index.rebuild(
+                    [(uid, record_hash(text, json.loads(metadata))) for uid, text, metadata in rows],
+                    [document_entry(uid, json.loads(metadata)) for uid, _, metadata in rows]
+                )
+            self._remove_stale_vectors()
+        self.logger.info(f"NumPy-хранилище инициализировано, путь: {persist_dir}, документов: {self.count()}")
+
+    def _load(self) -> None:
+        """
+        Загружает размерность, соответствие uid -> строка и маску живых строк, отображает векторы в память.
+        """
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        self.dim: int | None = meta.get("dim")
+        self._base = meta.get("base", 0)
+        self.vectors_path = self._vectors_path(self._base)
+        self._uid_to_row = dict(
+            (uid, row) for row, uid in self._conn.execute("SELECT row, uid FROM docs ORDER BY row")
+        )
+        n_rows = self._file_rows()
+        self._alive = np.zeros(n_rows, dtype=bool)
+        positions = np.fromiter(self._uid_to_row.values(), dtype=np.int64, count=len(self._uid_to_row)) - self._base
+        self._alive[positions[(positions >= 0) & (positions < n_rows)]] = True
+        self._remap(n_rows)
+
+    def _vectors_path(self, base: int) -> str:
+        return os.path.join(self.persist_dir, "vectors.f32" if base == 0 else f"vectors.{base}.f32")
+
+    def refresh(self) -> bool:
+        """
+        Подхватывает изменения, записанные другими процессами: если таблица документов изменилась
+        (`PRAGMA data_version`), заново загружает соответствие uid -> строка и маску живых строк
+        и переотображает файл векторов.
+
+        Returns:
+            bool: True, если состояние было перечитано.
+        """
+        self.hash_index.refresh()
+        if not self._changed():
+            return False
+        # Перечитывание идёт под файловой блокировкой, чтобы не попасть между записью файла векторов
+        # и фиксацией новых номеров строк при уплотнении
+        with self._file_lock, self._refresh_lock:
+            if not self._changed():
+                return False
+            self._load()
+        self.logger.debug(f"Хранилище перечитано после записи другим процессом, документов: {len(self._uid_to_row)}")
+        return True
+
+    def _changed(self) -> bool:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version
+
+    def _file_rows(self) -> int:
+        if self.dim is None or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (self.dim * 4)
+
+    def _remap(self, n_rows: int) -> None:
+        self._matrix = (
+            np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n_rows, self.dim))
+            if n_rows else None
+        )
+
+    @property
+    def generation(self) -> int:
+        """
+        Номер поколения хранилища: увеличивается при каждом добавлении, удалении и очистке.
+        """
+        self.hash_index.refresh()
+        return self.hash_index.generation
+
+    def count(self) -> int:
+        """
+        Возвращает количество документов за O(1).
+        """
+        self.hash_index.refresh()
+        return len(self.hash_index)
+
+    def has_hash(self, text_hash: str) -> bool:
+        """
+        Проверяет, есть ли документ с таким хешем текста.
+        """
+        self.hash_index.refresh()
+        return self.hash_index.has_hash(text_hash)
+
+    def get_existing_ids(self) -> list[str]:
+        """
+        Возвращает id всех документов.
+        """
+        self.hash_index.refresh()
+        return self.hash_index.uids
+
+    def add_unique_by_hash(self, ids: list[str], texts: list[str], embeddings: list, metadatas: list[dict[str, Any]]) -> list[str]:
+        """
+        Добавляет только документы с новыми uid и хешами текста. Чанки одного документа (`parent_uid`)
+        отбираются вместе: документ записывается целиком или отсекается целиком.
+
+        Args:
+            ids (list[str]): Идентификаторы документов.
+            texts (list[str]): Тексты документов.
+            embeddings (list[list[float]]): Эмбеддинги документов.
+            metadatas (list[dict[str, Any]]): Метаданные документов.
+
+        Returns:
+            list[str]: Id реально добавленных документов.
+        """
+        with self._write_lock, self._file_lock:
+            self.refresh()
+            selected = self.hash_index.select_new_documents([
+                (uid, document_entry(uid, metadata)[0], record_hash(text, metadata))
+                for uid, text, metadata in zip(ids, texts, metadatas or [None] * len(ids))
+            ])
+            added = self._write(ids, texts, embeddings, metadatas, selected)
+        if added:
+            self.logger.info(f"Добавлено {len(added)} новых уникальных документов.")
+        else:
+            self.logger.info("Новых уникальных документов для добавления не обнаружено.")
+        return added
+
+    def upsert(self, ids: list[str], texts: list[str], embeddings: list, metadatas: list[dict[str, Any]]) -> list[str]:
+        """
+        Добавляет документы или заменяет существующие с теми же uid
+        (старые векторы помечаются удалёнными).
+
+        Returns:
+            list[str]: Id записанных документов.
+        """
+        with self._write_lock, self._file_lock:
+            self.refresh()
+            last_index = {uid: i for i, uid in enumerate(ids)}
+            written = self._write(ids, texts, embeddings, metadatas, sorted(last_index.values()))
+        self.logger.info(f"Записано (upsert) {len(written)} документов.")
+        return written
+
+    def _write(self, ids: list[str], texts: list[str], embeddings: list, metadatas: list[dict[str, Any]], selected: list[int]) -> list[str]:
+        if not selected:
+            return []
+        vectors = np.asarray(embeddings, dtype=np.float32)[selected]
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (self.dim,))
+
+        new_ids = [ids[i] for i in selected]
+        replaced = [self._uid_to_row[uid] for uid in new_ids if uid in self._uid_to_row]
+        start = self._file_rows()
+        first_row = self._base + start
+        with open(self.vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+        hashes = [record_hash(texts[i], metadatas[i] if metadatas else None) for i in selected]
+        rows = [
+            (first_row + offset, ids[i], texts[i], json.dumps({**(dict(metadatas[i]) if metadatas else {}), "text_hash": text_hash}, ensure_ascii=False))
+            for offset, (i, text_hash) in enumerate(zip(selected, hashes))
+        ]
+        with self._conn:
+            self._conn.executemany("DELETE FROM docs WHERE row = ?", [(row,) for row in replaced])
+            self._conn.executemany("INSERT INTO docs (row, uid, text, metadata) VALUES (?, ?, ?, ?)", rows)
+
+        n_rows = start + len(selected)
+        alive = np.zeros(n_rows, dtype=bool)
+        alive[:len(self._alive)] = self._alive
+        alive[[row - self._base for row in replaced]] = False
+        alive[start:] = True
+        self._alive = alive
+        for row, uid, _, _ in rows:
+            self._uid_to_row[uid] = row
+        self._remap(n_rows)
+        self.hash_index.add(
+            [(ids[i], text_hash) for i, text_hash in zip(selected, hashes)],
+            [document_entry(ids[i], metadatas[i] if metadatas else None) for i in selected]
+        )
+        self._maybe_compact()
+        return new_ids
+
+    def _maybe_compact(self) -> None:
+        """
+        Уплотняет файл векторов, если доля удалённых и заменённых строк достигла `compact_dead_ratio`.
+        Вызывается под блокировками записи.
+        """
+        n_rows = len(self._alive)
+        n_dead = n_rows - int(self._alive.sum())
+        if n_dead and n_dead / n_rows >= self.compact_dead_ratio:
+            self._compact()
+
+    def _compact(self) -> None:
+        """
+        Переписывает живые векторы в новый файл с базой номеров строк, следующей за последней строкой
+        текущего файла, и одной транзакцией SQLite перенумеровывает строки и переключает базу.
+        До фиксации транзакции действует старый файл, поэтому прерванное уплотнение не портит хранилище.
+        Вызывается под блокировками записи.
+        """
+        positions = np.flatnonzero(self._alive)
+        n_rows = len(self._alive)
+        old_base = self._base
+        new_base = old_base + n_rows
+        new_path = self._vectors_path(new_base)
+        tmp_path = f"{new_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for start in range(0, len(positions), COMPACT_CHUNK_ROWS):
+                f.write(np.ascontiguousarray(self._matrix[positions[start:start + COMPACT_CHUNK_ROWS]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, new_path)
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE docs SET row = ? WHERE row = ?",
+                ((new_base + i, old_base + int(position)) for i, position in enumerate(positions))
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('base', ?)", (new_base,))
+        self._load()
+        self._remove_stale_vectors()
+        self.logger.info(f"Файл векторов уплотнён: {n_rows} -> {len(positions)} строк")
+
+    def _remove_stale_vectors(self) -> None:
+        """
+        Удаляет файлы векторов прошлых баз и недописанные временные файлы уплотнения.
+        Файл, который ещё отображён в память другим процессом, на Windows удалить нельзя:
+        он удаляется при следующем уплотнении или открытии хранилища.
+        """
+        for name in os.listdir(self.persist_dir):
+            path = os.path.join(self.persist_dir, name)
+            if VECTORS_FILE_RE.match(name) and path != self.vectors_path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    self.logger.debug(f"Файл векторов {name} ещё используется, удаление отложено")
+
+    def query(self, embedding: list, top_k: int = 5) -> dict:
+        """
+        Точный поиск top-k по косинусной близости: произведение матрицы на вектор и `argpartition`.
+
+        Args:
+            embedding (list[float]): Вектор эмбеддинга запроса.
+            top_k (int, optional): Сколько результатов вернуть. Defaults to 5.
+
+        Returns:
+            dict: Результаты поиска в формате ChromaDB (distances = 1 - косинусная близость).
+        """
+        return self.query_batch([embedding], top_k)
+
+    def query_batch(self, embeddings: list, top_k: int = 5) -> dict:
+        """
+        Точный поиск top-k сразу для нескольких запросов: одно произведение матриц
+        (документы x запросы) и `argpartition` по каждому столбцу. Тексты и метаданные
+        всех найденных документов читаются из SQLite одним запросом.
+
+        Args:
+            embeddings (list[list[float]]): Векторы эмбеддингов запросов.
+            top_k (int, optional): Сколько результатов вернуть на каждый запрос. Defaults to 5.
+
+        Returns:
+            dict: Результаты поиска в формате ChromaDB, по одному списку на запрос
+                (distances = 1 - косинусная близость).
+        """
+        self.refresh()
+        n_queries = len(embeddings)
+        matrix, alive, base = self._matrix, self._alive, self._base
+        n_alive = int(alive[:len(matrix)].sum()) if matrix is not None else 0
+        k = min(top_k, n_alive)
+        if k == 0:
+            return {key: [[] for _ in range(n_queries)] for key in ("ids", "documents", "metadatas", "distances")}
+
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(n_queries, -1)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = matrix @ queries.T
+        scores[~alive[:len(scores)]] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        top_scores = np.take_along_axis(scores, top, axis=0)
+        order = np.argsort(-top_scores, axis=0)
+        top = np.take_along_axis(top, order, axis=0).T
+        top_scores = np.take_along_axis(top_scores, order, axis=0).T
+
+        top = top + base
+        found = self._fetch_rows(sorted({int(row) for row in top.ravel()}))
+        result = {key: [] for key in ("ids", "documents", "metadatas", "distances")}
+        for rows, row_scores in zip(top, top_scores):
+            # Строки, удалённые или заменённые другим потоком или процессом после подсчёта близости, пропускаются
+            hits = [(found[row], score) for row, score in zip(rows.tolist(), row_scores.tolist()) if row in found]
+            result["ids"].append([doc[0] for doc, _ in hits])
+            result["documents"].append([doc[1] for doc, _ in hits])
+            result["metadatas"].append([doc[2] for doc, _ in hits])
+            result["distances"].append([float(1.0 - score) for _, score in hits])
+        return result
+
+    def _fetch_rows(self, rows: list[int]) -> dict[int, tuple[str, str, dict]]:
+        placeholders = ",".join("?" * len(rows))
+        cursor = self._conn.execute(f"SELECT row, uid, text, metadata FROM docs WHERE row IN ({placeholders})", rows)
+        return {row: (uid, text, json.loads(metadata)) for row, uid, text, metadata in cursor}
+
+    def get(self, ids: list[str]) -> dict:
+        """
+        Возвращает документы по id (отсутствующие id пропускаются).
+
+        Args:
+            ids (list[str]): Список id.
+
+        Returns:
+            dict: Словарь со списками `ids`, `documents`, `metadatas`.
+        """
+        self.refresh()
+        rows = [self._uid_to_row[uid] for uid in ids if uid in self._uid_to_row]
+        found = self._fetch_rows(rows) if rows else {}
+        rows = [row for row in rows if row in found]
+        return {
+            "ids": [found[row][0] for row in rows],
+            "documents": [found[row][1] for row in rows],
+            "metadatas": [found[row][2] for row in rows],
+        }
+
+    def document_hashes(self, uids: list[str]) -> dict[str, str | None]:
+        """
+        Возвращает хеши версий (`doc_hash`) сохранённых документов по индексу хешей.
+        """
+        self.hash_index.refresh()
+        return self.hash_index.document_hashes(uids)
+
+    def chunk_ids(self, uids: list[str]) -> list[str]:
+        """
+        Возвращает id всех записей (чанков) документов.
+        """
+        self.hash_index.refresh()
+        return self.hash_index.chunk_uids(uids)
+
+    def find_documents(self, where: dict[str, Any]) -> list[str]:
+        """
+        Ищет документы по равенству полей метаданных (`json_extract` по таблице документов).
+
+        Args:
+            where (dict[str, Any]): Поле -> значение (или список допустимых значений).
+
+        Returns:
+            list[str]: uid найденных документов.
+        """
+        conditions, params = [], []
+        for key, value in where.items():
+            values = list(value) if isinstance(value, (list, tuple)) else [value]
+            if not values:
+                return []
+            conditions.append(f"json_extract(metadata, ?) IN ({','.join('?' * len(values))})")
+            params += [f'$."{key}"', *values]
+        if not conditions:
+            return []
+        self.refresh()
+        cursor = self._conn.execute(f"SELECT uid, metadata FROM docs WHERE {' AND '.join(conditions)}", params)
+        return list(dict.fromkeys(document_entry(uid, json.loads(metadata))[0] for uid, metadata in cursor))
+
+    def iter_records(self, batch_size: int = 4096) -> Iterator[dict]:
+        """
+        Обходит живые строки хранилища пачками в порядке записи. Векторы читаются из memory-map
+        (файл векторов только дописывается, а уплотнение пишет новый файл, поэтому отображённые строки не меняются).
+
+        Args:
+            batch_size (int, optional): Записей в пачке. Defaults to 4096.
+
+        Yields:
+            dict: Списки `ids`, `documents`, `metadatas` и матрица `embeddings`.
+        """
+        self.refresh()
+        matrix, base = self._matrix, self._base
+        rows = sorted(self._uid_to_row.values())
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            found = self._fetch_rows(batch)
+            batch = [row for row in batch if row in found]
+            if not batch:
+                continue
+            yield {
+                "ids": [found[row][0] for row in batch],
+                "documents": [found[row][1] for row in batch],
+                "metadatas": [found[row][2] for row in batch],
+                "embeddings": np.asarray(matrix[[row - base for row in batch]]),
+            }
+
+    def delete_by_id(self, ids: list[str]) -> int:
+        """
+        Удаляет документы по id (векторы помечаются удалёнными).
+
+        Args:
+            ids (list[str]): Список id для удаления.
+
+        Returns:
+            int: Оставшееся число документов.
+        """
+        with self._write_lock, self._file_lock:
+            self.refresh()
+            rows = [self._uid_to_row.pop(uid) for uid in dict.fromkeys(ids) if uid in self._uid_to_row]
+            with self._conn:
+                self._conn.executemany("DELETE FROM docs WHERE row = ?", [(row,) for row in rows])
+            self._alive[[row - self._base for row in rows]] = False
+            self.hash_index.remove(ids)
+            self._maybe_compact()
+        remaining = self.count()
+        self.logger.info(f"Удалено {len(rows)} документов. В хранилище осталось: {remaining}")
+        return remaining
+
+    def clear(self) -> None:
+        """
+        Полностью очищает хранилище, включая файл векторов.
+        """
+        with self._write_lock, self._file_lock:
+            removed = self.count()
+            with self._conn:
+                self._conn.execute("DELETE FROM docs")
+                # Новая база: номера строк очищенного хранилища не переиспользуются
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('base', ?)", (self._base + len(self._alive),)
+                )
+            self._matrix = None
+            self._load()
+            self._remove_stale_vectors()
+            self.hash_index.clear()
+        self.logger.info(f"Хранилище полностью очищено. Было удалено: {removed}")
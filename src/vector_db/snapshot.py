@@ -0,0 +1,213 @@
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+import numpy as np
+
+from configs import config, setup_logger
+from src.vector_db.base import VectorStore
+from src.vector_db.lexical_index import LexicalIndex
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+COLUMN_FILES = {"ids": "ids.jsonl", "documents": "documents.jsonl", "metadatas": "metadatas.jsonl"}
+DTYPES = ("float16", "float32")
+
+logger = setup_logger("snapshot.log")
+
+
+class SnapshotMismatch(Exception):
+    """
+    Исключение при загрузке снимка, построенного другой моделью эмбеддингов или в несовместимом формате.
+    """
+
+
+def _embedder_info() -> dict:
+    return {"model_name": config['embedder']['model_name'], "backend": config['embedder'].get('backend', 'torch')}
+
+
+def _preprocessing_info() -> dict:
+    # Параллельность влияет только на скорость предобработки, а не на её результат
+    preprocessing = {k: v for k, v in config['preprocessing'].items() if k != "parallel"}
+    return {"preprocessing": preprocessing, "chunking": config['indexing']['chunking']}
+
+
+def export_snapshot(store: VectorStore, path: str, dtype: str | None = None, batch_size: int | None = None) -> dict:
+    """
+    Выгружает хранилище в снимок: эмбеддинги — одним непрерывным бинарным массивом
+    (`embeddings.f16` или `embeddings.f32`, строка = запись), uid, тексты и метаданные — по колонкам
+    в JSONL-файлах (одно значение на строку в том же порядке), в `manifest.json` — модель эмбеддингов,
+    конфигурация предобработки и чанкинга, размерность и число записей.
+
+    Снимок собирается во временной папке и переименовывается в `path` целиком, поэтому незавершённый
+    экспорт не оставляет снимка без манифеста. Модель в манифесте — текущая из конфигурации (`embedder`):
+    хранилище должно быть построено ею.
+
+    Args:
+        store (VectorStore): Хранилище.
+        path (str): Папка снимка (не должна существовать).
+        dtype (str | None, optional): "float16" или "float32". По умолчанию — `vector_db.snapshot.dtype`.
+        batch_size (int | None, optional): Записей в пачке. По умолчанию — `vector_db.snapshot.batch_size`.
+
+    Raises:
+        FileExistsError: Если папка снимка уже существует.
+        ValueError: Если тип эмбеддингов не поддерживается.
+
+    Returns:
+        dict: Манифест снимка.
+    """
+    snapshot_config = config['vector_db']['snapshot']
+    dtype = dtype or snapshot_config['dtype']
+    batch_size = batch_size or snapshot_config['batch_size']
+    if dtype not in DTYPES:
+        raise ValueError(f"Неподдерживаемый тип эмбеддингов снимка: {dtype}")
+    if os.path.exists(path):
+        raise FileExistsError(f"Папка снимка уже существует: {path}")
+
+    started = time.perf_counter()
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    embeddings_file = f"embeddings.{'f16' if dtype == 'float16' else 'f32'}"
+    count, dim = 0, None
+    columns = {name: open(os.path.join(tmp_path, file), "w", encoding="utf-8") for name, file in COLUMN_FILES.items()}
+    try:
+        with open(os.path.join(tmp_path, embeddings_file), "wb") as vectors:
+            for batch in store.iter_records(batch_size):
+                embeddings = batch["embeddings"]
+                dim = dim or int(embeddings.shape[1])
+                vectors.write(np.ascontiguousarray(embeddings, dtype=dtype).tobytes())
+                for name, f in columns.items():
+                    f.writelines(json.dumps(value, ensure_ascii=False) + "\n" for value in batch[name])
+                count += len(batch["ids"])
+    finally:
+        for f in columns.values():
+            f.close()
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "embedder": {**_embedder_info(), "dim": dim},
+        **_preprocessing_info(),
+        "count": count,
+        "dtype": dtype,
+        "files": {"embeddings": embeddings_file, **COLUMN_FILES},
+    }
+    with open(os.path.join(tmp_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    logger.info(f"Снимок выгружен в {path}: {count} записей, {dtype}, за {time.perf_counter() - started:.1f} с")
+    return manifest
+
+
+def read_manifest(path: str) -> dict:
+    """
+    Читает манифест снимка и проверяет совместимость с текущей конфигурацией: снимок должен быть
+    построен той же моделью эмбеддингов. Отличия в бэкенде модели и в настройках предобработки
+    или чанкинга только пишутся в лог: векторы остаются в том же пространстве.
+
+    Args:
+        path (str): Папка снимка.
+
+    Raises:
+        SnapshotMismatch: Если версия формата или модель эмбеддингов не совпадает.
+
+    Returns:
+        dict: Манифест снимка.
+    """
+    with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise SnapshotMismatch(f"Неподдерживаемая версия формата снимка: {manifest.get('format_version')}")
+    expected = _embedder_info()
+    embedder = manifest["embedder"]
+    if embedder["model_name"] != expected["model_name"]:
+        raise SnapshotMismatch(
+            f"Снимок построен моделью {embedder['model_name']}, а в конфигурации — {expected['model_name']}"
+        )
+    if embedder["backend"] != expected["backend"]:
+        logger.warning(f"Снимок построен бэкендом {embedder['backend']}, в конфигурации — {expected['backend']}")
+    for key, value in _preprocessing_info().items():
+        if manifest.get(key) != value:
+            logger.warning(f"Настройки {key} снимка отличаются от текущей конфигурации")
+    return manifest
+
+
+def import_snapshot(
+    store: VectorStore,
+    path: str,
+    lexical_index: LexicalIndex | None = None,
+    batch_size: int | None = None
+) -> int:
+    """
+    Загружает снимок в хранилище без пересчёта эмбеддингов: файл эмбеддингов отображается в память
+    (memory-map), колонки читаются построчно, записи пишутся пачками через `upsert`
+    (записи с теми же uid заменяются). BM25-индекс, если передан, строится по текстам снимка.
+
+    Args:
+        store (VectorStore): Хранилище.
+        path (str): Папка снимка.
+        lexical_index (LexicalIndex | None, optional): BM25-индекс, который нужно заполнить.
+        batch_size (int | None, optional): Записей в пачке. По умолчанию — `vector_db.snapshot.batch_size`.
+
+    Raises:
+        SnapshotMismatch: Если снимок построен другой моделью или его файлы не согласованы с манифестом.
+
+    Returns:
+        int: Количество загруженных записей.
+    """
+    started = time.perf_counter()
+    batch_size = batch_size or config['vector_db']['snapshot']['batch_size']
+    manifest = read_manifest(path)
+    count, dim, files = manifest["count"], manifest["embedder"]["dim"], manifest["files"]
+    if count == 0:
+        return 0
+    embeddings_path = os.path.join(path, files["embeddings"])
+    expected_size = count * dim * np.dtype(manifest["dtype"]).itemsize
+    if os.path.getsize(embeddings_path) != expected_size:
+        raise SnapshotMismatch(f"Размер {files['embeddings']} не соответствует манифесту ({count} x {dim})")
+    if config['preprocessing']['near_duplicates'].get('enabled', False):
+        logger.warning("Сигнатуры почти-дубликатов в снимок не входят: индекс почти-дубликатов не заполняется")
+
+    matrix = np.memmap(embeddings_path, dtype=manifest["dtype"], mode="r", shape=(count, dim))
+    columns = {name: open(os.path.join(path, files[name]), "r", encoding="utf-8") for name in COLUMN_FILES}
+    loaded = 0
+    try:
+        while loaded < count:
+            batch = {name: [json.loads(line) for line in islice(f, batch_size)] for name, f in columns.items()}
+            size = len(batch["ids"])
+            if size == 0 or any(len(values) != size for values in batch.values()):
+                raise SnapshotMismatch(f"Колонки снимка короче манифеста: прочитано {loaded + size} из {count}")
+            embeddings = np.asarray(matrix[loaded:loaded + size], dtype=np.float32)
+            store.upsert(batch["ids"], batch["documents"], embeddings, batch["metadatas"])
+            if lexical_index is not None:
+                lexical_index.add(batch["ids"], batch["documents"])
+            loaded += size
+            logger.info(f"Загружено {loaded} из {count} записей снимка")
+    finally:
+        for f in columns.values():
+            f.close()
+    logger.info(f"Снимок {path} загружен: {loaded} записей за {time.perf_counter() - started:.1f} с")
+    return loaded
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.vector_db.factory import create_lexical_index, create_vector_store
+
+    parser = argparse.ArgumentParser(description="Экспорт и загрузка снимка векторного хранилища")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path", help="Папка снимка")
+    parser.add_argument("--dtype", choices=DTYPES, default=None, help="Тип эмбеддингов при экспорте")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    vector_store = create_vector_store()
+    if args.action == "export":
+        print(json.dumps(export_snapshot(vector_store, args.path, args.dtype, args.batch_size), ensure_ascii=False, indent=2))
+    else:
+        print(f"Загружено записей: {import_snapshot(vector_store, args.path, create_lexical_index(), args.batch_size)}")
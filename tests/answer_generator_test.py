@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from src.answer_generator import Generator
 
@@ -56,3 +57,75 @@ def test_generate_various_questions(generator, question):
     answer = generator.generate(question)
     assert isinstance(answer, str)
     assert len(answer) > 0
+
+def test_agenerate_concurrent_questions(generator):
+    """
+    Проверяет асинхронную генерацию нескольких ответов одновременно.
+
+    Args:
+        generator (Generator): Тестируемый генератор.
+
+    Asserts:
+        Все ответы — непустые строки, порядок соответствует вопросам.
+    """
+    questions = ["Что делает компания Loymax?", "Кто такой Альберт Эйнштейн?"]
+
+    async def ask_all():
+        return await asyncio.gather(*(generator.agenerate(q) for q in questions))
+
+    answers = asyncio.run(ask_all())
+    assert len(answers) == len(questions)
+    assert all(isinstance(a, str) and a for a in answers)
+
+def test_astream_yields_sources_then_tokens(generator):
+    """
+    Проверяет потоковую генерацию: первым приходит событие с источниками,
+    затем фрагменты ответа и событие завершения.
+
+    Args:
+        generator (Generator): Тестируемый генератор.
+
+    Asserts:
+        Порядок событий sources -> token... -> done, склеенный ответ не пустой.
+    """
+    async def collect():
+        return [event async for event in generator.astream("Что делает компания Loymax?")]
+
+    events = asyncio.run(collect())
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "sources" and kinds[-1] == "done"
+    assert set(kinds[1:-1]) == {"token"}
+    assert "".join(data for kind, data in events if kind == "token")
+
+def test_astream_cached_answer_keeps_sources(generator):
+    """
+    Проверяет, что ответ из кэша приходит в потоке с теми же источниками, что и сгенерированный.
+
+    Args:
+        generator (Generator): Тестируемый генератор.
+
+    Asserts:
+        Источники и ответ при повторном вопросе совпадают с первым потоком.
+    """
+    async def collect():
+        return [event async for event in generator.astream("Что делает компания Loymax?")]
+
+    first, cached = asyncio.run(collect()), asyncio.run(collect())
+    assert cached[0] == first[0]
+    assert "".join(data for kind, data in cached if kind == "token") == "".join(data for kind, data in first if kind == "token")
+
+def test_agenerate_batch_keeps_order(generator):
+    """
+    Проверяет пакетную генерацию: результаты возвращаются в порядке вопросов.
+
+    Args:
+        generator (Generator): Тестируемый генератор.
+
+    Asserts:
+        На каждый вопрос есть непустой ответ без ошибки, вопросы в результате совпадают с исходными.
+    """
+    questions = ["Что делает компания Loymax?", "Кто такой Альберт Эйнштейн?", "Что делает компания Loymax?"]
+
+    results = asyncio.run(generator.agenerate_batch(questions))
+    assert [r["question"] for r in results] == questions
+    assert all(r["error"] is None and r["answer"] for r in results)
@@ -0,0 +1,49 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.mock_llm import create_app
+from benchmarks.report import compare_reports, summarize
+
+def test_corpus_is_deterministic() -> None:
+    """
+    Проверяет, что корпус с одинаковым сидом совпадает, а вопросы строятся по словам корпуса.
+    """
+    first = list(CorpusGenerator(seed=3, vocabulary_size=500, n_names=50).documents(200))
+    second = list(CorpusGenerator(seed=3, vocabulary_size=500, n_names=50).documents(200))
+    assert first == second
+    assert len({doc["uid"] for doc in first}) == 200
+    assert len(CorpusGenerator(seed=3, vocabulary_size=500, n_names=50).questions(first, 5)) == 5
+
+def test_summarize_and_compare() -> None:
+    """
+    Проверяет перцентили сводки и обнаружение регрессии при сравнении отчётов.
+    """
+    summary = summarize([i / 1000 for i in range(1, 101)], errors=2, items=100, duration=2.0)
+    assert summary["count"] == 100 and summary["errors"] == 2
+    assert summary["p50_ms"] == 50.5
+    assert summary["items_per_s"] == 50.0
+
+    slower = summarize([i / 500 for i in range(1, 101)], errors=0, items=100, duration=4.0)
+    rows = compare_reports({"stages": {"query": summary}}, {"stages": {"query": slower}}, threshold=0.1)
+    assert all(row["regression"] for row in rows)
+    assert not any(row["regression"] for row in compare_reports({"stages": {"query": summary}}, {"stages": {"query": summary}}))
+
+def test_mock_llm_completions() -> None:
+    """
+    Проверяет OpenAI-совместимые ответы заглушки: обычный и потоковый.
+    """
+    client = TestClient(create_app(ttft_ms=0, tokens_per_second=10_000, output_tokens=5, jitter=0))
+    request = {"model": "gpt-4o", "messages": [{"role": "user", "content": "Вопрос"}]}
+
+    body = client.post("/v1/chat/completions", json=request).json()
+    assert body["object"] == "chat.completion"
+    assert body["usage"]["completion_tokens"] == 5
+
+    response = client.post("/v1/chat/completions", json={**request, "stream": True})
+    events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    content = "".join(json.loads(e)["choices"][0]["delta"].get("content", "") for e in events[:-1])
+    assert content == body["choices"][0]["message"]["content"]
+    assert client.get("/stats").json()["requests"] == 2
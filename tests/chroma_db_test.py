@@ -76,6 +76,27 @@ def test_delete_and_clear(db: Chroma_db) -> None:
     assert len(db.get_existing_ids()) == 0
 
 
+def test_add_returns_added_ids_and_count(db: Chroma_db) -> None:
+    """
+    Проверяет, что add_unique_by_hash возвращает только реально добавленные id,
+    а count и has_hash работают по индексу хешей.
+    Args:
+        db (Chroma_db): Тестовая база Chroma_db.
+    """
+    ids = ["1", "2", "3"]
+    texts = ["Первый текст", "Второй текст", "Первый текст"]
+    embeddings = [[0.1] * 384, [0.2] * 384, [0.3] * 384]
+    metadatas = [{"source": "test"} for _ in ids]
+
+    added = db.add_unique_by_hash(ids, texts, embeddings, metadatas)
+    assert added == ["1", "2"]
+    assert db.count() == 2
+    assert db.has_hash(calculate_text_hash("Второй текст"))
+
+    result = db.collection.get(ids=["2"], include=["documents"])
+    assert result["documents"] == ["Второй текст"]
+
+
 def test_hash_function() -> None:
     """
     Проверяет корректность работы функции calculate_text_hash.
@@ -0,0 +1,56 @@
+import re
+
+import pytest
+from src.indexing.chunking import Chunker, collapse_chunks
+
+def whitespace_tokenizer(texts: list[str], **kwargs) -> dict:
+    """
+    Простейший токенизатор для тестов: токен — слово, с offset mapping как у быстрых токенизаторов HuggingFace.
+    """
+    return {"offset_mapping": [[m.span() for m in re.finditer(r"\S+", text)] for text in texts]}
+
+@pytest.fixture()
+def chunker(monkeypatch) -> Chunker:
+    """
+    Создаёт Chunker с чанками по 4 токена и перекрытием 1 токен.
+    """
+    chunker = Chunker(lambda: whitespace_tokenizer, lambda: 512)
+    monkeypatch.setattr(chunker, "config", {"max_tokens": 4, "overlap_tokens": 1})
+    return chunker
+
+def test_short_document_is_unchanged(chunker: Chunker) -> None:
+    """
+    Проверяет, что документ, помещающийся в модель, не разбивается и сохраняет uid.
+    """
+    chunks, metadatas = chunker.split([{"uid": "1", "text": "короткий текст"}], [{"source": "a"}])
+    assert chunks == [{"uid": "1", "text": "короткий текст"}]
+    assert metadatas[0]["source"] == "a" and metadatas[0]["n_chunks"] == 1
+
+def test_long_document_split_with_overlap(chunker: Chunker) -> None:
+    """
+    Проверяет разбиение длинного документа: uid чанков, перекрытие и отсутствие потерь текста.
+    """
+    text = "w0 w1 w2 w3 w4 w5 w6 w7 w8"
+    chunks, metadatas = chunker.split([{"uid": "7", "text": text}], [{}])
+    assert [c["uid"] for c in chunks] == ["7#0", "7#1", "7#2"]
+    assert [c["text"] for c in chunks] == ["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8"]
+    assert all(m["parent_uid"] == "7" and m["n_chunks"] == 3 for m in metadatas)
+    assert all(text[m["char_start"]:m["char_end"]] == c["text"] for c, m in zip(chunks, metadatas))
+
+def test_collapse_merges_sibling_chunks(chunker: Chunker) -> None:
+    """
+    Проверяет, что найденные чанки одного документа склеиваются без дублирования перекрытия.
+    """
+    text = "w0 w1 w2 w3 w4 w5 w6 w7 w8"
+    chunks, metadatas = chunker.split([{"uid": "7", "text": text}, {"uid": "8", "text": "другой"}], [{}, {}])
+    order = [1, 3, 0]
+    results = {
+        "ids": [[chunks[i]["uid"] for i in order]],
+        "documents": [[chunks[i]["text"] for i in order]],
+        "metadatas": [[metadatas[i] for i in order]],
+        "distances": [[0.1, 0.2, 0.3]],
+    }
+    collapsed = collapse_chunks(results)
+    assert collapsed["ids"] == [["7", "8"]]
+    assert collapsed["documents"] == [["w0 w1 w2 w3 w4 w5 w6", "другой"]]
+    assert collapsed["distances"] == [[0.1, 0.2]]
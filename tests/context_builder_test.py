@@ -0,0 +1,54 @@
+from src.answer_generator import ContextBuilder
+
+def _builder(max_tokens: int, dedup_threshold: float | None = 0.8) -> ContextBuilder:
+    return ContextBuilder({"max_tokens": max_tokens, "dedup_threshold": dedup_threshold}, "gpt-4o")
+
+def test_fits_everything_within_budget() -> None:
+    """
+    Проверяет, что при достаточном бюджете контекст совпадает с простым склеиванием документов.
+    """
+    docs = ["Первый документ про Loymax.", "Второй документ про Эйнштейна."]
+    context, stats = _builder(10_000).build(docs)
+    assert context == "\n".join(docs)
+    assert stats["saved_tokens"] == 0
+    assert stats["used_documents"] == 2
+
+def test_truncates_at_sentence_boundary() -> None:
+    """
+    Проверяет, что документ, не помещающийся в бюджет, обрезается по границе предложения.
+    """
+    builder = _builder(0)
+    first = "Первое предложение документа."
+    doc = f"{first} Второе предложение, которое уже не поместится в бюджет. Третье."
+    builder.max_tokens = builder.count_tokens(first) + 1
+    context, stats = builder.build([doc])
+    assert context == first
+    assert stats["truncated"] == 1
+    assert stats["context_tokens"] <= builder.max_tokens
+    assert stats["saved_tokens"] > 0
+
+def test_skips_near_duplicates_and_keeps_order() -> None:
+    """
+    Проверяет, что почти-дубликаты уже взятых документов отбрасываются, а порядок релевантности сохраняется.
+    """
+    base = "Альберт Эйнштейн родился в Ульме в тысяча восемьсот семьдесят девятом году в семье торговца"
+    docs = [base, "Loymax делает программы лояльности.", base + "."]
+    context, stats = _builder(10_000).build(docs)
+    assert context.split("\n") == docs[:2]
+    assert stats["duplicates"] == 1
+
+    context, stats = _builder(10_000, dedup_threshold=None).build(docs)
+    assert stats["duplicates"] == 0
+    assert context.split("\n") == docs
+
+def test_oversized_first_sentence_is_skipped() -> None:
+    """
+    Проверяет, что документ, у которого не помещается даже первое предложение, пропускается,
+    а следующий более короткий документ попадает в контекст.
+    """
+    builder = _builder(0)
+    short = "Коротко."
+    builder.max_tokens = builder.count_tokens(short)
+    context, stats = builder.build(["Очень длинное первое предложение без точки " * 20, short])
+    assert context == short
+    assert stats["used_documents"] == 1
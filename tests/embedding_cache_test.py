@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from src.indexing import Embedder, model_registry
+from src.indexing.embedding_cache import EmbeddingCache
+
+class FakeModel:
+    """
+    Лёгкая замена SentenceTransformer: запоминает, какие тексты кодировались.
+    """
+    max_seq_length = 512
+
+    def __init__(self):
+        self.encoded = []
+
+    def tokenizer(self, texts, **kwargs) -> dict:
+        return {"input_ids": [list(text) for text in texts]}
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        self.encoded.extend(texts)
+        return np.array([[len(text), 1.0, 0.0] for text in texts], dtype=np.float32)
+
+@pytest.fixture
+def cache(tmp_path) -> EmbeddingCache:
+    """
+    Создаёт пустой кэш эмбеддингов во временной папке.
+    """
+    return EmbeddingCache(str(tmp_path), "test/model")
+
+def test_put_get_and_stats(cache: EmbeddingCache) -> None:
+    """
+    Проверяет попадания и промахи кэша и подсчёт статистики.
+    """
+    cache.put(["a", "b"], np.array([[1, 2], [3, 4]], dtype=np.float32))
+    result = cache.get(["a", "c", "b"])
+    assert np.allclose(result[0], [1, 2]) and result[1] is None and np.allclose(result[2], [3, 4])
+    assert cache.stats() == {"size": 2, "hits": 2, "misses": 1, "hit_rate": 2 / 3}
+
+def test_cache_is_persistent_and_recovers(tmp_path, cache: EmbeddingCache) -> None:
+    """
+    Проверяет, что кэш переживает переоткрытие и восстанавливается после прерванной записи ключей.
+    """
+    cache.put(["a"], np.array([[1, 2]], dtype=np.float32))
+    with open(cache.vectors_path, "ab") as f:
+        f.write(np.array([9, 9], dtype=np.float32).tobytes())
+
+    reopened = EmbeddingCache(str(tmp_path), "test/model")
+    assert len(reopened) == 1
+    reopened.put(["b"], np.array([[3, 4]], dtype=np.float32))
+    assert np.allclose(EmbeddingCache(str(tmp_path), "test/model").get(["b"])[0], [3, 4])
+
+def test_embedder_encodes_only_misses(monkeypatch, cache: EmbeddingCache) -> None:
+    """
+    Проверяет, что Embedder отправляет в модель только тексты, которых нет в кэше.
+    """
+    model = FakeModel()
+    model_registry.clear()
+    monkeypatch.setattr(model_registry, "_load_model", lambda name: model)
+    embedder = Embedder()
+    embedder.cache = cache
+
+    first = embedder.encode(["один", "два"])
+    second = embedder.encode(["два", "три", "один"])
+    assert model.encoded == ["один", "два", "три"]
+    assert np.allclose(second[0], first[1]) and np.allclose(second[2], first[0])
+    model_registry.clear()
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from src.indexing import Embedder, model_registry
+
+class FakeModel:
+    """
+    Лёгкая замена SentenceTransformer: токен — символ, запоминает размеры батчей.
+    """
+    max_seq_length = 16
+
+    def __init__(self):
+        self.batches = []
+
+    def tokenizer(self, texts, truncation=False, max_length=None, **kwargs) -> dict:
+        return {"input_ids": [list(text)[:max_length] if truncation else list(text) for text in texts]}
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        texts = [texts] if isinstance(texts, str) else texts
+        self.batches.append([len(text) for text in texts])
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+@pytest.fixture
+def embedder(monkeypatch) -> tuple[Embedder, FakeModel]:
+    """
+    Создаёт Embedder без кэша с фейковой моделью и бюджетом 16 токенов на батч.
+    """
+    model = FakeModel()
+    model_registry.clear()
+    monkeypatch.setattr(model_registry, "_load_model", lambda name: model)
+    embedder = Embedder()
+    embedder.cache = None
+    embedder.batching_config = {"enabled": True, "token_budget": 16, "max_batch_size": 8}
+    yield embedder, model
+    model_registry.clear()
+
+def test_bucketed_encode_keeps_order(embedder) -> None:
+    """
+    Проверяет, что эмбеддинги возвращаются в исходном порядке, а батчи укладываются в бюджет токенов.
+    """
+    embedder, model = embedder
+    texts = ["a" * n for n in (1, 8, 2, 16, 3, 4, 1, 8)]
+    result = embedder.encode(texts)
+    assert result[:, 0].tolist() == [len(text) for text in texts]
+    assert all(len(batch) * max(batch) <= 16 for batch in model.batches)
+    assert [length for batch in model.batches for length in batch] == sorted((len(t) for t in texts), reverse=True)
+
+def test_padding_efficiency(embedder) -> None:
+    """
+    Проверяет подсчёт эффективности паддинга: реальные токены / токены с паддингом.
+    """
+    embedder, model = embedder
+    embedder.encode(["a" * 16, "a" * 8, "a" * 8])
+    stats = embedder.batching_stats()
+    assert model.batches == [[16], [8, 8]]
+    assert stats["batches"] == 2 and stats["tokens"] == 32
+    assert stats["padding_efficiency"] == pytest.approx(1.0)
+
+    embedder.encode(["a" * 8, "a" * 2])
+    assert embedder.batching_stats()["padding_efficiency"] == pytest.approx(42 / 48)
@@ -0,0 +1,70 @@
+import pytest
+from src.vector_db.hash_index import HashIndex
+
+@pytest.fixture()
+def index_path(tmp_path) -> str:
+    """
+    Путь к временному файлу индекса хешей.
+    """
+    return str(tmp_path / "hash_index.sqlite3")
+
+def test_add_and_membership(index_path: str) -> None:
+    """
+    Проверяет проверки наличия uid/хеша и подсчёт записей.
+    """
+    index = HashIndex(index_path)
+    index.add([("1", "h1"), ("2", "h2")])
+    assert len(index) == 2
+    assert index.has_uid("1") and index.has_hash("h2")
+    assert not index.has_uid("3") and not index.has_hash("h3")
+
+def test_index_is_persistent(index_path: str) -> None:
+    """
+    Проверяет, что индекс восстанавливается из файла после переоткрытия.
+    """
+    HashIndex(index_path).add([("1", "h1"), ("2", "h2")])
+    reopened = HashIndex(index_path)
+    assert len(reopened) == 2
+    assert reopened.get_hash("2") == "h2"
+
+def test_remove_and_clear(index_path: str) -> None:
+    """
+    Проверяет удаление по uid (включая отсутствующие) и полную очистку.
+    """
+    index = HashIndex(index_path)
+    index.add([("1", "h1"), ("2", "h1"), ("3", "h3")])
+    assert index.remove(["1", "missing"]) == 1
+    assert index.has_hash("h1")
+    index.remove(["2"])
+    assert not index.has_hash("h1")
+    index.clear()
+    assert len(HashIndex(index_path)) == 0
+
+def test_document_hashes_by_parent(index_path: str) -> None:
+    """
+    Проверяет хеши версий и uid чанков по uid исходного документа, в том числе после переоткрытия.
+    """
+    index = HashIndex(index_path)
+    index.add([("1#0", "c0"), ("1#1", "c1"), ("2", "h2")], documents=[("1", "d1"), ("1", "d1"), ("2", None)])
+    assert index.document_hashes(["1", "2", "3"]) == {"1": "d1", "2": None}
+    assert sorted(index.chunk_uids(["1"])) == ["1#0", "1#1"]
+    index.remove(["1#0"])
+    reopened = HashIndex(index_path)
+    assert reopened.chunk_uids(["1"]) == ["1#1"]
+    assert reopened.parent_uid("1#1") == "1"
+
+def test_select_new_documents_by_parent(index_path: str) -> None:
+    """
+    Проверяет, что документы отбираются целиком: чанк нового документа с текстом сохранённого чанка
+    не отсекается, а документ с уже сохранённым uid или текстом отсекается со всеми чанками.
+    """
+    index = HashIndex(index_path)
+    index.add([("a#0", "da"), ("a#1", "da")], documents=[("a", "va"), ("a", "va")])
+    records = [
+        ("b#0", "b", "db"), ("b#1", "b", "db"),
+        ("c#0", "c", "da"), ("c#1", "c", "da"),
+        ("a", "a", "dx"),
+        ("d", "d", "db"),
+        ("e", "e", "de"), ("e", "e", "de"),
+    ]
+    assert index.select_new_documents(records) == [0, 1, 6]
@@ -1,5 +1,12 @@
+import re
+from types import SimpleNamespace
+
+import numpy as np
 import pytest
-from src.indexing import Indexer
+from configs import config
+from src.indexing import Indexer, IndexingJob
+from src.indexing.chunking import Chunker
+from src.vector_db import LexicalIndex, NumpyStore
 
 @pytest.fixture
 def indexer() -> Indexer:
@@ -63,3 +70,119 @@ def test_no_duplicates(indexer: Indexer) -> None:
     added_2 = indexer.index(docs)
     assert added_1 == 1 
     assert added_2 == 0  
+
+def test_index_stream_across_batches(indexer: Indexer) -> None:
+    """
+    Проверяет потоковую индексацию небольшими батчами: дубликаты между батчами не добавляются.
+
+    Args:
+        indexer (Indexer): Экземпляр класса Indexer.
+
+    Returns:
+        None
+    """
+    docs = iter([
+        {"uid": "s1", "text": "Потоковый документ номер один, достаточно длинный."},
+        {"uid": "s2", "text": "Потоковый документ номер два, тоже достаточно длинный."},
+        {"uid": "s3", "text": "Потоковый документ номер один, достаточно длинный."},
+    ])
+    added = indexer.index_stream(docs, batch_size=2)
+    assert added == 2
+
+def test_upsert_counts_changes(indexer: Indexer) -> None:
+    """
+    Проверяет upsert по uid: новые документы добавляются, изменённые перезаписываются,
+    не изменившиеся пропускаются.
+
+    Args:
+        indexer (Indexer): Экземпляр класса Indexer.
+
+    Returns:
+        None
+    """
+    docs = [
+        {"uid": "u1", "text": "Первая версия документа для проверки upsert."},
+        {"uid": "u2", "text": "Документ, который не будет меняться при upsert."},
+    ]
+    assert indexer.upsert(docs) == {"added": 2, "changed": 0, "unchanged": 0}
+    docs[0] = {"uid": "u1", "text": "Вторая версия документа для проверки upsert."}
+    assert indexer.upsert(docs) == {"added": 0, "changed": 1, "unchanged": 1}
+    stored = indexer.vector_db.get(indexer.vector_db.chunk_ids(["u1"]))
+    assert [text.lower() for text in stored["documents"]] == ["вторая версия документа для проверки upsert."]
+
+def test_delete_by_uid(indexer: Indexer) -> None:
+    """
+    Проверяет удаление документов по uid и подсчёт не найденных uid.
+
+    Args:
+        indexer (Indexer): Экземпляр класса Indexer.
+
+    Returns:
+        None
+    """
+    indexer.upsert([{"uid": "d1", "text": "Документ, который будет удалён по uid."}])
+    assert indexer.delete(uids=["d1", "missing"]) == {"deleted": 1, "not_found": 1}
+    assert indexer.vector_db.document_hashes(["d1"]) == {}
+
+def test_index_stream_preprocesses_batches_in_parallel(tmp_path, monkeypatch) -> None:
+    """
+    Проверяет, что при включённом `preprocessing.parallel` батчи потоковой индексации
+    (путь /index_text и /index_file) проходят параллельную предобработку в пуле процессов.
+
+    Returns:
+        None
+    """
+    indexer = Indexer(NumpyStore(str(tmp_path)), LexicalIndex(str(tmp_path / "lexical")))
+    indexer.preprocessor.parallel_config = {**indexer.preprocessor.parallel_config, "enabled": True}
+    parallel_calls = []
+    parallel_pipeline = indexer.preprocessor._parallel_pipeline
+
+    def spy(docs: list[dict]) -> list[dict]:
+        parallel_calls.append(len(docs))
+        return parallel_pipeline(docs)
+
+    monkeypatch.setattr(indexer.preprocessor, "_parallel_pipeline", spy)
+    monkeypatch.setattr(indexer, "_embed_and_write", lambda docs, metadatas, job, upsert=False: ([], 0))
+    batch_size = config['indexing']['batch_size']
+    docs = (
+        {"uid": str(i), "text": f"Документ номер {i} для проверки параллельной предобработки"}
+        for i in range(batch_size + 1)
+    )
+    try:
+        indexer.index_stream(docs)
+    finally:
+        indexer.preprocessor.shutdown()
+    assert parallel_calls == [batch_size]
+
+def test_dedup_by_document_keeps_all_chunks(tmp_path, monkeypatch) -> None:
+    """
+    Проверяет, что дубликаты отсекаются по документу, а не по чанку: чанк нового документа
+    с тем же текстом, что у сохранённого чанка, записывается, а счётчики считают документы.
+
+    Returns:
+        None
+    """
+    indexer = Indexer(NumpyStore(str(tmp_path)), LexicalIndex(str(tmp_path / "lexical")))
+    tokenizer = lambda texts, **kwargs: {"offset_mapping": [[m.span() for m in re.finditer(r"\S+", t)] for t in texts]}
+    indexer.chunker = Chunker(lambda: tokenizer, lambda: 512)
+    monkeypatch.setattr(indexer.chunker, "config", {"max_tokens": 4, "overlap_tokens": 0})
+    indexer.embedder = SimpleNamespace(
+        encode=lambda texts: np.array([[len(t), sum(map(ord, t)) % 97, 1.0] for t in texts], dtype=np.float32),
+        cache=None,
+        batching_stats=lambda: {}
+    )
+
+    assert indexer.index([{"uid": "a", "text": "общий абзац про условия. первый документ о погоде"}]) == 1
+    job = IndexingJob("index_text")
+    docs = [
+        {"uid": "b", "text": "общий абзац про условия. второй документ о городе"},
+        {"uid": "c", "text": "общий абзац про условия. первый документ о погоде"},
+        {"uid": "a", "text": "новый текст с тем же uid, который уже сохранён"},
+    ]
+    assert indexer.index(docs, job) == 1
+    assert indexer.vector_db.get(indexer.vector_db.chunk_ids(["b"]))["documents"] == [
+        "общий абзац про условия.", "второй документ о городе"
+    ]
+    assert indexer.vector_db.document_hashes(["c"]) == {}
+    progress = job.to_dict()["progress"]
+    assert (progress["embedded"], progress["written"], progress["chunks"]) == (1, 1, 2)
@@ -0,0 +1,92 @@
+import threading
+import pytest
+from src.indexing.jobs import JobManager, JobQueueFull, COMPLETED, FAILED, CANCELLED
+
+@pytest.fixture
+def manager() -> JobManager:
+    """
+    Создаёт менеджер задач с одним рабочим потоком и останавливает его после теста.
+    """
+    manager = JobManager(max_workers=1, max_queued=1)
+    yield manager
+    manager.shutdown(wait=True)
+
+def test_job_completes_with_progress(manager: JobManager) -> None:
+    """
+    Проверяет, что задача выполняется в фоне, пишет прогресс и сохраняет результат.
+    """
+    def work(docs: list, job) -> int:
+        job.add_progress(parsed=len(docs), embedded=len(docs), written=len(docs))
+        job.add_timing("embed", 0.25)
+        job.add_timing("embed", 0.5)
+        return len(docs)
+
+    job = manager.submit("index_text", work, [1, 2, 3])
+    job.future.result(timeout=5)
+    state = job.to_dict()
+    assert state["status"] == COMPLETED
+    assert state["result"] == 3
+    assert state["progress"]["written"] == 3
+    assert state["timings"] == {"embed": 0.75}
+    assert manager.get(job.id) is job
+
+def test_job_failure_is_reported(manager: JobManager) -> None:
+    """
+    Проверяет, что исключение в задаче переводит её в статус failed с текстом ошибки.
+    """
+    def work(job) -> None:
+        raise ValueError("битый файл")
+
+    job = manager.submit("index_file", work)
+    job.future.result(timeout=5)
+    assert job.status == FAILED
+    assert "битый файл" in job.error
+
+def test_cancel_running_and_queued_jobs(manager: JobManager) -> None:
+    """
+    Проверяет отмену выполняющейся задачи на границе батча и снятие задачи из очереди,
+    а также отказ при переполнении очереди.
+    """
+    started = threading.Event()
+
+    def work(job) -> None:
+        started.set()
+        while True:
+            job.raise_if_cancelled()
+
+    running = manager.submit("index_file", work)
+    started.wait(timeout=5)
+    queued = manager.submit("index_file", work)
+    with pytest.raises(JobQueueFull):
+        manager.submit("index_file", work)
+
+    manager.cancel(queued.id)
+    manager.cancel(running.id)
+    running.future.result(timeout=5)
+    assert running.status == CANCELLED
+    assert queued.status == CANCELLED
+
+def test_on_finish_runs_for_every_terminal_status() -> None:
+    """
+    Проверяет, что on_finish вызывается ровно один раз и для выполненной задачи, и для отменённой в очереди,
+    и для задач, снятых при остановке менеджера.
+    """
+    manager = JobManager(max_workers=1, max_queued=2)
+    started, release = threading.Event(), threading.Event()
+    finished = []
+
+    def work(job) -> None:
+        started.set()
+        release.wait(timeout=5)
+
+    running = manager.submit("index_file", work, on_finish=lambda: finished.append("running"))
+    started.wait(timeout=5)
+    queued = manager.submit("index_file", work, on_finish=lambda: finished.append("queued"))
+    left = manager.submit("index_file", work, on_finish=lambda: finished.append("left"))
+    manager.cancel(queued.id)
+    assert finished == ["queued"]
+    manager.shutdown(wait=False)
+    release.set()
+    running.future.result(timeout=5)
+    assert sorted(finished) == ["left", "queued", "running"]
+    assert left.status == CANCELLED
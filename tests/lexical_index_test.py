@@ -0,0 +1,117 @@
+import math
+from collections import Counter
+
+import pytest
+from src.vector_db import LexicalIndex, NumpyStore, create_lexical_index
+from src.vector_db.lexical_index import tokenize
+
+DOCS = {
+    "1": "альберт эйнштейн родился в 1879 году в германии.",
+    "2": "теория относительности эйнштейна изменила физику.",
+    "3": "компания loymax разрабатывает программы лояльности.",
+    "4": "в 1945 году закончилась вторая мировая война.",
+}
+
+@pytest.fixture()
+def index(tmp_path) -> LexicalIndex:
+    """
+    Создаёт временный лексический индекс с несколькими документами (по сегменту на документ).
+    """
+    lexical_index = LexicalIndex(str(tmp_path), max_segments=8)
+    for uid, text in DOCS.items():
+        lexical_index.add([uid], [text])
+    return lexical_index
+
+def test_tokenize_normalizes_word_forms() -> None:
+    """
+    Проверяет, что словоформы сводятся к одной основе, а числа и стоп-слова обрабатываются корректно.
+    """
+    assert tokenize("Эйнштейна")[0] == tokenize("Эйнштейном")[0] == tokenize("эйнштейн")[0]
+    assert tokenize("в 1945 году") == ["1945", "году"]
+    assert tokenize("Ёлка") == tokenize("елка")
+
+def test_search_finds_rare_terms(index: LexicalIndex) -> None:
+    """
+    Проверяет, что редкие имена собственные и даты находятся на первом месте.
+    """
+    assert index.search("Когда родился Эйнштейн?")[0][0] == "1"
+    assert index.search("Что случилось в 1945?")[0][0] == "4"
+    assert index.search("Loymax")[0][0] == "3"
+    assert index.search("квантовая хромодинамика") == []
+
+def test_scores_match_reference_bm25(index: LexicalIndex) -> None:
+    """
+    Проверяет векторизованный подсчёт BM25 против наивной реализации.
+    """
+    docs = {uid: tokenize(text) for uid, text in DOCS.items()}
+    avg_length = sum(len(tokens) for tokens in docs.values()) / len(docs)
+    query = tokenize("эйнштейн 1879 году")
+
+    expected = {}
+    for uid, tokens in docs.items():
+        tf, score = Counter(tokens), 0.0
+        for term in query:
+            df = sum(term in other for other in docs.values())
+            if tf[term]:
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                score += idf * tf[term] * 2.2 / (tf[term] + 1.2 * (0.25 + 0.75 * len(tokens) / avg_length))
+        if score:
+            expected[uid] = score
+
+    result = dict(index.search("эйнштейн 1879 году", top_k=10))
+    assert result.keys() == expected.keys()
+    for uid, score in expected.items():
+        assert result[uid] == pytest.approx(score, rel=1e-5)
+
+def test_remove_replace_and_merge(tmp_path) -> None:
+    """
+    Проверяет удаление, замену документа и слияние сегментов с сохранением результатов.
+    """
+    index = LexicalIndex(str(tmp_path), max_segments=2)
+    for uid, text in DOCS.items():
+        index.add([uid], [text])
+    assert len(list(tmp_path.glob("seg_*.npz"))) <= 2
+
+    assert index.remove(["3"]) == 1
+    assert index.search("loymax") == []
+    index.add(["2"], ["loymax и эйнштейн"])
+    assert index.search("loymax")[0][0] == "2"
+    assert len(index) == 3
+
+def test_reopen_restores_index(index: LexicalIndex) -> None:
+    """
+    Проверяет, что индекс восстанавливается с диска после переоткрытия.
+    """
+    index.remove(["4"])
+    reopened = LexicalIndex(index.path)
+    assert len(reopened) == 3
+    assert reopened.search("эйнштейн", top_k=10) == index.search("эйнштейн", top_k=10)
+    assert reopened.search("1945") == []
+    reopened.clear()
+    assert len(reopened) == 0 and reopened.search("эйнштейн") == []
+
+def test_writes_from_another_process_are_visible(index: LexicalIndex) -> None:
+    """
+    Проверяет, что второй экземпляр на той же папке (другой воркер) видит добавления и удаления
+    первого и дописывает документы без конфликта номеров.
+    """
+    other = LexicalIndex(index.path)
+    index.add(["5"], ["нильс бор"])
+    assert other.search("бор")[0][0] == "5"
+    other.add(["6"], ["бор и эйнштейн"])
+    other.remove(["5"])
+    assert [uid for uid, _ in index.search("бор")] == ["6"]
+    assert len(index) == len(other)
+
+def test_backfill_from_vector_store(tmp_path) -> None:
+    """
+    Проверяет, что пустой индекс заполняется документами уже существующего векторного хранилища
+    (при создании через фабрику), а непустой не перестраивается.
+    """
+    store = NumpyStore(persist_dir=str(tmp_path))
+    store.add_unique_by_hash(list(DOCS), list(DOCS.values()), [[1.0, float(i)] for i in range(len(DOCS))], [{}] * len(DOCS))
+    lexical_index = create_lexical_index(str(tmp_path), vector_db=store)
+    assert len(lexical_index) == len(DOCS)
+    assert lexical_index.search("Loymax")[0][0] == "3"
+    assert lexical_index.backfill(store) == 0
+    assert LexicalIndex(str(tmp_path / "lexical")).backfill(store, rebuild=True) == len(DOCS)
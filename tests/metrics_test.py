@@ -0,0 +1,63 @@
+import pytest
+
+from configs import request_id_var, setup_logger
+from src.metrics import Registry
+
+def test_counter_and_histogram_render() -> None:
+    """
+    Проверяет текстовый формат Prometheus: счётчик с метками, кумулятивные корзины гистограммы, сумму и количество.
+    """
+    registry = Registry()
+    counter = registry.counter("docs_total", "Документы", ("step",))
+    histogram = registry.histogram("stage_seconds", "Этапы", ("stage",), buckets=(0.1, 1.0))
+    counter.inc(2, step="by_id")
+    counter.inc(step="by_id")
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, stage="embed")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE docs_total counter" in lines
+    assert 'docs_total{step="by_id"} 3' in lines
+    assert "# TYPE stage_seconds histogram" in lines
+    assert 'stage_seconds_bucket{stage="embed",le="0.1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="embed",le="1"} 3' in lines
+    assert 'stage_seconds_bucket{stage="embed",le="+Inf"} 4' in lines
+    assert 'stage_seconds_sum{stage="embed"} 3.65' in lines
+    assert 'stage_seconds_count{stage="embed"} 4' in lines
+
+def test_labels_are_validated_and_escaped() -> None:
+    """
+    Проверяет, что набор меток должен совпадать с объявленным, а значения экранируются.
+    """
+    registry = Registry()
+    counter = registry.counter("requests_total", "Запросы", ("path",))
+    with pytest.raises(ValueError):
+        counter.inc(status="ok")
+    with pytest.raises(ValueError):
+        registry.counter("requests_total", "Повтор")
+    counter.inc(path='a"b')
+    assert 'requests_total{path="a\\"b"} 1' in registry.render()
+
+def test_timer_observes_duration() -> None:
+    """
+    Проверяет, что контекстный менеджер `time` записывает наблюдение.
+    """
+    histogram = Registry().histogram("block_seconds", "Блок")
+    with histogram.time():
+        pass
+    assert histogram.count() == 1
+
+def test_request_id_in_log_records() -> None:
+    """
+    Проверяет, что идентификатор запроса из контекста попадает в записи логов.
+    """
+    logger = setup_logger("metrics_test.log")
+    records = []
+    logger.add(lambda message: records.append(message.record["extra"]["request_id"]), level="INFO")
+    token = request_id_var.set("req-42")
+    try:
+        logger.info("внутри запроса")
+    finally:
+        request_id_var.reset(token)
+    logger.info("вне запроса")
+    assert records == ["req-42", "-"]
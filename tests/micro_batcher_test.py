@@ -0,0 +1,51 @@
+import asyncio
+import numpy as np
+from src.indexing.micro_batcher import MicroBatcher
+
+def fake_encode(texts: list[str]) -> np.ndarray:
+    """
+    Батчевая функция эмбеддинга: вектор из длины текста.
+    """
+    return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+def test_concurrent_calls_are_batched() -> None:
+    """
+    Проверяет, что конкурентные вызовы объединяются в батчи не больше max_batch_size
+    и каждый вызывающий получает свой вектор.
+    """
+    batcher = MicroBatcher(fake_encode, max_batch_size=4, max_wait_ms=50)
+    texts = [f"вопрос {'x' * i}" for i in range(10)]
+
+    async def run():
+        return await asyncio.gather(*(batcher.encode(text) for text in texts))
+
+    vectors = asyncio.run(run())
+    assert [v[0] for v in vectors] == [len(text) for text in texts]
+    stats = batcher.stats()
+    assert stats["items"] == 10
+    assert stats["max_batch_size"] == 4
+    assert stats["batches"] == 3
+
+def test_single_call_waits_at_most_max_wait() -> None:
+    """
+    Проверяет, что одиночный вызов выполняется по таймеру max_wait_ms батчем из одного текста.
+    """
+    batcher = MicroBatcher(fake_encode, max_batch_size=32, max_wait_ms=1)
+    vector = asyncio.run(batcher.encode("один"))
+    assert vector[0] == 4
+    assert batcher.stats()["batch_size_histogram"] == {1: 1}
+
+def test_errors_are_propagated() -> None:
+    """
+    Проверяет, что ошибка модели передаётся всем вызывающим из батча.
+    """
+    def failing_encode(texts: list[str]) -> np.ndarray:
+        raise RuntimeError("модель недоступна")
+
+    batcher = MicroBatcher(failing_encode, max_batch_size=2, max_wait_ms=1)
+
+    async def run():
+        return await asyncio.gather(batcher.encode("a"), batcher.encode("b"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
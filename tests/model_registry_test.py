@@ -0,0 +1,60 @@
+import pytest
+from src.indexing import model_registry, Embedder
+
+@pytest.fixture(autouse=True)
+def fake_loader(monkeypatch):
+    """
+    Подменяет загрузку SentenceTransformer на лёгкий объект и считает вызовы загрузчика.
+
+    Returns:
+        list[str]: Список названий моделей, для которых вызывалась загрузка.
+    """
+    calls = []
+
+    def _load(model_name: str) -> object:
+        calls.append(model_name)
+        return object()
+
+    model_registry.clear()
+    monkeypatch.setattr(model_registry, "_load_model", _load)
+    yield calls
+    model_registry.clear()
+
+def test_model_is_loaded_lazily(fake_loader: list) -> None:
+    """
+    Проверяет, что создание Embedder не загружает модель до первого обращения.
+    """
+    embedder = Embedder()
+    assert fake_loader == []
+    _ = embedder.model
+    assert fake_loader == [embedder.model_name]
+
+def test_model_shared_between_embedders(fake_loader: list) -> None:
+    """
+    Проверяет, что несколько эмбеддеров разделяют один экземпляр модели.
+    """
+    first, second = Embedder(), Embedder()
+    assert first.model is second.model
+    assert len(fake_loader) == 1
+
+def test_warm_up_loads_configured_model(fake_loader: list) -> None:
+    """
+    Проверяет, что warm_up загружает модель из конфигурации и повторно её не грузит.
+    """
+    model_registry.warm_up()
+    model_registry.warm_up()
+    assert model_registry.loaded_models() == [Embedder().model_name]
+    assert len(fake_loader) == 1
+
+def test_backends_are_cached_separately(monkeypatch, fake_loader: list) -> None:
+    """
+    Проверяет, что torch- и ONNX-версии одной модели хранятся в реестре под разными ключами,
+    а неизвестный бэкенд отклоняется.
+    """
+    monkeypatch.setattr(model_registry, "_load_onnx_model", lambda name, quantize: ("onnx", quantize))
+    torch_model = model_registry.get_model("m")
+    assert model_registry.get_model("m", "onnx-int8") == ("onnx", True)
+    assert model_registry.get_model("m", "onnx") == ("onnx", False)
+    assert model_registry.get_model("m") is torch_model
+    with pytest.raises(ValueError):
+        model_registry.get_model("m", "tensorrt")
@@ -0,0 +1,65 @@
+import pytest
+from src.preprocessing import Preprocessor
+from src.preprocessing.near_duplicates import NearDuplicateIndex, choose_bands
+
+BASE = (
+    "альберт эйнштейн родился четырнадцатого марта тысяча восемьсот семьдесят девятого года "
+    "в городе ульм в королевстве вюртемберг в семье мелкого предпринимателя германа эйнштейна "
+    "и паулины кох его отец вместе с братом вёл небольшое предприятие по продаже электротехники"
+)
+REVISION = BASE.replace("мелкого предпринимателя", "небогатого предпринимателя")
+OTHER = (
+    "компания loymax разрабатывает программное обеспечение для программ лояльности розничных сетей "
+    "и помогает ритейлерам анализировать поведение покупателей и персонализировать предложения"
+)
+
+@pytest.fixture()
+def index(tmp_path) -> NearDuplicateIndex:
+    """
+    Создаёт пустой индекс почти-дубликатов во временной папке.
+    """
+    return NearDuplicateIndex(str(tmp_path / "near.sqlite3"), threshold=0.7, shingle_size=3)
+
+def test_choose_bands_matches_threshold() -> None:
+    """
+    Проверяет, что разбиение на полосы покрывает всю сигнатуру и даёт порог около заданного.
+    """
+    bands, rows = choose_bands(128, 0.8)
+    assert bands * rows == 128
+    assert abs((1 / bands) ** (1 / rows) - 0.8) < 0.1
+
+def test_finds_revision_but_not_other_text(index: NearDuplicateIndex) -> None:
+    """
+    Проверяет, что правка текста находится как почти-дубликат, а другой текст — нет.
+    """
+    index.stage("base", index.signature(BASE))
+    match = index.find(index.signature(REVISION), "rev")
+    assert match is not None and match[0] == "base" and match[1] >= 0.7
+    assert index.find(index.signature(OTHER), "other") is None
+    assert index.find(index.signature(BASE), "base") is None
+
+def test_commit_persists_and_rollback_discards(index: NearDuplicateIndex) -> None:
+    """
+    Проверяет, что подтверждённые сигнатуры переживают переоткрытие, а откаченные — удаляются.
+    """
+    index.stage("base", index.signature(BASE))
+    index.commit()
+    index.stage("other", index.signature(OTHER))
+    index.rollback()
+    assert len(index) == 1
+
+    reopened = NearDuplicateIndex(index.path, threshold=0.7, shingle_size=3)
+    assert len(reopened) == 1
+    assert reopened.find(reopened.signature(REVISION), "rev")[0] == "base"
+
+def test_preprocessor_drops_near_duplicates(index: NearDuplicateIndex) -> None:
+    """
+    Проверяет, что препроцессор удаляет почти-дубликаты внутри батча и сообщает пары.
+    """
+    preprocessor = Preprocessor()
+    preprocessor.near_duplicates = index
+    docs = [{"uid": 1, "text": BASE}, {"uid": 2, "text": OTHER}, {"uid": 3, "text": REVISION}]
+    result = preprocessor.preprocess_pipeline(docs)
+    assert [doc["uid"] for doc in result] == [1, 2]
+    assert preprocessor.last_near_duplicates[0]["uid"] == "3"
+    assert preprocessor.last_near_duplicates[0]["duplicate_of"] == "1"
@@ -0,0 +1,177 @@
+import os
+
+import numpy as np
+import pytest
+from src.vector_db import NumpyStore, create_vector_store
+
+@pytest.fixture()
+def store(tmp_path) -> NumpyStore:
+    """
+    Создаёт временное NumPy-хранилище.
+    """
+    return NumpyStore(persist_dir=str(tmp_path))
+
+def _vec(*values: float) -> list[float]:
+    return list(values) + [0.0] * (4 - len(values))
+
+def test_add_skips_duplicates(store: NumpyStore) -> None:
+    """
+    Проверяет, что повторные uid и тексты с известным хешем не добавляются.
+    """
+    assert store.add_unique_by_hash(["1", "2"], ["первый", "второй"], [_vec(1), _vec(0, 1)], [{}, {}]) == ["1", "2"]
+    added = store.add_unique_by_hash(["2", "3", "4"], ["новый", "первый", "третий"], [_vec(1)] * 3, [{}] * 3)
+    assert added == ["4"]
+    assert store.count() == 3
+
+def test_query_matches_brute_force(store: NumpyStore) -> None:
+    """
+    Проверяет, что порядок и расстояния совпадают с полным перебором по косинусной близости.
+    """
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 4))
+    ids = [str(i) for i in range(50)]
+    store.add_unique_by_hash(ids, [f"текст {i}" for i in ids], vectors.tolist(), [{"n": i} for i in range(50)])
+    query = rng.normal(size=4)
+
+    result = store.query(query.tolist(), top_k=5)
+    cosine = (vectors @ query) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    expected = np.argsort(-cosine)[:5]
+    assert result["ids"][0] == [str(i) for i in expected]
+    assert result["metadatas"][0][0]["n"] == expected[0]
+    assert result["distances"][0] == pytest.approx(list(1 - cosine[expected]), abs=1e-5)
+
+def test_query_batch_matches_single_queries(store: NumpyStore) -> None:
+    """
+    Проверяет, что пакетный поиск возвращает для каждого запроса то же, что и одиночный, в порядке запросов.
+    """
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(30, 4))
+    ids = [str(i) for i in range(30)]
+    store.add_unique_by_hash(ids, [f"текст {i}" for i in ids], vectors.tolist(), [{}] * 30)
+    store.delete_by_id(["0", "1"])
+    queries = rng.normal(size=(3, 4))
+
+    batch = store.query_batch(queries, top_k=4)
+    assert len(batch["ids"]) == 3
+    for i, query in enumerate(queries):
+        single = store.query(query.tolist(), top_k=4)
+        assert batch["ids"][i] == single["ids"][0]
+        assert batch["documents"][i] == single["documents"][0]
+        assert batch["distances"][i] == pytest.approx(single["distances"][0], abs=1e-5)
+
+def test_query_skips_rows_deleted_during_search(store: NumpyStore, monkeypatch) -> None:
+    """
+    Проверяет, что документ, удалённый другим процессом между подсчётом близости и чтением строк,
+    пропускается, а расстояния остаются сопоставлены с документами.
+    """
+    store.add_unique_by_hash(["1", "2", "3"], ["один", "два", "три"], [_vec(1), _vec(0.9, 0.1), _vec(0, 1)], [{}] * 3)
+    other = NumpyStore(persist_dir=store.persist_dir, compact_dead_ratio=1.0)
+    fetch_rows = store._fetch_rows
+
+    def delete_then_fetch(rows: list[int]) -> dict:
+        other.delete_by_id(["1"])
+        return fetch_rows(rows)
+
+    monkeypatch.setattr(store, "_fetch_rows", delete_then_fetch)
+    result = store.query_batch([_vec(1), _vec(0, 1)], top_k=2)
+    assert result["ids"] == [["2"], ["3", "2"]]
+    assert result["distances"][0] == pytest.approx([1 - 0.9 / np.hypot(0.9, 0.1)], abs=1e-5)
+    assert result["distances"][1][0] == pytest.approx(0.0, abs=1e-5)
+
+def test_upsert_replaces_document(store: NumpyStore) -> None:
+    """
+    Проверяет, что upsert заменяет текст и вектор документа с тем же uid.
+    """
+    store.add_unique_by_hash(["1", "2"], ["старый", "другой"], [_vec(1), _vec(0, 1)], [{}, {}])
+    store.upsert(["1"], ["новый"], [_vec(0, 0, 1)], [{}])
+    result = store.query(_vec(0, 0, 1), top_k=5)
+    assert store.count() == 2
+    assert result["ids"][0][0] == "1"
+    assert result["documents"][0][0] == "новый"
+    assert len(result["ids"][0]) == 2
+
+def test_document_lookup_by_uid_and_metadata(store: NumpyStore) -> None:
+    """
+    Проверяет поиск документов и их чанков по uid исходного документа и по метаданным.
+    """
+    store.add_unique_by_hash(
+        ["a#0", "a#1", "b"],
+        ["чанк 1", "чанк 2", "документ"],
+        [_vec(1), _vec(0, 1), _vec(0, 0, 1)],
+        [
+            {"parent_uid": "a", "doc_hash": "ha", "source": "wiki"},
+            {"parent_uid": "a", "doc_hash": "ha", "source": "wiki"},
+            {"doc_hash": "hb", "source": "faq"}
+        ]
+    )
+    assert store.document_hashes(["a", "b", "c"]) == {"a": "ha", "b": "hb"}
+    assert sorted(store.chunk_ids(["a"])) == ["a#0", "a#1"]
+    assert store.find_documents({"source": "wiki"}) == ["a"]
+    assert sorted(store.find_documents({"source": ["wiki", "faq"]})) == ["a", "b"]
+
+def test_compaction_drops_dead_rows(tmp_path) -> None:
+    """
+    Проверяет, что при превышении доли удалённых строк файл векторов переписывается без них,
+    а поиск, чтение, повторное открытие и другой экземпляр хранилища видят те же документы.
+    """
+    store = NumpyStore(persist_dir=str(tmp_path), compact_dead_ratio=0.4)
+    other = NumpyStore(persist_dir=str(tmp_path))
+    ids = [str(i) for i in range(6)]
+    vectors = [_vec(*np.eye(4)[i % 4] + 0.1 * i) for i in range(6)]
+    store.add_unique_by_hash(ids, [f"документ {i}" for i in ids], vectors, [{"n": i} for i in range(6)])
+    expected = other.query(vectors[5], top_k=6)
+
+    store.delete_by_id(["0", "1"])
+    assert store._file_rows() == 6
+    store.upsert(["2"], ["документ 2, новая версия"], [vectors[2]], [{"n": 2}])
+    assert store._file_rows() == 4
+    assert [name for name in os.listdir(tmp_path) if name.startswith("vectors")] == [os.path.basename(store.vectors_path)]
+
+    for opened in (store, other, NumpyStore(persist_dir=str(tmp_path))):
+        assert opened.count() == 4
+        result = opened.query(vectors[5], top_k=3)
+        assert result["ids"][0] == [uid for uid in expected["ids"][0] if uid not in ("0", "1")][:3]
+        assert opened.get(["2", "5"])["documents"] == ["документ 2, новая версия", "документ 5"]
+
+def test_delete_and_clear(store: NumpyStore) -> None:
+    """
+    Проверяет, что удалённые документы не находятся поиском, а clear очищает хранилище.
+    """
+    store.add_unique_by_hash(["1", "2"], ["первый", "второй"], [_vec(1), _vec(0, 1)], [{}, {}])
+    generation = store.generation
+    assert store.delete_by_id(["1"]) == 1
+    assert store.generation > generation
+    assert store.query(_vec(1), top_k=5)["ids"] == [["2"]]
+    assert store.get(["1", "2"])["documents"] == ["второй"]
+    store.clear()
+    assert store.count() == 0
+    assert store.query(_vec(1))["ids"] == [[]]
+
+def test_reopen_restores_state(tmp_path) -> None:
+    """
+    Проверяет, что хранилище восстанавливается с диска после переоткрытия.
+    """
+    store = create_vector_store("numpy", str(tmp_path))
+    store.add_unique_by_hash(["1", "2", "3"], ["первый", "второй", "третий"], [_vec(1), _vec(0, 1), _vec(0, 0, 1)], [{}] * 3)
+    store.delete_by_id(["2"])
+
+    reopened = NumpyStore(persist_dir=str(tmp_path))
+    assert sorted(reopened.get_existing_ids()) == ["1", "3"]
+    assert reopened.query(_vec(0, 1, 1), top_k=5)["ids"][0][0] == "3"
+    assert reopened.add_unique_by_hash(["4"], ["первый"], [_vec(1)], [{}]) == []
+
+def test_writes_from_another_process_are_visible(tmp_path) -> None:
+    """
+    Проверяет, что два экземпляра на одной папке (как воркеры сервиса) видят записи друг друга
+    и не перезаписывают строки векторов, добавленные другим экземпляром.
+    """
+    writer, reader = NumpyStore(persist_dir=str(tmp_path)), NumpyStore(persist_dir=str(tmp_path))
+    generation = reader.generation
+    writer.add_unique_by_hash(["1"], ["первый"], [_vec(1)], [{}])
+    assert reader.count() == 1 and reader.generation > generation
+    assert reader.query(_vec(1), top_k=1)["ids"] == [["1"]]
+
+    assert reader.add_unique_by_hash(["1", "2"], ["первый", "второй"], [_vec(1), _vec(0, 1)], [{}, {}]) == ["2"]
+    assert writer.query(_vec(0, 1), top_k=1)["ids"] == [["2"]]
+    writer.delete_by_id(["1"])
+    assert reader.get(["1", "2"])["ids"] == ["2"]
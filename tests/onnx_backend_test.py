@@ -0,0 +1,21 @@
+import numpy as np
+from src.indexing.onnx_backend import mean_pool
+
+def test_mean_pool_ignores_padding() -> None:
+    """
+    Проверяет, что mean pooling усредняет только незамаскированные токены и нормализует результат.
+    """
+    hidden = np.array([[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]]], dtype=np.float32)
+    mask = np.array([[1, 1, 0]])
+    pooled = mean_pool(hidden, mask, normalize=False)
+    assert np.allclose(pooled, [[2.0, 0.0]])
+    assert np.allclose(mean_pool(hidden, mask), [[1.0, 0.0]])
+
+def test_mean_pool_batch_norms() -> None:
+    """
+    Проверяет, что все эмбеддинги батча имеют единичную норму.
+    """
+    rng = np.random.default_rng(0)
+    hidden = rng.normal(size=(4, 6, 8)).astype(np.float32)
+    mask = np.array([[1] * 6, [1] * 3 + [0] * 3, [1] + [0] * 5, [1] * 5 + [0]])
+    assert np.allclose(np.linalg.norm(mean_pool(hidden, mask), axis=1), 1.0, atol=1e-5)
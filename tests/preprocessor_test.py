@@ -1,5 +1,6 @@
 import pytest
 from typing import List, Dict
+from configs import config
 from src.preprocessing import Preprocessor
 
 @pytest.fixture
@@ -128,4 +129,75 @@ def test_full_pipeline(preprocessor: Preprocessor, sample_docs: List[Dict[str, s
     result: List[Dict[str, str]] = preprocessor.preprocess_pipeline(sample_docs)
     assert all(len(doc["text"]) >= preprocessor.min_length for doc in result)
     assert all("�" not in doc["text"] for doc in result)
-    assert all("<" not in doc["text"] for doc in result)  
\ No newline at end of file
+    assert all("<" not in doc["text"] for doc in result)  
+
+def test_parallel_pipeline_matches_serial(preprocessor: Preprocessor) -> None:
+    """
+    Проверяет, что параллельный режим даёт тот же результат, что и последовательный,
+    включая дубликаты по uid и тексту в разных шардах.
+
+    Args:
+        preprocessor (Preprocessor): экземпляр препроцессора.
+    """
+    base = [
+        {"uid": i % 37, "text": f"<p>Документ\tномер {i % 53}</p>  с текстом" if i % 5 else "Коротко", "extra": i}
+        for i in range(200)
+    ]
+    serial = preprocessor.preprocess_pipeline([dict(doc) for doc in base])
+
+    preprocessor.parallel_config = {"enabled": True, "workers": 2, "min_docs": 1, "shard_size": 16}
+    try:
+        parallel = preprocessor.preprocess_pipeline([dict(doc) for doc in base])
+    finally:
+        preprocessor.shutdown()
+    assert parallel == serial
+
+def test_parallel_pipeline_without_length_filter(monkeypatch) -> None:
+    """
+    Проверяет, что при отключённой фильтрации по длине параллельный режим
+    (с проверкой качества) даёт тот же результат, что и последовательный.
+
+    Args:
+        monkeypatch: фикстура pytest для временной подмены конфигурации.
+    """
+    monkeypatch.setitem(config['preprocessing']['filter_by_length'], "working", False)
+    preprocessor = Preprocessor()
+    base = [{"uid": i, "text": f"<b>Документ {i % 3}</b>" if i % 2 else "Коротко"} for i in range(6)]
+    serial = preprocessor.preprocess_pipeline([dict(doc) for doc in base])
+
+    preprocessor.parallel_config = {"enabled": True, "workers": 2, "min_docs": 2, "shard_size": 2}
+    try:
+        parallel = preprocessor.preprocess_pipeline([dict(doc) for doc in base])
+    finally:
+        preprocessor.shutdown()
+    assert parallel == serial
+    assert [doc["uid"] for doc in serial] == [0, 1, 3, 5]
+
+def test_fused_pipeline_matches_step_by_step(preprocessor: Preprocessor) -> None:
+    """
+    Проверяет, что однопроходный пайплайн даёт ожидаемый результат и совпадает
+    с поочерёдным применением эталонных пошаговых методов.
+
+    Args:
+        preprocessor (Preprocessor): экземпляр препроцессора.
+    """
+    base = [
+        {"uid": 1, "text": "Текст с&nbsp;HTML &amp; <b>тегами</b>\tи\nпереводами строк"},
+        {"uid": 2, "text": "ТЕКСТ С&NBSP;HTML &AMP; <B>ТЕГАМИ</B>\tИ\nПЕРЕВОДАМИ СТРОК"},
+        {"uid": 1, "text": "Другой текст с тем же uid, достаточно длинный"},
+        {"uid": 3, "text": "Битый​ символ � и неразрывный\xa0пробел в тексте"},
+        {"uid": 4, "text": "  короткий  "},
+        {"uid": 5, "text": "<p>Битый​ символ � и неразрывный\xa0пробел в тексте</p>"},
+    ]
+    expected = [dict(doc) for doc in base]
+    for step in (
+        preprocessor._to_lowercase, preprocessor._clean_text, preprocessor._remove_duplicates_by_id,
+        preprocessor._remove_duplicates_by_hash, preprocessor._filter_by_length,
+    ):
+        expected = step(expected)
+
+    assert expected == [
+        {"uid": 1, "text": "текст с html & тегами и переводами строк"},
+        {"uid": 3, "text": "битый символ и неразрывный пробел в тексте"},
+    ]
+    assert preprocessor.preprocess_pipeline([dict(doc) for doc in base]) == expected
@@ -0,0 +1,68 @@
+import time
+import numpy as np
+import pytest
+from src.answer_generator.query_cache import QueryCache, TTLCache
+
+@pytest.fixture
+def cache() -> QueryCache:
+    """
+    Создаёт кэш запросов с поиском похожих вопросов по порогу 0.9.
+    """
+    tier = {"max_size": 2, "ttl_seconds": 60}
+    cache = QueryCache({
+        "embeddings": tier,
+        "retrieval": tier,
+        "answers": {**tier, "similarity_threshold": 0.9},
+    })
+    cache.sync(0)
+    return cache
+
+def test_ttl_and_lru_eviction() -> None:
+    """
+    Проверяет вытеснение давно использованных записей и истечение TTL.
+    """
+    lru = TTLCache(max_size=2, ttl_seconds=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert lru.get("b") is None and lru.get("a") == 1 and lru.get("c") == 3
+
+    short = TTLCache(max_size=2, ttl_seconds=0.01)
+    short.set("a", 1)
+    time.sleep(0.02)
+    assert short.get("a") is None
+
+def test_normalize() -> None:
+    """
+    Проверяет нормализацию регистра, пробелов и концевой пунктуации.
+    """
+    assert QueryCache.normalize("  Кто  был первым президентом?! ") == "кто был первым президентом"
+
+def test_answer_cache_exact_and_similar(cache: QueryCache) -> None:
+    """
+    Проверяет точный и приближённый (по косинусной близости) поиск ответа.
+    """
+    emb = np.array([1.0, 0.0], dtype=np.float32)
+    cache.put_answer("вопрос", emb, "ответ", generation=0)
+    assert cache.get_answer("вопрос") == "ответ"
+    assert cache.get_similar_answer(np.array([0.95, 0.312], dtype=np.float32)) == "ответ"
+    assert cache.get_similar_answer(np.array([0.0, 1.0], dtype=np.float32)) is None
+
+def test_invalidation_on_collection_change(cache: QueryCache) -> None:
+    """
+    Проверяет, что смена поколения коллекции сбрасывает результаты поиска и ответы,
+    но сохраняет эмбеддинги вопросов, а запись со старым поколением игнорируется.
+    """
+    emb = np.array([1.0, 0.0], dtype=np.float32)
+    cache.put_embedding("вопрос", emb)
+    cache.put_retrieval(emb, {"ids": [["1"]]}, generation=0)
+    cache.put_answer("вопрос", emb, "ответ", generation=0)
+
+    cache.sync(1)
+    assert cache.get_retrieval(emb) is None
+    assert cache.get_answer("вопрос") is None
+    assert cache.get_embedding("вопрос") is emb
+
+    cache.put_answer("вопрос", emb, "устаревший ответ", generation=0)
+    assert cache.get_answer("вопрос") is None
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from configs import config
+from src.api.services import Services
+from src.indexing import model_registry
+
+class FakeModel:
+    """
+    Лёгкая замена SentenceTransformer, запоминающая закодированные тексты.
+    """
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        self.encoded.extend(texts)
+        return np.ones((len(texts), 2), dtype=np.float32)
+
+@pytest.fixture
+def model(monkeypatch, tmp_path) -> FakeModel:
+    """
+    Подменяет модель эмбеддингов и направляет хранилища во временную папку.
+    """
+    model = FakeModel()
+    model_registry.clear()
+    monkeypatch.setattr(model_registry, "_load_model", lambda name: model)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setitem(config['vector_db'], 'backend', 'numpy')
+    monkeypatch.setitem(config['vector_db'], 'persist_dir', str(tmp_path))
+    monkeypatch.setitem(config['embedder'], 'batching', {"enabled": False})
+    monkeypatch.setitem(config['embedder']['cache'], 'enabled', False)
+    monkeypatch.setitem(config['answer_generator']['context'], 'enabled', False)
+    yield model
+    model_registry.clear()
+
+def test_initialize_warms_up_and_records_timings(model: FakeModel, monkeypatch) -> None:
+    """
+    Проверяет, что до инициализации сервис не готов, а после неё модель загружена и прогрета,
+    и для каждого этапа старта записано время.
+    """
+    monkeypatch.setitem(config['embedder'], 'warm_up_on_startup', True)
+    monkeypatch.setitem(config['api']['startup'], 'warm_up_encode', True)
+    services = Services()
+    assert not services.ready
+    services.initialize()
+    assert services.wait_ready(0)
+    assert len(model.encoded) == 1
+    assert set(services.timings) == {
+        "vector_db", "lexical_index", "indexer", "generator", "model", "warm_up_encode", "total"
+    }
+    services.shutdown()
+
+def test_initialize_error_keeps_service_not_ready(model: FakeModel, monkeypatch) -> None:
+    """
+    Проверяет, что ошибка инициализации сохраняется, а сервис остаётся неготовым.
+    """
+    monkeypatch.setitem(config['vector_db'], 'backend', 'unknown')
+    services = Services()
+    services.initialize()
+    assert not services.wait_ready(0)
+    assert "ValueError" in services.error
+    services.shutdown()
@@ -0,0 +1,67 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from src.vector_db import NumpyStore, LexicalIndex, SnapshotMismatch, export_snapshot, import_snapshot
+
+@pytest.fixture()
+def store(tmp_path) -> NumpyStore:
+    """
+    Создаёт NumPy-хранилище с тремя документами.
+    """
+    store = NumpyStore(persist_dir=str(tmp_path / "source"))
+    store.add_unique_by_hash(
+        ["1", "2#0", "2#1"],
+        ["первый документ", "второй документ, чанк 0", "второй документ, чанк 1"],
+        [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.6, 0.8, 0.0]],
+        [{"source": "wiki"}, {"parent_uid": "2", "doc_hash": "h2"}, {"parent_uid": "2", "doc_hash": "h2"}]
+    )
+    return store
+
+@pytest.mark.parametrize("dtype", ["float16", "float32"])
+def test_roundtrip_without_reembedding(store: NumpyStore, tmp_path, dtype: str) -> None:
+    """
+    Проверяет, что снимок переносит тексты, метаданные, векторы и BM25-индекс в пустое хранилище.
+    """
+    path = str(tmp_path / "snapshot")
+    manifest = export_snapshot(store, path, dtype=dtype, batch_size=2)
+    assert manifest["count"] == 3 and manifest["embedder"]["dim"] == 4
+    assert os.path.getsize(os.path.join(path, manifest["files"]["embeddings"])) == 3 * 4 * np.dtype(dtype).itemsize
+
+    target = NumpyStore(persist_dir=str(tmp_path / "target"))
+    lexical = LexicalIndex(str(tmp_path / "target" / "lexical"))
+    assert import_snapshot(target, path, lexical_index=lexical, batch_size=2) == 3
+    assert target.count() == 3
+    assert target.document_hashes(["2"]) == {"2": "h2"}
+    assert target.get(["1"])["metadatas"][0]["source"] == "wiki"
+    result = target.query([0.0, 0.6, 0.8, 0.0], top_k=1)
+    assert result["ids"][0] == ["2#1"]
+    assert lexical.search("первый", 1)[0][0] == "1"
+
+def test_refuses_other_embedder(store: NumpyStore, tmp_path) -> None:
+    """
+    Проверяет, что снимок другой модели эмбеддингов не загружается.
+    """
+    path = str(tmp_path / "snapshot")
+    export_snapshot(store, path)
+    manifest_path = os.path.join(path, "manifest.json")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["embedder"]["model_name"] = "other/model"
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    target = NumpyStore(persist_dir=str(tmp_path / "target"))
+    with pytest.raises(SnapshotMismatch):
+        import_snapshot(target, path)
+    assert target.count() == 0
+
+def test_export_does_not_overwrite(store: NumpyStore, tmp_path) -> None:
+    """
+    Проверяет, что экспорт не перезаписывает существующий снимок.
+    """
+    path = str(tmp_path / "snapshot")
+    export_snapshot(store, path)
+    with pytest.raises(FileExistsError):
+        export_snapshot(store, path)
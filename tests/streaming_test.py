@@ -0,0 +1,46 @@
+import io
+import json
+import pytest
+from src.indexing.streaming import iter_json_array, iter_jsonl, batched
+
+@pytest.fixture
+def docs() -> list[dict]:
+    """
+    Возвращает набор документов, в том числе с многобайтовыми символами и вложенными структурами.
+    """
+    return [
+        {"uid": "1", "text": "Первый параграф с \"кавычками\" и скобками ]["},
+        {"uid": "2", "text": "Второй параграф", "tags": ["a", {"b": 1}]},
+        {"uid": "3", "text": "Ёлка 🎄 на границе кусков"},
+    ]
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1 << 20])
+def test_iter_json_array(docs: list[dict], chunk_size: int) -> None:
+    """
+    Проверяет, что потоковый разбор JSON-массива совпадает с json.loads при любом размере куска.
+    """
+    raw = json.dumps(docs, ensure_ascii=False, indent=2).encode("utf-8")
+    assert list(iter_json_array(io.BytesIO(raw), chunk_size)) == docs
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1 << 20])
+def test_iter_jsonl(docs: list[dict], chunk_size: int) -> None:
+    """
+    Проверяет потоковый разбор JSONL, включая пустые строки и отсутствие перевода строки в конце.
+    """
+    raw = "\n\n".join(json.dumps(d, ensure_ascii=False) for d in docs).encode("utf-8")
+    assert list(iter_jsonl(io.BytesIO(raw), chunk_size)) == docs
+
+@pytest.mark.parametrize("raw", [b'{"uid": "1"}', b'[{"uid": "1"} {"uid": "2"}]', b'[{"uid": "1"},'])
+def test_iter_json_array_invalid(raw: bytes) -> None:
+    """
+    Проверяет, что некорректный JSON-массив приводит к ValueError.
+    """
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.BytesIO(raw), 4))
+
+def test_empty_array_and_batched() -> None:
+    """
+    Проверяет разбор пустого массива и разбиение на батчи.
+    """
+    assert list(iter_json_array(io.BytesIO(b" [ ] "))) == []
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]